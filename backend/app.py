@@ -2,19 +2,24 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from db import Base, engine, DATABASE_URL
+from db import Base, engine, DATABASE_URL, cerrar_sesion, marcar_escritura
 from routes import api_bp
 import os
+import click
 from sqlalchemy.exc import OperationalError
 
 app = Flask(__name__)
 
 # Configurar CORS para permitir peticiones desde el frontend
+# (asgi.py reutiliza la lista para las rutas que atiende en modo async)
+ORIGENES_CORS = ["http://localhost:3000", "http://localhost:3001", "http://localhost:3002", "http://127.0.0.1:3000", "http://127.0.0.1:3001", "http://127.0.0.1:3002"]
 CORS(app, resources={
     r"/api/*": {
-        "origins": ["http://localhost:3000", "http://localhost:3001", "http://localhost:3002", "http://127.0.0.1:3000", "http://127.0.0.1:3001", "http://127.0.0.1:3002"],
+        "origins": ORIGENES_CORS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        # La cookie leer_primaria (db.marcar_escritura) viaja entre orígenes
+        "supports_credentials": True
     }
 })
 
@@ -30,12 +35,76 @@ db = SQLAlchemy(app, model_class=Base)
 
 # Importar todos los modelos para que Flask-Migrate los detecte
 # Los modelos deben usar el Base de db.py, no db.Model
-from models import Seccion, Producto, Plato, Postre, Bebida, Sector, Mesa, MedioPago, Mozo, Cliente, Reserva, Comanda, DetalleComanda, Factura, DetalleFactura, Pago
+from models import Seccion, Producto, Plato, Postre, Bebida, Sector, Mesa, MedioPago, Mozo, Cliente, Reserva, Comanda, DetalleComanda, Factura, DetalleFactura, Pago, ResumenVentaDiaria, ResumenCobroDiario, NumeracionFactura, VersionRecurso
 
 # Configurar Flask-Migrate
 # Flask-Migrate trabajará con el metadata de los modelos que usan Base
 migrate = Migrate(app, db, directory='migrations')
 
+
+@app.cli.command('reconstruir-resumenes')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Primer día a recalcular (YYYY-MM-DD)')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Último día a recalcular (YYYY-MM-DD)')
+def reconstruir_resumenes_cmd(desde, hasta):
+    """Recalcula los resúmenes diarios de ventas y cobros desde facturas y pagos"""
+    from db import SessionLocal
+    from services.resumenes import reconstruir_resumenes
+    session = SessionLocal()
+    try:
+        filas = reconstruir_resumenes(
+            session,
+            desde=desde.date() if desde else None,
+            hasta=hasta.date() if hasta else None
+        )
+        session.commit()
+        click.echo(f"✅ Resúmenes reconstruidos: {filas['ventas']} filas de ventas, {filas['cobros']} filas de cobros")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+@app.cli.command('recalcular-total-pagado')
+def recalcular_total_pagado_cmd():
+    """Recalcula factura.total_pagado sumando los pagos de cada factura"""
+    from db import SessionLocal
+    from services.saldos import recalcular_total_pagado
+    session = SessionLocal()
+    try:
+        filas = recalcular_total_pagado(session)
+        session.commit()
+        click.echo(f"✅ total_pagado recalculado en {filas} facturas")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+@app.cli.command('verificar-totales-comanda')
+@click.option('--reparar', is_flag=True, default=False, help='Corrige los totales que no coinciden con los detalles')
+def verificar_totales_comanda_cmd(reparar):
+    """Compara comanda.total con la suma de sus detalles"""
+    from db import SessionLocal
+    from services.totales import verificar_totales_comanda
+    session = SessionLocal()
+    try:
+        diferencias = verificar_totales_comanda(session, reparar=reparar)
+        for d in diferencias:
+            click.echo(f"⚠️  Comanda {d['id_comanda']}: total {d['total']:.2f}, detalles suman {d['calculado']:.2f}")
+        if reparar:
+            session.commit()
+            click.echo(f"✅ {len(diferencias)} comanda(s) reparada(s)")
+        elif diferencias:
+            click.echo(f"❌ {len(diferencias)} comanda(s) con total inconsistente (usar --reparar)")
+            raise SystemExit(1)
+        else:
+            click.echo("✅ Todos los totales de comanda coinciden con sus detalles")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 # NO crear tablas automáticamente - usar migraciones en su lugar
 # if os.getenv('FLASK_ENV') != 'production':
 #     try:
@@ -48,5 +117,10 @@ migrate = Migrate(app, db, directory='migrations')
 
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# La sesión del request (db.obtener_sesion / @con_sesion) se cierra siempre al terminar
+app.teardown_request(cerrar_sesion)
+# Read-your-writes con réplica de lectura (READ_DATABASE_URL)
+app.after_request(marcar_escritura)
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=99, debug=True)
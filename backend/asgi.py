@@ -0,0 +1,174 @@
+"""
+Modo de servicio ASGI para clientes que hacen polling:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 99 --workers 2
+
+Las rutas de RUTAS_ASYNC (las que todas las terminales consultan cada pocos
+segundos) se atienden en el event loop con una sesión async (db_async.py): un
+request esperando a la base no ocupa un hilo, así pocos procesos sostienen
+miles de conexiones de polling abiertas. La consulta y la serialización son
+las mismas funciones que usan las rutas Flask (vía AsyncSession.run_sync), por
+lo que la respuesta es idéntica en los dos modos.
+
+El feed /api/comandas/eventos (long-poll y SSE) también se atiende en el event
+loop: la espera es un await sobre el difusor (Difusor.esperar_async), así los
+streams abiertos no retienen hilos del pool ni tienen el tope por worker de la
+ruta Flask (EVENTOS_MAX_ESPERAS).
+
+Todo lo demás se delega sin cambios a la app Flask a través de
+a2wsgi.WSGIMiddleware, que reparte los requests en un pool de hilos propio:
+varios requests delegados se atienden a la vez (WsgiToAsgi de asgiref los
+ejecuta todos en un único hilo y serializa la API).
+
+Variable de entorno: ASGI_HILOS_WSGI (hilos del pool; por defecto
+DB_POOL_SIZE + DB_MAX_OVERFLOW, más hilos solo esperarían conexión).
+"""
+import asyncio
+import os
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import Headers, MIMEAccept, MultiDict
+from werkzeug.http import parse_accept_header
+
+import db
+from app import app as flask_app, ORIGENES_CORS
+from db_async import sesion_async, cerrar_engines_async
+import routes.comanda_routes as comanda_routes
+from routes.comanda_routes import (
+    datos_comandas_abiertas, parametros_eventos, cuerpo_long_poll, bloques_sse
+)
+from services.eventos import difusor, iniciar_escucha
+from routes.reserva_routes import datos_reservas_hoy
+
+
+def _respuesta_comandas_abiertas(data):
+    return {'status': 'success', 'data': data}
+
+
+def _respuesta_reservas_hoy(data):
+    return {'status': 'success', 'data': data, 'total': len(data)}
+
+
+# path -> (consulta síncrona sobre una Session, armado del cuerpo)
+RUTAS_ASYNC = {
+    '/api/comandas/abiertas': (datos_comandas_abiertas, _respuesta_comandas_abiertas),
+    '/api/reservas/hoy': (datos_reservas_hoy, _respuesta_reservas_hoy),
+}
+
+# Feed de cambios: se espera en el event loop (ver _atender_eventos)
+RUTA_EVENTOS = '/api/comandas/eventos'
+
+HILOS_WSGI = int(os.getenv('ASGI_HILOS_WSGI') or db.POOL_SIZE + db.POOL_MAX_OVERFLOW)
+
+wsgi = WSGIMiddleware(flask_app, workers=HILOS_WSGI)
+
+
+def _headers(scope):
+    return {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+
+def _leer_primaria(headers):
+    """Read-your-writes: misma cookie que marca db.marcar_escritura en las escrituras"""
+    cookie = SimpleCookie()
+    cookie.load(headers.get('cookie', ''))
+    return db.COOKIE_LEER_PRIMARIA in cookie
+
+
+def _cabeceras_cors(headers):
+    origen = headers.get('origin')
+    if origen not in ORIGENES_CORS:
+        return []
+    return [(b'access-control-allow-origin', origen.encode('latin-1')),
+            (b'access-control-allow-credentials', b'true'), (b'vary', b'Origin')]
+
+
+async def _enviar_json(send, cuerpo, estado, headers):
+    # Mismo serializador que jsonify (claves ordenadas, fechas y Decimal)
+    contenido = flask_app.json.dumps(cuerpo).encode('utf-8')
+    cabeceras = [(b'content-type', b'application/json'), (b'content-length', str(len(contenido)).encode())]
+    await send({'type': 'http.response.start', 'status': estado, 'headers': cabeceras + _cabeceras_cors(headers)})
+    await send({'type': 'http.response.body', 'body': contenido})
+
+
+async def _atender_async(scope, send, consulta, armar):
+    headers = _headers(scope)
+    try:
+        async with sesion_async(lectura=not _leer_primaria(headers)) as session:
+            data = await session.run_sync(consulta)
+        await _enviar_json(send, armar(data), 200, headers)
+    except Exception as e:
+        await _enviar_json(send, {'status': 'error', 'message': str(e)}, 500, headers)
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _stream_eventos(receive, send, desde, headers):
+    """Mismo stream que la ruta Flask (_stream_eventos), esperando en el event loop"""
+    cabeceras = [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                 (b'x-accel-buffering', b'no')]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': cabeceras + _cabeceras_cors(headers)})
+    desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+    try:
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        fin = time.monotonic() + comanda_routes.SSE_DURACION_MAXIMA
+        while not desconexion.done():
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                break
+            espera = min(comanda_routes.SSE_KEEPALIVE, restante)
+            bloque, desde = bloques_sse(*await difusor.esperar_async(desde, espera), desde)
+            await send({'type': 'http.response.body', 'body': bloque.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        desconexion.cancel()
+
+
+async def _atender_eventos(scope, receive, send):
+    headers = _headers(scope)
+    args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    try:
+        desde, espera = parametros_eventos(args, Headers(list(headers.items())))
+    except ValueError:
+        return await _enviar_json(send, {
+            'status': 'error',
+            'message': f'"desde" debe ser un id de evento y "espera" un número entre 0 y {comanda_routes.ESPERA_MAXIMA}'
+        }, 400, headers)
+
+    iniciar_escucha()
+    if parse_accept_header(headers.get('accept'), MIMEAccept).best == 'text/event-stream':
+        return await _stream_eventos(receive, send, desde, headers)
+    eventos, resync = await difusor.esperar_async(desde, espera)
+    await _enviar_json(send, cuerpo_long_poll(eventos, resync, desde), 200, headers)
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await cerrar_engines_async()
+            db.cerrar_pools()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        path = scope['path'].rstrip('/')
+        if path == RUTA_EVENTOS:
+            return await _atender_eventos(scope, receive, send)
+        ruta = RUTAS_ASYNC.get(path)
+        if ruta is not None:
+            return await _atender_async(scope, send, *ruta)
+
+    return await wsgi(scope, receive, send)
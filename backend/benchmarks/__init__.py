@@ -0,0 +1 @@
+# Benchmarks de consultas contra una base PostgreSQL de prueba
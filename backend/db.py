@@ -1,7 +1,14 @@
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import logging
+import threading
+import time
+from functools import wraps
+from flask import g, has_request_context, request
+from sqlalchemy import DDL, create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -44,17 +51,292 @@ else:
 # Asegurar que DATABASE_URL esté en UTF-8 (importante para Windows)
 DATABASE_URL = ensure_utf8_string(DATABASE_URL)
 
+# ========== POOL DE CONEXIONES ==========
+# Configurable por entorno para dimensionarlo según la cantidad de workers:
+#   DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s), DB_POOL_RECYCLE (3600 s)
+#   DB_POOL_DESCONEXION: 'pre_ping' (SELECT 1 en cada checkout, default) u 'on_error'
+#       (sin ping; ante un error de desconexión SQLAlchemy invalida todas las
+#       conexiones del pool y el request siguiente abre conexiones nuevas)
+#   DB_POOL_LOG_ESPERA_MS (100): esperas por una conexión más largas que esto se loguean
+# Cada proceso tiene su propio pool: conexiones máximas = workers * (size + overflow).
+
+def _env_int(nombre, default):
+    valor = os.getenv(nombre)
+    return int(valor) if valor not in (None, '') else default
+
+POOL_SIZE = _env_int('DB_POOL_SIZE', 5)
+POOL_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 10)
+POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 30)
+POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 3600)
+POOL_DESCONEXION = os.getenv('DB_POOL_DESCONEXION', 'pre_ping')
+POOL_LOG_ESPERA_MS = _env_int('DB_POOL_LOG_ESPERA_MS', 100)
+
+if POOL_DESCONEXION not in ('pre_ping', 'on_error'):
+    raise ValueError("DB_POOL_DESCONEXION debe ser 'pre_ping' u 'on_error'")
+
+logger_pool = logging.getLogger('db.pool')
+
+
+class MetricasPool:
+    """Contadores del pool del proceso (checkouts, esperas, desconexiones)"""
+
+    CAMPOS = ('conexiones_abiertas', 'checkouts', 'checkins', 'invalidaciones', 'desconexiones',
+              'timeouts', 'esperas', 'espera_total_ms', 'espera_max_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._valores = dict.fromkeys(self.CAMPOS, 0)
+
+    def sumar(self, campo, cantidad=1):
+        with self._lock:
+            self._valores[campo] += cantidad
+
+    def registrar_espera(self, ms):
+        with self._lock:
+            self._valores['esperas'] += 1
+            self._valores['espera_total_ms'] += ms
+            self._valores['espera_max_ms'] = max(self._valores['espera_max_ms'], ms)
+
+    def valores(self):
+        with self._lock:
+            valores = dict(self._valores)
+        esperas = valores['esperas']
+        valores['espera_promedio_ms'] = round(valores['espera_total_ms'] / esperas, 3) if esperas else 0
+        valores['espera_total_ms'] = round(valores['espera_total_ms'], 3)
+        valores['espera_max_ms'] = round(valores['espera_max_ms'], 3)
+        return valores
+
+
+metricas_pool = MetricasPool()
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión libre"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metricas_pool.sumar('timeouts')
+            logger_pool.error('Timeout esperando conexión del pool: %s', self.status())
+            raise
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            metricas_pool.registrar_espera(ms)
+            if ms >= POOL_LOG_ESPERA_MS:
+                logger_pool.warning('Checkout esperó %.1f ms por una conexión: %s', ms, self.status())
+
+
+def instrumentar_engine(engine):
+    """Registra los eventos que alimentan metricas_pool"""
+    event.listen(engine, 'connect', lambda *a: metricas_pool.sumar('conexiones_abiertas'))
+    event.listen(engine, 'checkout', lambda *a: metricas_pool.sumar('checkouts'))
+    event.listen(engine, 'checkin', lambda *a: metricas_pool.sumar('checkins'))
+    event.listen(engine, 'invalidate', lambda *a: metricas_pool.sumar('invalidaciones'))
+
+    @event.listens_for(engine, 'handle_error')
+    def _contar_desconexion(contexto):
+        if contexto.is_disconnect:
+            metricas_pool.sumar('desconexiones')
+            logger_pool.warning('Desconexión detectada; se invalidan las conexiones del pool: %s',
+                                contexto.original_exception)
+
+
+def estado_pool(engine_=None):
+    """Configuración, ocupación actual y contadores del pool (para /api/sistema/pool)"""
+    engine_ = engine_ or sys.modules[__name__].engine
+    pool = engine_.pool
+    ocupacion = {'tipo': type(pool).__name__}
+    for clave, metodo in (('tamanio', 'size'), ('en_uso', 'checkedout'),
+                          ('libres', 'checkedin'), ('overflow', 'overflow')):
+        if hasattr(pool, metodo):
+            ocupacion[clave] = getattr(pool, metodo)()
+    return {
+        'configuracion': {
+            'pool_size': POOL_SIZE,
+            'max_overflow': POOL_MAX_OVERFLOW,
+            'pool_timeout': POOL_TIMEOUT,
+            'pool_recycle': POOL_RECYCLE,
+            'desconexion': POOL_DESCONEXION,
+        },
+        'pool': ocupacion,
+        'contadores': metricas_pool.valores(),
+    }
+
+
 # Crear engine con configuración optimizada
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,  # Verifica conexiones antes de usarlas
-    pool_recycle=3600,   # Recicla conexiones cada hora
+    poolclass=QueuePoolMedido,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_pre_ping=POOL_DESCONEXION == 'pre_ping',  # Verifica conexiones antes de usarlas
+    pool_recycle=POOL_RECYCLE,   # Recicla conexiones viejas
     echo=False,          # Cambiar a True para ver SQL en consola
     connect_args={
         'client_encoding': 'utf8'  # Forzar codificación UTF-8 en la conexión (importante para Windows)
     }
 )
+instrumentar_engine(engine)
 SessionLocal = sessionmaker(bind=engine)
 
+
+# ========== RÉPLICA DE LECTURA (OPCIONAL) ==========
+# Con READ_DATABASE_URL definida, las rutas de solo lectura (listados, reportes,
+# /reservas/hoy) marcadas con @con_sesion_lectura consultan la réplica y todo lo
+# demás va a la primaria. Read-your-writes: después de una escritura exitosa el
+# cliente recibe la cookie `leer_primaria` por READ_YOUR_WRITES_SEGUNDOS (5) y
+# mientras la tenga sus lecturas también van a la primaria, así no ve datos
+# anteriores a su propio cambio por el retraso de replicación.
+READ_DATABASE_URL = ensure_utf8_string(os.getenv('READ_DATABASE_URL')) or None
+READ_YOUR_WRITES_SEGUNDOS = _env_int('READ_YOUR_WRITES_SEGUNDOS', 5)
+COOKIE_LEER_PRIMARIA = 'leer_primaria'
+# Marca en request.environ (no en g, que se comparte entre requests en los tests)
+ENTORNO_LEER_PRIMARIA = 'restaurante.leer_primaria'
+
+if READ_DATABASE_URL:
+    engine_lectura = create_engine(
+        READ_DATABASE_URL,
+        poolclass=QueuePoolMedido,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=POOL_DESCONEXION == 'pre_ping',
+        pool_recycle=POOL_RECYCLE,
+        connect_args={'client_encoding': 'utf8'} if READ_DATABASE_URL.startswith('postgresql') else {},
+    )
+    instrumentar_engine(engine_lectura)
+    SessionLectura = sessionmaker(bind=engine_lectura, info={'solo_lectura': True})
+else:
+    engine_lectura = None
+    SessionLectura = None
+
+
+def _engines():
+    modulo = sys.modules[__name__]
+    return [e for e in (modulo.engine, modulo.engine_lectura) if e is not None]
+
+
+def reiniciar_pools_tras_fork(*engines):
+    """
+    Llamar en cada proceso hijo después de un fork (gunicorn post_fork con
+    preload_app). Descarta las conexiones heredadas del master sin cerrarlas
+    (close=False): el socket sigue siendo del master y cerrarlo desde el hijo
+    rompería la conexión de los otros procesos.
+    """
+    for e in engines or _engines():
+        e.dispose(close=False)
+
+
+def cerrar_pools(*engines):
+    """Cierra las conexiones libres de los pools (apagado ordenado del proceso)"""
+    for e in engines or _engines():
+        e.dispose()
+
+
+def _impedir_escrituras(session, contexto, instancias):
+    if session.info.get('solo_lectura') and (session.new or session.dirty or session.deleted):
+        raise RuntimeError('Escritura en una sesión de solo lectura (réplica); la ruta debe usar @con_sesion')
+
+event.listen(Session, 'before_flush', _impedir_escrituras)
+
+
+# ========== SESIÓN POR REQUEST ==========
+# Cada request usa una única sesión, creada a demanda y guardada en flask.g.
+# `cerrar_sesion` (registrado como teardown_request en app.py) la cierra siempre
+# al terminar el request y hace rollback si hubo una excepción, así ninguna ruta
+# deja conexiones tomadas del pool aunque falle a mitad de camino.
+
+def _usar_replica():
+    modulo = sys.modules[__name__]
+    return (modulo.SessionLectura is not None and COOKIE_LEER_PRIMARIA not in request.cookies
+            and not request.environ.get(ENTORNO_LEER_PRIMARIA))
+
+
+def forzar_primaria():
+    """
+    Las lecturas que quedan del request van a la primaria (p. ej. para llenar una
+    caché compartida: un resultado de la réplica atrasada quedaría guardado para
+    todos). Si ya había una sesión de réplica abierta se descarta.
+    """
+    request.environ[ENTORNO_LEER_PRIMARIA] = True
+    session = g.get('db_session')
+    if session is not None and session.info.get('solo_lectura'):
+        g.pop('db_session').close()
+
+
+def obtener_sesion(lectura=False):
+    """
+    Sesión del request actual (la crea la primera vez que se pide).
+    Con lectura=True y réplica configurada devuelve una sesión de solo lectura
+    contra la réplica, salvo que el cliente haya escrito hace poco.
+    """
+    if not has_request_context():
+        raise RuntimeError('obtener_sesion() solo puede usarse dentro de un request; usar SessionLocal()')
+    if 'db_session' not in g:
+        # Búsqueda en el módulo en cada llamada: los tests reemplazan SessionLocal/SessionLectura
+        modulo = sys.modules[__name__]
+        fabrica = modulo.SessionLectura if lectura and _usar_replica() else modulo.SessionLocal
+        g.db_session = fabrica()
+    return g.db_session
+
+
+def cerrar_sesion(excepcion=None):
+    """Teardown del request: rollback si hubo error y devolución de la conexión al pool"""
+    session = g.pop('db_session', None)
+    if session is None:
+        return
+    try:
+        if excepcion is not None:
+            session.rollback()
+    finally:
+        session.close()
+
+
+def _decorar(vista, lectura):
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        session = obtener_sesion(lectura=lectura)
+        try:
+            return vista(session, *args, **kwargs)
+        except Exception:
+            session.rollback()
+            raise
+    return envoltura
+
+
+def con_sesion(vista):
+    """Decorador de rutas: pasa la sesión del request como primer argumento y hace rollback ante excepciones"""
+    return _decorar(vista, lectura=False)
+
+
+def con_sesion_lectura(vista):
+    """Como @con_sesion, pero la sesión puede ir a la réplica de lectura (solo para rutas que no escriben)"""
+    return _decorar(vista, lectura=True)
+
+
+def marcar_escritura(respuesta):
+    """after_request: tras una escritura exitosa, las lecturas del cliente van a la primaria por unos segundos"""
+    modulo = sys.modules[__name__]
+    if (modulo.SessionLectura is not None and request.method in ('POST', 'PUT', 'PATCH', 'DELETE')
+            and respuesta.status_code < 400):
+        respuesta.set_cookie(COOKIE_LEER_PRIMARIA, '1', max_age=READ_YOUR_WRITES_SEGUNDOS, httponly=True)
+    return respuesta
+
+
+
 class Base(DeclarativeBase):
     pass
+
+
+# Los índices de búsqueda (gin_trgm_ops) necesitan la extensión antes de crear las tablas
+event.listen(
+    Base.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
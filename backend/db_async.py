@@ -0,0 +1,63 @@
+"""
+Engine y sesiones async para el modo ASGI (ver asgi.py).
+
+Solo lo usan las rutas de polling que asgi.py atiende directamente; el resto de
+la API sigue usando el engine síncrono de db.py. Las URLs se derivan de
+DATABASE_URL / READ_DATABASE_URL cambiando el driver (postgresql -> asyncpg,
+sqlite -> aiosqlite) y el pool usa la misma configuración DB_POOL_* que db.py.
+
+Los engines se crean a demanda: importar este módulo no requiere asyncpg.
+"""
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import db
+
+DRIVERS_ASYNC = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# lectura (bool) -> async_sessionmaker; los tests pueden reemplazar las entradas
+_fabricas = {}
+_engines_async = []
+
+
+def url_async(url):
+    """Misma URL con el driver async equivalente ('postgresql://...' -> 'postgresql+asyncpg://...')"""
+    esquema, separador, resto = url.partition('://')
+    if not separador:
+        raise ValueError(f'URL de base de datos inválida: {url!r}')
+    return f'{DRIVERS_ASYNC.get(esquema, esquema)}://{resto}'
+
+
+def _crear_engine(url):
+    opciones = {'pool_pre_ping': db.POOL_DESCONEXION == 'pre_ping', 'pool_recycle': db.POOL_RECYCLE}
+    if not url.startswith('sqlite'):
+        opciones.update(pool_size=db.POOL_SIZE, max_overflow=db.POOL_MAX_OVERFLOW, pool_timeout=db.POOL_TIMEOUT)
+    engine = create_async_engine(url_async(url), **opciones)
+    _engines_async.append(engine)
+    return engine
+
+
+def sesion_async(lectura=False):
+    """
+    AsyncSession nueva (usar con `async with`). Con lectura=True y réplica
+    configurada va a READ_DATABASE_URL, igual que @con_sesion_lectura.
+    """
+    lectura = bool(lectura and db.READ_DATABASE_URL)
+    if lectura not in _fabricas:
+        url = db.READ_DATABASE_URL if lectura else db.DATABASE_URL
+        _fabricas[lectura] = async_sessionmaker(
+            _crear_engine(url), expire_on_commit=False, info={'solo_lectura': lectura}
+        )
+    return _fabricas[lectura]()
+
+
+async def cerrar_engines_async():
+    """Cierra los pools async (shutdown del lifespan ASGI)"""
+    while _engines_async:
+        await _engines_async.pop().dispose()
+    _fabricas.clear()
+
@@ -0,0 +1,76 @@
+"""
+Configuración de gunicorn para producción:
+
+    gunicorn -c gunicorn.conf.py flask_app:app
+
+Variables de entorno:
+    PORT (99), WEB_CONCURRENCY (workers, default 2 * CPUs + 1), GUNICORN_THREADS (4),
+    GUNICORN_KEEPALIVE (5 s), GUNICORN_TIMEOUT (30 s), GUNICORN_GRACEFUL_TIMEOUT (30 s),
+    GUNICORN_MAX_REQUESTS (1000, 0 = sin reciclar workers)
+
+Cada worker es un proceso con su propio pool de conexiones (ver db.py): las
+conexiones totales a PostgreSQL son workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+"""
+import logging
+import multiprocessing
+import os
+
+
+def _env_int(nombre, default):
+    valor = os.getenv(nombre)
+    return int(valor) if valor not in (None, '') else default
+
+
+bind = f"0.0.0.0:{_env_int('PORT', 99)}"
+
+# Workers con hilos: las terminales del salón hacen pedidos cortos y mayormente
+# de E/S contra la base, así que varios hilos por proceso aprovechan la espera.
+workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gthread'
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# Las terminales reutilizan la conexión HTTP entre pedidos seguidos
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+# SIGTERM (docker stop): los workers terminan los pedidos en curso antes de salir
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Reciclar workers periódicamente acota fugas de memoria; el jitter evita que reinicien todos juntos
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = max_requests // 10
+
+# La app (y el engine) se cargan una vez en el master y se comparten por fork
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    import db
+    conexiones = db.POOL_SIZE + db.POOL_MAX_OVERFLOW
+    server.log.info(
+        'Workers: %s x %s hilos; pool por worker: %s + %s (máx. %s conexiones en total)',
+        workers, threads, db.POOL_SIZE, db.POOL_MAX_OVERFLOW, workers * conexiones
+    )
+    if threads > conexiones:
+        server.log.warning(
+            'GUNICORN_THREADS (%s) supera DB_POOL_SIZE + DB_MAX_OVERFLOW (%s): '
+            'hay hilos que van a esperar conexión', threads, conexiones
+        )
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el master (p. ej. durante el import) no se comparten entre procesos
+    import db
+    from services.eventos import difusor
+    db.reiniciar_pools_tras_fork()
+    # Cada worker numera sus eventos con una época propia (ids de otro worker -> resync)
+    difusor.reiniciar_tras_fork()
+    logging.getLogger('db.pool').setLevel(logging.INFO)
+
+
+def worker_exit(server, worker):
+    import db
+    db.cerrar_pools()
@@ -0,0 +1,57 @@
+"""Add composite and partial indexes for the most frequent filters
+
+Revision ID: add_indices_filtros_frecuentes
+Revises: add_reserva_comanda_fields
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_indices_filtros_frecuentes'
+down_revision = 'add_reserva_comanda_fields'
+branch_labels = None
+depends_on = None
+
+
+# (nombre, tabla, columnas, opciones extra de PostgreSQL)
+INDICES = [
+    ('ix_comanda_mesa_estado_baja', 'comanda', ['id_mesa', 'estado', 'baja'], {}),
+    ('ix_comanda_abiertas', 'comanda', ['id_mesa'],
+     {'postgresql_where': sa.text("estado = 'Abierta' AND baja = false")}),
+    ('ix_comanda_fecha', 'comanda', ['fecha', 'id_comanda'], {}),
+    ('ix_comanda_reserva', 'comanda', ['id_reserva'], {}),
+    ('ix_detalle_comanda_comanda_entregado', 'detalle_comanda', ['id_comanda', 'entregado'], {}),
+    ('ix_factura_codigo_patron', 'factura', ['codigo'],
+     {'postgresql_ops': {'codigo': 'varchar_pattern_ops'}}),
+    ('ix_factura_fecha', 'factura', ['fecha', 'id_factura'], {}),
+    ('ix_factura_comanda', 'factura', ['id_comanda'], {}),
+    ('ix_pago_factura', 'pago', ['id_factura'], {}),
+    ('ix_pago_fecha', 'pago', ['fecha', 'id_pago'], {}),
+    ('ix_reserva_mesa_fecha', 'reserva', ['id_mesa', 'fecha_hora'],
+     {'postgresql_where': sa.text('cancelado = false')}),
+    ('ix_reserva_fecha', 'reserva', ['fecha_hora'], {}),
+]
+
+
+def upgrade():
+    # En PostgreSQL se crean con CONCURRENTLY para no bloquear escrituras en
+    # tablas grandes; eso no puede correr dentro de una transacción.
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas, opciones in INDICES:
+            op.create_index(
+                nombre, tabla, columnas,
+                if_not_exists=True,
+                postgresql_concurrently=concurrente,
+                **opciones
+            )
+
+
+def downgrade():
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=concurrente)
@@ -0,0 +1,61 @@
+"""Add pg_trgm and full-text indexes for client and product search
+
+Revision ID: busqueda_trigram
+Revises: version_recurso
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'busqueda_trigram'
+down_revision = 'version_recurso'
+branch_labels = None
+depends_on = None
+
+
+def _trgm(columna):
+    return [columna], {'postgresql_using': 'gin', 'postgresql_ops': {columna: 'gin_trgm_ops'}}
+
+
+# (nombre, tabla, columnas, opciones); las expresiones son las mismas que usa services/busqueda.py
+INDICES = [
+    ('ix_cliente_documento_trgm', 'cliente', *_trgm('documento')),
+    ('ix_cliente_nombre_trgm', 'cliente', *_trgm('nombre')),
+    ('ix_cliente_apellido_trgm', 'cliente', *_trgm('apellido')),
+    ('ix_cliente_texto_trgm', 'cliente', [sa.literal_column("(apellido || ' ' || nombre)").label('texto')],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'texto': 'gin_trgm_ops'}}),
+    ('ix_cliente_texto_tsv', 'cliente', [sa.text("to_tsvector('simple', apellido || ' ' || nombre)")],
+     {'postgresql_using': 'gin'}),
+    ('ix_producto_codigo_trgm', 'producto', *_trgm('codigo')),
+    ('ix_producto_nombre_trgm', 'producto', *_trgm('nombre')),
+    ('ix_producto_nombre_tsv', 'producto', [sa.text("to_tsvector('simple', nombre)")],
+     {'postgresql_using': 'gin'}),
+]
+
+
+def upgrade():
+    # Índices GIN propios de PostgreSQL; en otras bases la búsqueda usa LIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Requiere permisos para crear extensiones (o que el DBA la haya creado antes)
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas, opciones in INDICES:
+            op.create_index(
+                nombre, tabla, columnas,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                **opciones
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=True)
+    # La extensión se deja: otros objetos de la base pueden depender de ella
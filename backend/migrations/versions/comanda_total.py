@@ -0,0 +1,36 @@
+"""Add maintained total column to comanda
+
+Revision ID: comanda_total
+Revises: factura_total_pagado
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'comanda_total'
+down_revision = 'factura_total_pagado'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('comanda', sa.Column('total', sa.Numeric(12, 2), nullable=False, server_default='0'))
+
+    # Carga inicial desde los detalles existentes (equivale a `flask verificar-totales-comanda --reparar`)
+    op.execute("""
+        UPDATE comanda c
+        SET total = d.total
+        FROM (
+            SELECT id_comanda, SUM(precio_unitario * cantidad) AS total
+            FROM detalle_comanda
+            GROUP BY id_comanda
+        ) d
+        WHERE d.id_comanda = c.id_comanda
+    """)
+
+
+def downgrade():
+    op.drop_column('comanda', 'total')
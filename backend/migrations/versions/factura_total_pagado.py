@@ -0,0 +1,38 @@
+"""Add maintained total_pagado column to factura
+
+Revision ID: factura_total_pagado
+Revises: numeracion_factura
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'factura_total_pagado'
+down_revision = 'numeracion_factura'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('factura', sa.Column('total_pagado', sa.Numeric(10, 2), nullable=False, server_default='0'))
+
+    # Carga inicial desde los pagos existentes (equivale a `flask recalcular-total-pagado`)
+    op.execute("""
+        UPDATE factura f
+        SET total_pagado = p.total
+        FROM (SELECT id_factura, SUM(monto) AS total FROM pago GROUP BY id_factura) p
+        WHERE p.id_factura = f.id_factura
+    """)
+
+    op.create_index(
+        'ix_factura_impagas', 'factura', ['fecha', 'id_factura'],
+        postgresql_where=sa.text('total_pagado < total AND baja = false')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_factura_impagas', table_name='factura')
+    op.drop_column('factura', 'total_pagado')
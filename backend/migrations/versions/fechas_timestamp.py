@@ -0,0 +1,101 @@
+"""Convert comanda.fecha/fecha_cierre, factura.fecha and pago.fecha to TIMESTAMP
+
+Revision ID: fechas_timestamp
+Revises: add_indices_filtros_frecuentes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op, context
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fechas_timestamp'
+down_revision = 'add_indices_filtros_frecuentes'
+branch_labels = None
+depends_on = None
+
+
+# Filas convertidas por lote (cada lote se confirma por separado)
+LOTE = 5000
+
+# (tabla, columna, clave primaria, nullable)
+COLUMNAS = [
+    ('comanda', 'fecha', 'id_comanda', False),
+    ('comanda', 'fecha_cierre', 'id_comanda', True),
+    ('factura', 'fecha', 'id_factura', False),
+    ('pago', 'fecha', 'id_pago', False),
+]
+
+# Índices que dependen de las columnas convertidas (se recrean sobre la columna nueva)
+INDICES = [
+    ('ix_comanda_fecha', 'comanda', ['fecha', 'id_comanda']),
+    ('ix_factura_fecha', 'factura', ['fecha', 'id_factura']),
+    ('ix_pago_fecha', 'pago', ['fecha', 'id_pago']),
+]
+
+
+def _ya_convertida(tabla, columna):
+    """True si la columna ya es TIMESTAMP (migración reanudada después del swap)"""
+    if context.is_offline_mode():
+        return False
+    for col in sa.inspect(op.get_bind()).get_columns(tabla):
+        if col['name'] == columna:
+            return isinstance(col['type'], sa.DateTime)
+    return False
+
+
+def _convertir_por_lotes(tabla, columna, pk):
+    """
+    Copia los valores a <columna>_ts en lotes chicos. Es reanudable: cada lote
+    toma las filas que todavía no tienen valor convertido.
+    """
+    nueva = f'{columna}_ts'
+    sql = (
+        f"UPDATE {tabla} SET {nueva} = NULLIF(trim({columna}), '')::timestamp "
+        f"WHERE {pk} IN (SELECT {pk} FROM {tabla} "
+        f"WHERE {nueva} IS NULL AND NULLIF(trim({columna}), '') IS NOT NULL "
+        f"ORDER BY {pk} LIMIT {LOTE})"
+    )
+    if context.is_offline_mode():
+        op.execute(sql)
+        return
+    bind = op.get_bind()
+    while bind.execute(sa.text(sql)).rowcount:
+        pass
+
+
+def upgrade():
+    pendientes = [c for c in COLUMNAS if not _ya_convertida(c[0], c[1])]
+
+    # 1) Columnas nuevas y backfill por lotes fuera de la transacción, para no
+    #    bloquear las tablas ni generar una transacción gigante.
+    with op.get_context().autocommit_block():
+        for tabla, columna, pk, _ in pendientes:
+            op.execute(f'ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS {columna}_ts TIMESTAMP')
+            _convertir_por_lotes(tabla, columna, pk)
+
+    # 2) Swap en una transacción corta: se bloquea la tabla, se convierten las
+    #    filas escritas durante el backfill y se reemplaza la columna vieja.
+    for tabla, columna, pk, nullable in pendientes:
+        op.execute(f'LOCK TABLE {tabla} IN ACCESS EXCLUSIVE MODE')
+        op.execute(
+            f"UPDATE {tabla} SET {columna}_ts = NULLIF(trim({columna}), '')::timestamp "
+            f"WHERE {columna}_ts IS NULL AND NULLIF(trim({columna}), '') IS NOT NULL"
+        )
+        op.drop_column(tabla, columna)
+        op.alter_column(tabla, f'{columna}_ts', new_column_name=columna, nullable=nullable)
+
+    # 3) Los índices sobre fecha se perdieron con la columna vieja
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            op.create_index(nombre, tabla, columnas, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    for tabla, columna, _, _ in COLUMNAS:
+        op.alter_column(
+            tabla, columna,
+            type_=sa.String(50),
+            postgresql_using=f"to_char({columna}, 'YYYY-MM-DD HH24:MI:SS')"
+        )
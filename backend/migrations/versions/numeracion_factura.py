@@ -0,0 +1,39 @@
+"""Add per-day invoice number counter
+
+Revision ID: numeracion_factura
+Revises: resumenes_diarios
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'numeracion_factura'
+down_revision = 'resumenes_diarios'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'numeracion_factura',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('ultimo', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dia'),
+    )
+
+    # Continúa la numeración existente: último número de cada día según los códigos FACT-YYYYMMDD-NNNNN
+    op.execute("""
+        INSERT INTO numeracion_factura (dia, ultimo)
+        SELECT to_date(substring(codigo from 6 for 8), 'YYYYMMDD'),
+               MAX(CAST(substring(codigo from 15) AS INTEGER))
+        FROM factura
+        WHERE codigo ~ '^FACT-[0-9]{8}-[0-9]+$'
+        GROUP BY substring(codigo from 6 for 8)
+    """)
+
+
+def downgrade():
+    op.drop_table('numeracion_factura')
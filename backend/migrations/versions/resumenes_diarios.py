@@ -0,0 +1,58 @@
+"""Add daily sales and payment rollup tables for reports
+
+Revision ID: resumenes_diarios
+Revises: fechas_timestamp
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'resumenes_diarios'
+down_revision = 'fechas_timestamp'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resumen_venta_diaria',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('id_producto', sa.Integer(), sa.ForeignKey('producto.id_producto'), nullable=False),
+        sa.Column('id_mozo', sa.Integer(), sa.ForeignKey('mozo.id'), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Numeric(12, 2), nullable=False),
+        sa.PrimaryKeyConstraint('dia', 'id_producto', 'id_mozo'),
+    )
+    op.create_table(
+        'resumen_cobro_diario',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('id_medio_pago', sa.Integer(), sa.ForeignKey('medio_pago.id_medio_pago'), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Numeric(12, 2), nullable=False),
+        sa.PrimaryKeyConstraint('dia', 'id_medio_pago'),
+    )
+
+    # Carga inicial con el historial existente (equivale a `flask reconstruir-resumenes`)
+    op.execute("""
+        INSERT INTO resumen_venta_diaria (dia, id_producto, id_mozo, cantidad, total)
+        SELECT f.fecha::date, dc.id_producto, c.id_mozo, SUM(df.cantidad), SUM(df.subtotal)
+        FROM detalle_factura df
+        JOIN factura f ON f.id_factura = df.id_factura
+        JOIN detalle_comanda dc ON dc.id_detalle_comanda = df.id_detalle_comanda
+        JOIN comanda c ON c.id_comanda = f.id_comanda
+        GROUP BY f.fecha::date, dc.id_producto, c.id_mozo
+    """)
+    op.execute("""
+        INSERT INTO resumen_cobro_diario (dia, id_medio_pago, cantidad, total)
+        SELECT p.fecha::date, p.id_medio_pago, COUNT(p.id_pago), SUM(p.monto)
+        FROM pago p
+        GROUP BY p.fecha::date, p.id_medio_pago
+    """)
+
+
+def downgrade():
+    op.drop_table('resumen_cobro_diario')
+    op.drop_table('resumen_venta_diaria')
@@ -0,0 +1,30 @@
+"""Add per-resource version counters for conditional GET
+
+Revision ID: version_recurso
+Revises: comanda_total
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'version_recurso'
+down_revision = 'comanda_total'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'version_recurso',
+        sa.Column('recurso', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('actualizado', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('recurso'),
+    )
+
+
+def downgrade():
+    op.drop_table('version_recurso')
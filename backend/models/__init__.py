@@ -12,6 +12,9 @@ from .detalle_comanda import DetalleComanda
 from .factura import Factura
 from .detalle_factura import DetalleFactura
 from .pago import Pago
+from .resumen_diario import ResumenVentaDiaria, ResumenCobroDiario
+from .numeracion_factura import NumeracionFactura
+from .version_recurso import VersionRecurso
 
 # Exporta todos los modelos
-__all__ = ['Seccion', 'Producto', 'Plato', 'Postre', 'Bebida', 'Sector', 'Mesa', 'MedioPago', 'Mozo', 'Cliente', 'Reserva', 'Comanda', 'DetalleComanda', 'Factura', 'DetalleFactura', 'Pago']
+__all__ = ['Seccion', 'Producto', 'Plato', 'Postre', 'Bebida', 'Sector', 'Mesa', 'MedioPago', 'Mozo', 'Cliente', 'Reserva', 'Comanda', 'DetalleComanda', 'Factura', 'DetalleFactura', 'Pago', 'ResumenVentaDiaria', 'ResumenCobroDiario', 'NumeracionFactura', 'VersionRecurso']
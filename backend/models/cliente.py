@@ -1,10 +1,24 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, Index, literal_column, text
 from sqlalchemy.orm import relationship
 from db import Base
 
 class Cliente(Base):
     __tablename__ = 'cliente'
-    
+    __table_args__ = (
+        # Búsqueda (services/busqueda.py) y filtros LIKE '%x%' del listado: trigramas (pg_trgm)
+        Index('ix_cliente_documento_trgm', 'documento', postgresql_using='gin',
+              postgresql_ops={'documento': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_cliente_nombre_trgm', 'nombre', postgresql_using='gin',
+              postgresql_ops={'nombre': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_cliente_apellido_trgm', 'apellido', postgresql_using='gin',
+              postgresql_ops={'apellido': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        # Misma expresión que arma la búsqueda: similitud con errores de tipeo y prefijos por palabra
+        Index('ix_cliente_texto_trgm', literal_column("(apellido || ' ' || nombre)").label('texto'),
+              postgresql_using='gin', postgresql_ops={'texto': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_cliente_texto_tsv', text("to_tsvector('simple', apellido || ' ' || nombre)"),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     id_cliente = Column(Integer, primary_key=True)
     documento = Column(String(50), nullable=False, unique=True)
     nombre = Column(String(100), nullable=False)
@@ -1,20 +1,32 @@
 #Crear comandas para los pedidos de los clientes
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Index, Numeric, text, TIMESTAMP
+from sqlalchemy.orm import relationship, validates
 from db import Base
+from utils.fechas import parsear_fecha, formatear_fecha
 
 class Comanda(Base):
     __tablename__ = 'comanda'
+    __table_args__ = (
+        # Validación "la mesa ya tiene una comanda abierta" y filtros por mesa/estado
+        Index('ix_comanda_mesa_estado_baja', 'id_mesa', 'estado', 'baja'),
+        # Índice parcial: solo las comandas abiertas (/comandas/abiertas y chequeos por mesa)
+        Index('ix_comanda_abiertas', 'id_mesa', postgresql_where=text("estado = 'Abierta' AND baja = false")),
+        # Orden por fecha del listado (incluye la PK como desempate del cursor)
+        Index('ix_comanda_fecha', 'fecha', 'id_comanda'),
+        Index('ix_comanda_reserva', 'id_reserva'),
+    )
     
     id_comanda = Column(Integer, primary_key=True)
-    fecha = Column(String(50), nullable=False)
-    fecha_cierre = Column(String(50), nullable=True)
+    fecha = Column(TIMESTAMP, nullable=False)
+    fecha_cierre = Column(TIMESTAMP, nullable=True)
     id_mozo = Column(Integer, ForeignKey('mozo.id'), nullable=False)
     id_mesa = Column(Integer, ForeignKey('mesa.id_mesa'), nullable=False)
     id_reserva = Column(Integer, ForeignKey('reserva.id_reserva'), nullable=True)
     estado = Column(String(20), nullable=False, default='Abierta')
     observaciones = Column(Text, nullable=True)
     baja = Column(Boolean, default=False)
+    # Suma de precio_unitario * cantidad de los detalles; la recalculan las rutas que los modifican (services/totales.py)
+    total = Column(Numeric(12,2), nullable=False, default=0, server_default='0')
     
     # Relaciones
     mesa = relationship("Mesa", back_populates="comandas")
@@ -33,9 +45,15 @@ class Comanda(Base):
         self.estado = estado
         self.observaciones = observaciones
         self.baja = baja
+        self.total = 0
+
+    @validates('fecha', 'fecha_cierre')
+    def _convertir_fecha(self, clave, valor):
+        """Acepta strings 'YYYY-MM-DD[ HH:MM:SS]' además de datetime"""
+        return parsear_fecha(valor)
 
     def calcular_total(self):
-        """Calcula el total de la comanda sumando todos los detalles"""
+        """Suma los detalles cargados en Python (para verificar la columna total)"""
         if not self.detalles:
             return 0.0
         return sum(float(detalle.precio_unitario * detalle.cantidad) for detalle in self.detalles)
@@ -44,8 +62,8 @@ class Comanda(Base):
         detalles_json = [detalle.json() for detalle in self.detalles] if self.detalles else []
         return {
             'id_comanda': self.id_comanda,
-            'fecha': self.fecha,
-            'fecha_cierre': self.fecha_cierre,
+            'fecha': formatear_fecha(self.fecha),
+            'fecha_cierre': formatear_fecha(self.fecha_cierre),
             'id_mozo': self.id_mozo,
             'mozo': self.mozo.json() if self.mozo else None,
             'id_mesa': self.id_mesa,
@@ -57,5 +75,5 @@ class Comanda(Base):
             'observaciones': self.observaciones,
             'baja': self.baja,
             'detalles': detalles_json,
-            'total': self.calcular_total()
+            'total': float(self.total or 0)
         }
\ No newline at end of file
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, Boolean, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, Boolean, ForeignKey, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from db import Base
 
 class DetalleComanda(Base):
     __tablename__ = 'detalle_comanda'
+    __table_args__ = (
+        # Detalles de una comanda y conteo de pendientes de entrega al cerrar
+        Index('ix_detalle_comanda_comanda_entregado', 'id_comanda', 'entregado'),
+    )
     
     id_detalle_comanda = Column(Integer, primary_key=True)
     id_comanda = Column(Integer, ForeignKey('comanda.id_comanda'), nullable=False)
@@ -1,14 +1,27 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, Index, TIMESTAMP, text
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, validates
 from db import Base
+from utils.fechas import parsear_fecha, formatear_fecha
 
 class Factura(Base):
     __tablename__ = 'factura'
+    __table_args__ = (
+        # LIKE 'FACT-YYYYMMDD-%': el índice único usa la collation de la base y no sirve para prefijos
+        Index('ix_factura_codigo_patron', 'codigo', postgresql_ops={'codigo': 'varchar_pattern_ops'}),
+        Index('ix_factura_fecha', 'fecha', 'id_factura'),
+        Index('ix_factura_comanda', 'id_comanda'),
+        # Índice parcial para ?solo_impagas=true (el listado ordena por fecha)
+        Index('ix_factura_impagas', 'fecha', 'id_factura',
+              postgresql_where=text('total_pagado < total AND baja = false')),
+    )
     
     id_factura = Column(Integer, primary_key=True)
     codigo = Column(String(50), nullable=False, unique=True)
-    fecha = Column(String(50), nullable=False)
+    fecha = Column(TIMESTAMP, nullable=False)
     total = Column(Numeric(10,2), nullable=False)
+    # Suma de los pagos; la mantienen las rutas de pago con un UPDATE atómico (services/saldos.py)
+    total_pagado = Column(Numeric(10,2), nullable=False, default=0, server_default='0')
     id_cliente = Column(Integer, ForeignKey('cliente.id_cliente'), nullable=False)
     id_comanda = Column(Integer, ForeignKey('comanda.id_comanda'), nullable=True)
     baja = Column(Boolean, default=False)
@@ -26,29 +39,36 @@ class Factura(Base):
         self.id_cliente = id_cliente
         self.id_comanda = id_comanda
         self.baja = False
+        self.total_pagado = 0
+
+    @validates('fecha')
+    def _convertir_fecha(self, clave, valor):
+        return parsear_fecha(valor)
+
+    @hybrid_property
+    def saldo_pendiente(self):
+        """Total menos lo pagado; en consultas es la expresión SQL equivalente"""
+        return self.total - self.total_pagado
+
+    @hybrid_property
+    def esta_pagada(self):
+        return self.saldo_pendiente <= 0
 
     def calcular_total_pagado(self):
-        """Calcula el total pagado de la factura sumando todos los pagos"""
-        if not self.pagos:
-            return 0.0
-        return sum(float(pago.monto) for pago in self.pagos)
+        """Total pagado de la factura (columna mantenida al crear/modificar/eliminar pagos)"""
+        return float(self.total_pagado or 0)
 
     def calcular_saldo_pendiente(self):
         """Calcula el saldo pendiente de la factura (total - pagado)"""
-        total_pagado = self.calcular_total_pagado()
-        return float(self.total) - total_pagado
-
-    def esta_pagada(self):
-        """Retorna True si la factura está completamente pagada"""
-        return self.calcular_saldo_pendiente() <= 0
+        return float(self.total) - self.calcular_total_pagado()
 
     def json(self):
         total_pagado = self.calcular_total_pagado()
-        saldo_pendiente = self.calcular_saldo_pendiente()
+        saldo_pendiente = float(self.total) - total_pagado
         return {
             'id_factura': self.id_factura,
             'codigo': self.codigo,
-            'fecha': self.fecha,
+            'fecha': formatear_fecha(self.fecha),
             'total': float(self.total),
             'id_cliente': self.id_cliente,
             'cliente': self.cliente.json() if self.cliente else None,
@@ -58,5 +78,5 @@ class Factura(Base):
             'baja': self.baja,
             'total_pagado': total_pagado,
             'saldo_pendiente': saldo_pendiente,
-            'esta_pagada': self.esta_pagada()
+            'esta_pagada': saldo_pendiente <= 0
         }
\ No newline at end of file
@@ -0,0 +1,25 @@
+# Contador de numeración de facturas por día.
+#
+# Reemplaza el cálculo "último código del día + 1" (LIKE + ORDER BY), que
+# recorría las facturas del día y generaba códigos duplicados con cierres
+# concurrentes. Ver services/numeracion.py.
+from sqlalchemy import Column, Integer, Date
+from db import Base
+
+
+class NumeracionFactura(Base):
+    """Último número de factura asignado en cada día"""
+    __tablename__ = 'numeracion_factura'
+
+    dia = Column(Date, primary_key=True)
+    ultimo = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, dia, ultimo=0):
+        self.dia = dia
+        self.ultimo = ultimo
+
+    def json(self):
+        return {
+            'dia': self.dia.isoformat() if self.dia else None,
+            'ultimo': self.ultimo,
+        }
@@ -1,16 +1,21 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Index, TIMESTAMP
+from sqlalchemy.orm import relationship, validates
 from db import Base
+from utils.fechas import parsear_fecha, formatear_fecha
 
 
 class Pago(Base):
     __tablename__ = 'pago'
+    __table_args__ = (
+        Index('ix_pago_factura', 'id_factura'),
+        Index('ix_pago_fecha', 'fecha', 'id_pago'),
+    )
     
     id_pago = Column(Integer, primary_key=True)
     id_factura = Column(Integer, ForeignKey('factura.id_factura'), nullable=False)
     id_medio_pago = Column(Integer, ForeignKey('medio_pago.id_medio_pago'), nullable=False)
     monto = Column(Numeric(10,2), nullable=False)
-    fecha = Column(String(50), nullable=False)
+    fecha = Column(TIMESTAMP, nullable=False)
 
     
     # Relaciones
@@ -23,6 +28,10 @@ class Pago(Base):
         self.monto = monto
         self.fecha = fecha
 
+    @validates('fecha')
+    def _convertir_fecha(self, clave, valor):
+        return parsear_fecha(valor)
+
     def json(self):
         return {
             'id_pago': self.id_pago,
@@ -31,6 +40,6 @@ class Pago(Base):
             'id_medio_pago': self.id_medio_pago,
             'medio_pago_nombre': self.medio_pago.nombre if self.medio_pago else None,
             'monto': float(self.monto),
-            'fecha': self.fecha,
+            'fecha': formatear_fecha(self.fecha),
         }
 
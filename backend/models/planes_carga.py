@@ -0,0 +1,38 @@
+# Planes de carga (eager loading) para serializar modelos sin consultas N+1.
+#
+# Cada plan es la lista de opciones de SQLAlchemy que cubre todas las relaciones
+# que recorre el json() del modelo. Las relaciones a-uno se traen con joinedload
+# (no multiplican filas, así que conviven con LIMIT/OFFSET) y las colecciones con
+# selectinload (una consulta extra por colección, independiente de la cantidad
+# de filas de la página).
+from sqlalchemy.orm import joinedload, selectinload
+
+from .comanda import Comanda
+from .detalle_comanda import DetalleComanda
+from .mesa import Mesa
+from .reserva import Reserva
+
+
+def plan_comanda():
+    """Relaciones que recorre Comanda.json(): mozo, mesa->sector, reserva->cliente/mesa->sector y detalles->producto"""
+    return [
+        joinedload(Comanda.mozo),
+        joinedload(Comanda.mesa).joinedload(Mesa.sector),
+        selectinload(Comanda.reserva).joinedload(Reserva.cliente),
+        selectinload(Comanda.reserva).joinedload(Reserva.mesa).joinedload(Mesa.sector),
+        selectinload(Comanda.detalles).joinedload(DetalleComanda.producto),
+    ]
+
+
+# Plan declarado por endpoint: las rutas piden su plan por nombre para que el
+# grafo de carga quede documentado en un único lugar.
+PLANES_CARGA = {
+    'comandas.listar': plan_comanda,
+    'comandas.abiertas': plan_comanda,
+    'comandas.obtener': plan_comanda,
+}
+
+
+def opciones_carga(endpoint):
+    """Devuelve las opciones de carga registradas para un endpoint"""
+    return PLANES_CARGA[endpoint]()
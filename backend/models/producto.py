@@ -1,9 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DECIMAL, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DECIMAL, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from db import Base
 
 class Producto(Base):
     __tablename__ = 'producto'
+    __table_args__ = (
+        # Búsqueda (services/busqueda.py) y filtro ilike del listado: trigramas (pg_trgm)
+        Index('ix_producto_codigo_trgm', 'codigo', postgresql_using='gin',
+              postgresql_ops={'codigo': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_producto_nombre_trgm', 'nombre', postgresql_using='gin',
+              postgresql_ops={'nombre': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_producto_nombre_tsv', text("to_tsvector('simple', nombre)"),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     id_producto = Column(Integer, primary_key=True)
     codigo = Column(String(50), nullable=False, unique=True)
     nombre = Column(String(255), nullable=False)
@@ -0,0 +1,182 @@
+# Proyecciones planas (view=summary) para los listados.
+#
+# En lugar de materializar el grafo de objetos y serializarlo con json(), cada
+# proyección arma una única consulta con las columnas del listado, los nombres
+# de las entidades relacionadas a-uno y los agregados (saldo, total) calculados
+# en SQL. Las filas tienen como etiquetas los mismos nombres que las
+# claves de la respuesta, así la paginación por cursor puede leer la fecha y la
+# PK directamente de la fila.
+from sqlalchemy import func, select
+
+from .cliente import Cliente
+from .comanda import Comanda
+from .detalle_comanda import DetalleComanda
+from .factura import Factura
+from .mesa import Mesa
+from .mozo import Mozo
+from .producto import Producto, Plato, Postre, Bebida
+from .seccion import Seccion
+from utils.fechas import formatear_fecha
+
+
+def _decimal(valor):
+    return float(valor) if valor is not None else 0.0
+
+
+def consulta_resumen_factura(session):
+    """Facturas con el nombre del cliente; pagado y saldo salen de la columna mantenida total_pagado"""
+    return (
+        session.query(
+            Factura.id_factura, Factura.codigo, Factura.fecha, Factura.total,
+            Factura.id_cliente, Cliente.nombre.label('cliente_nombre'), Cliente.apellido.label('cliente_apellido'),
+            Factura.id_comanda, Factura.baja,
+            Factura.total_pagado.label('total_pagado'),
+            Factura.saldo_pendiente.label('saldo_pendiente'),
+        )
+        .select_from(Factura)
+        .outerjoin(Cliente, Cliente.id_cliente == Factura.id_cliente)
+    )
+
+
+def fila_resumen_factura(fila):
+    saldo = _decimal(fila.saldo_pendiente)
+    return {
+        'id_factura': fila.id_factura,
+        'codigo': fila.codigo,
+        'fecha': formatear_fecha(fila.fecha),
+        'total': _decimal(fila.total),
+        'id_cliente': fila.id_cliente,
+        'cliente_nombre': fila.cliente_nombre,
+        'cliente_apellido': fila.cliente_apellido,
+        'id_comanda': fila.id_comanda,
+        'baja': fila.baja,
+        'total_pagado': _decimal(fila.total_pagado),
+        'saldo_pendiente': saldo,
+        'esta_pagada': saldo <= 0,
+    }
+
+
+def consulta_resumen_comanda(session):
+    """Comandas con mozo y mesa aplanados, el total mantenido y la cantidad de ítems contada en SQL"""
+    cantidad_items = (
+        select(func.count(DetalleComanda.id_detalle_comanda))
+        .where(DetalleComanda.id_comanda == Comanda.id_comanda)
+        .correlate(Comanda)
+        .scalar_subquery()
+    )
+    return (
+        session.query(
+            Comanda.id_comanda, Comanda.fecha, Comanda.fecha_cierre,
+            Comanda.id_mozo, Mozo.nombre_apellido.label('mozo_nombre'),
+            Comanda.id_mesa, Mesa.numero.label('mesa_numero'),
+            Comanda.id_reserva, Comanda.estado, Comanda.baja,
+            cantidad_items.label('cantidad_items'),
+            Comanda.total.label('total'),
+        )
+        .select_from(Comanda)
+        .outerjoin(Mozo, Mozo.id == Comanda.id_mozo)
+        .outerjoin(Mesa, Mesa.id_mesa == Comanda.id_mesa)
+    )
+
+
+def fila_resumen_comanda(fila):
+    return {
+        'id_comanda': fila.id_comanda,
+        'fecha': formatear_fecha(fila.fecha),
+        'fecha_cierre': formatear_fecha(fila.fecha_cierre),
+        'id_mozo': fila.id_mozo,
+        'mozo_nombre': fila.mozo_nombre,
+        'id_mesa': fila.id_mesa,
+        'mesa_numero': fila.mesa_numero,
+        'id_reserva': fila.id_reserva,
+        'estado': fila.estado,
+        'baja': fila.baja,
+        'cantidad_items': fila.cantidad_items,
+        'total': _decimal(fila.total),
+    }
+
+
+# Subtipos del menú en el orden en que se devuelven; 'otros' agrupa productos sin subtipo
+TIPOS_MENU = ('platos', 'postres', 'bebidas', 'otros')
+
+
+def consulta_menu(session):
+    """
+    Menú activo en una consulta: producto + sección y un outer join a cada
+    subtipo (plato/postre/bebida son tablas hijas con la misma PK que producto),
+    así no hace falta cargar cada subtipo y luego su producto.
+    """
+    return (
+        session.query(
+            Producto.id_producto, Producto.codigo, Producto.nombre, Producto.precio,
+            Producto.descripcion, Producto.id_seccion, Seccion.nombre.label('seccion_nombre'),
+            Plato.id_plato, Postre.id_postre, Bebida.id_bebida, Bebida.cm3,
+        )
+        .select_from(Producto)
+        .join(Seccion, Seccion.id_seccion == Producto.id_seccion)
+        .outerjoin(Plato, Plato.id_plato == Producto.id_producto)
+        .outerjoin(Postre, Postre.id_postre == Producto.id_producto)
+        .outerjoin(Bebida, Bebida.id_bebida == Producto.id_producto)
+        .filter(Producto.baja == False, Seccion.baja == False)
+        .order_by(Seccion.nombre, Producto.nombre, Producto.id_producto)
+    )
+
+
+def _tipo_menu(fila):
+    if fila.id_plato is not None:
+        return 'platos'
+    if fila.id_postre is not None:
+        return 'postres'
+    if fila.id_bebida is not None:
+        return 'bebidas'
+    return 'otros'
+
+
+def agrupar_menu(filas):
+    """Filas de consulta_menu -> [{sección, platos, postres, bebidas, otros}] en el orden de la consulta"""
+    secciones = {}
+    for fila in filas:
+        seccion = secciones.get(fila.id_seccion)
+        if seccion is None:
+            seccion = secciones[fila.id_seccion] = {
+                'id_seccion': fila.id_seccion,
+                'nombre': fila.seccion_nombre,
+                **{tipo: [] for tipo in TIPOS_MENU},
+            }
+        item = {
+            'id_producto': fila.id_producto,
+            'codigo': fila.codigo,
+            'nombre': fila.nombre,
+            'precio': _decimal(fila.precio),
+            'descripcion': fila.descripcion,
+        }
+        tipo = _tipo_menu(fila)
+        if tipo == 'bebidas':
+            item['cm3'] = fila.cm3
+        seccion[tipo].append(item)
+    return list(secciones.values())
+
+
+# Proyección declarada por recurso: (consulta, serializador de fila, campos disponibles)
+PROYECCIONES = {
+    'facturas': (consulta_resumen_factura, fila_resumen_factura, (
+        'id_factura', 'codigo', 'fecha', 'total', 'id_cliente', 'cliente_nombre', 'cliente_apellido',
+        'id_comanda', 'baja', 'total_pagado', 'saldo_pendiente', 'esta_pagada',
+    )),
+    'comandas': (consulta_resumen_comanda, fila_resumen_comanda, (
+        'id_comanda', 'fecha', 'fecha_cierre', 'id_mozo', 'mozo_nombre', 'id_mesa', 'mesa_numero',
+        'id_reserva', 'estado', 'baja', 'cantidad_items', 'total',
+    )),
+}
+
+# Claves de json() de cada modelo, para validar fields= con view=full
+CAMPOS_COMPLETOS = {
+    'facturas': (
+        'id_factura', 'codigo', 'fecha', 'total', 'id_cliente', 'cliente', 'id_comanda', 'comanda',
+        'detalles', 'baja', 'total_pagado', 'saldo_pendiente', 'esta_pagada',
+    ),
+    'comandas': (
+        'id_comanda', 'fecha', 'fecha_cierre', 'id_mozo', 'mozo', 'id_mesa', 'mesa', 'id_reserva',
+        'reserva', 'estado', 'observaciones', 'baja', 'detalles', 'total',
+    ),
+}
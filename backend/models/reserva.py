@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, func, Index, text
 from sqlalchemy.orm import relationship
 from db import Base
 
 
 class Reserva(Base):
     __tablename__ = 'reserva'
+    __table_args__ = (
+        # Disponibilidad de una mesa: solo interesan las reservas vigentes
+        Index('ix_reserva_mesa_fecha', 'id_mesa', 'fecha_hora', postgresql_where=text('cancelado = false')),
+        Index('ix_reserva_fecha', 'fecha_hora'),
+    )
 
     id_reserva = Column(Integer, primary_key=True)
     numero = Column(Integer, nullable=False, unique=True)
@@ -0,0 +1,58 @@
+# Resúmenes diarios materializados para los reportes.
+#
+# Se actualizan en la misma transacción que la factura / el pago que los
+# origina (ver services/resumenes.py), así los reportes agregan O(días) filas
+# en lugar de recorrer todo el historial de facturas y pagos.
+from sqlalchemy import Column, Integer, Date, Numeric, ForeignKey
+from db import Base
+
+
+class ResumenVentaDiaria(Base):
+    """Ventas facturadas por día × producto × mozo"""
+    __tablename__ = 'resumen_venta_diaria'
+
+    dia = Column(Date, primary_key=True)
+    id_producto = Column(Integer, ForeignKey('producto.id_producto'), primary_key=True)
+    id_mozo = Column(Integer, ForeignKey('mozo.id'), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    total = Column(Numeric(12, 2), nullable=False, default=0)
+
+    def __init__(self, dia, id_producto, id_mozo, cantidad=0, total=0):
+        self.dia = dia
+        self.id_producto = id_producto
+        self.id_mozo = id_mozo
+        self.cantidad = cantidad
+        self.total = total
+
+    def json(self):
+        return {
+            'dia': self.dia.isoformat() if self.dia else None,
+            'id_producto': self.id_producto,
+            'id_mozo': self.id_mozo,
+            'cantidad': self.cantidad,
+            'total': float(self.total),
+        }
+
+
+class ResumenCobroDiario(Base):
+    """Pagos cobrados por día × medio de pago"""
+    __tablename__ = 'resumen_cobro_diario'
+
+    dia = Column(Date, primary_key=True)
+    id_medio_pago = Column(Integer, ForeignKey('medio_pago.id_medio_pago'), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    total = Column(Numeric(12, 2), nullable=False, default=0)
+
+    def __init__(self, dia, id_medio_pago, cantidad=0, total=0):
+        self.dia = dia
+        self.id_medio_pago = id_medio_pago
+        self.cantidad = cantidad
+        self.total = total
+
+    def json(self):
+        return {
+            'dia': self.dia.isoformat() if self.dia else None,
+            'id_medio_pago': self.id_medio_pago,
+            'cantidad': self.cantidad,
+            'total': float(self.total),
+        }
@@ -0,0 +1,28 @@
+# Contador de versión por recurso de catálogo (productos, secciones, mesas...).
+#
+# Las rutas de escritura lo incrementan en la misma transacción que el cambio y
+# los GET de catálogo lo usan como ETag: si el cliente ya tiene esa versión se
+# responde 304 sin consultar el catálogo. Ver services/versiones.py.
+from sqlalchemy import Column, String, BigInteger, DateTime
+from db import Base
+
+
+class VersionRecurso(Base):
+    """Versión actual de un recurso cacheable por los clientes"""
+    __tablename__ = 'version_recurso'
+
+    recurso = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    actualizado = Column(DateTime, nullable=False)
+
+    def __init__(self, recurso, actualizado, version=0):
+        self.recurso = recurso
+        self.version = version
+        self.actualizado = actualizado
+
+    def json(self):
+        return {
+            'recurso': self.recurso,
+            'version': self.version,
+            'actualizado': self.actualizado.strftime('%Y-%m-%d %H:%M:%S') if self.actualizado else None,
+        }
@@ -11,6 +11,8 @@ from .comanda_routes import comanda_bp
 from .factura_routes import factura_bp
 from .pago_routes import pago_bp
 from .reporte_routes import reporte_bp
+from .sistema_routes import sistema_bp
+from .busqueda_routes import busqueda_bp
 
 api_bp = Blueprint('api', __name__)
 api_bp.register_blueprint(seccion_bp, url_prefix='/secciones')
@@ -25,3 +27,5 @@ api_bp.register_blueprint(comanda_bp, url_prefix='/comandas')
 api_bp.register_blueprint(factura_bp, url_prefix='/facturas')
 api_bp.register_blueprint(pago_bp, url_prefix='/pagos')
 api_bp.register_blueprint(reporte_bp,url_prefix='/reportes')
+api_bp.register_blueprint(sistema_bp, url_prefix='/sistema')
+api_bp.register_blueprint(busqueda_bp, url_prefix='/buscar')
@@ -0,0 +1,50 @@
+from flask import Blueprint, jsonify, request
+from db import con_sesion_lectura
+from services.busqueda import BUSCADORES, MAX_RESULTADOS, palabras
+
+busqueda_bp = Blueprint('busqueda', __name__)
+
+
+@busqueda_bp.route('/', methods=['GET'])
+@con_sesion_lectura
+def buscar(session):
+    """
+    Búsqueda unificada para los selectores "mientras se escribe".
+    ?q=texto (cada palabra matchea el comienzo de una palabra; documento/código por prefijo)
+    ?tipo=clientes,productos (default: ambos)
+    ?limite=N por tipo (default 10, máximo 50)
+    Resultados ordenados por relevancia.
+    """
+    try:
+        termino = request.args.get('q', default='', type=str)
+        tipos = request.args.get('tipo', default=','.join(BUSCADORES), type=str)
+        limite = request.args.get('limite', default=10, type=int)
+
+        if not palabras(termino):
+            return jsonify({
+                'status': 'error',
+                'message': 'El parámetro q es requerido'
+            }), 400
+        tipos = [t.strip() for t in tipos.split(',') if t.strip()]
+        invalidos = [t for t in tipos if t not in BUSCADORES]
+        if not tipos or invalidos:
+            return jsonify({
+                'status': 'error',
+                'message': f'tipo debe ser uno o más de: {", ".join(BUSCADORES)}'
+            }), 400
+        if limite is None or not 1 <= limite <= MAX_RESULTADOS:
+            return jsonify({
+                'status': 'error',
+                'message': f'limite debe ser un entero entre 1 y {MAX_RESULTADOS}'
+            }), 400
+
+        data = {tipo: BUSCADORES[tipo](session, termino, limite) for tipo in tipos}
+        return jsonify({
+            'status': 'success',
+            'data': data
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error al buscar: {str(e)}'
+        }), 500
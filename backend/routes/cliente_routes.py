@@ -1,16 +1,21 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Cliente
+from services.autocompletado import indice_clientes, MAX_SUGERENCIAS
+from services.versiones import versionar_en_escrituras
+from utils.paginacion import paginar, ParametroInvalido
 
 cliente_bp = Blueprint('cliente', __name__)
+# Las escrituras invalidan el índice de autocompletado (en todos los workers)
+versionar_en_escrituras(cliente_bp, 'clientes')
 
 @cliente_bp.route('/', methods=['GET'])
-def listar_clientes():
+@con_sesion_lectura
+def listar_clientes(session):
     """
     Lista todos los clientes con filtros y paginación.
     Filtros: documento, nombre, apellido, estado
     """
-    session = SessionLocal()
     try:
         # --- Parámetros de Filtro para Cliente ---
         documento = request.args.get('documento', type=str)
@@ -19,16 +24,6 @@ def listar_clientes():
         estado = request.args.get('estado', type=str)  # 'activa' o 'baja'
         ordenar_por = request.args.get('ordenar_por', default='apellido', type=str)
         
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(Cliente)
         
         # --- Filtros ---
@@ -50,49 +45,78 @@ def listar_clientes():
         
         # --- Ordenamiento ---
         if ordenar_por == 'documento':
-            query = query.order_by(Cliente.documento)
+            orden = [(Cliente.documento, False)]
         elif ordenar_por == 'nombre':
-            query = query.order_by(Cliente.nombre)
+            orden = [(Cliente.nombre, False)]
         else:
             # Default
-            query = query.order_by(Cliente.apellido)
+            orden = [(Cliente.apellido, False)]
         
-        # Contar total antes de paginar
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        clientes = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        clientes, pagination = paginar(query, Cliente, orden)
         data = [c.json() for c in clientes]
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar clientes: {str(e)}'
         }), 500
-    finally:
-        session.close()
+
+
+@cliente_bp.route('/autocomplete', methods=['GET'])
+@con_sesion_lectura
+def autocompletar_clientes(session):
+    """
+    Sugerencias mientras se escribe: clientes activos cuyo documento o apellido
+    empieza con ?q (sin distinguir mayúsculas ni acentos en el apellido).
+    ?limite=N (default 10, máximo 20). Devuelve solo id_cliente, documento y
+    nombre ('Apellido, Nombre').
+    """
+    try:
+        prefijo = request.args.get('q', default='', type=str)
+        limite = request.args.get('limite', default=10, type=int)
+
+        if not prefijo.strip():
+            return jsonify({
+                'status': 'error',
+                'message': 'El parámetro q es requerido'
+            }), 400
+        if limite is None or not 1 <= limite <= MAX_SUGERENCIAS:
+            return jsonify({
+                'status': 'error',
+                'message': f'limite debe ser un entero entre 1 y {MAX_SUGERENCIAS}'
+            }), 400
+
+        data = [{
+            'id_cliente': c.id_cliente,
+            'documento': c.documento,
+            'nombre': f'{c.apellido}, {c.nombre}',
+        } for c in indice_clientes.sugerencias(session, prefijo, limite)]
+        return jsonify({
+            'status': 'success',
+            'data': data
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error al autocompletar clientes: {str(e)}'
+        }), 500
 
 
 @cliente_bp.route('/', methods=['POST'])
-def crear_cliente():
+@con_sesion
+def crear_cliente(session):
     """Crea un nuevo cliente en la base de datos."""
-    session = SessionLocal()
     try:
         data = request.get_json()
         
@@ -144,14 +168,12 @@ def crear_cliente():
             'status': 'error',
             'message': f'Error al crear cliente: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @cliente_bp.route('/<int:id>', methods=['GET'])
-def obtener_cliente(id):
+@con_sesion
+def obtener_cliente(session, id):
     """Obtiene un cliente específico por su ID."""
-    session = SessionLocal()
     try:
         cliente = session.query(Cliente).get(id)
         
@@ -171,14 +193,12 @@ def obtener_cliente(id):
             'status': 'error',
             'message': f'Error al obtener cliente: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @cliente_bp.route('/<int:id>', methods=['PUT'])
-def modificar_cliente(id):
+@con_sesion
+def modificar_cliente(session, id):
     """Modifica un cliente existente."""
-    session = SessionLocal()
     try:
         data = request.get_json()
         cliente = session.query(Cliente).get(id)
@@ -232,14 +252,12 @@ def modificar_cliente(id):
             'status': 'error',
             'message': f'Error al modificar cliente: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @cliente_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_cliente(id):
+@con_sesion
+def eliminar_cliente(session, id):
     """Realiza una baja lógica de un cliente."""
-    session = SessionLocal()
     try:
         cliente = session.query(Cliente).get(id)
         
@@ -271,6 +289,4 @@ def eliminar_cliente(id):
         return jsonify({
             'status': 'error',
             'message': f'Error al dar de baja el cliente: {str(e)}'
-        }), 500
-    finally:
-        session.close()
\ No newline at end of file
+        }), 500
\ No newline at end of file
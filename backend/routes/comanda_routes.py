@@ -1,14 +1,96 @@
-from flask import Blueprint, jsonify, request
-from db import SessionLocal
-from models import Comanda, Mesa, Mozo, Producto, DetalleComanda
+import json
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, jsonify, request
+from db import con_sesion, con_sesion_lectura
+from models import Comanda, Mesa, Mozo, DetalleComanda
 from models.reserva import Reserva
+from models.planes_carga import opciones_carga
+from utils.paginacion import paginar, ParametroInvalido
+from utils.proyecciones import parametros_proyeccion, consulta_resumen, serializar
+from utils.fechas import parsear_fecha, es_solo_fecha, rango_dia
 from datetime import datetime
+from sqlalchemy import insert, update, delete
+from services.cache import invalidar_en_escrituras
+from services.totales import recalcular_total_comanda
+from services.eventos import difusor, emitir, iniciar_escucha
+from services.catalogo import catalogo
 
 comanda_bp = Blueprint('comanda', __name__)
 
+# Las escrituras cambian los datos de los reportes cacheados
+invalidar_en_escrituras(comanda_bp, 'reportes')
+
+
+def _precios_activos(session, ids_producto):
+    """{id_producto: precio} de los productos activos indicados (desde la caché del catálogo)"""
+    return catalogo.precios_activos(session, ids_producto)
+
+
+def _armar_detalles(session, id_comanda, productos):
+    """
+    Valida los ítems [{id_producto, cantidad}] de una comanda nueva y arma las
+    filas de detalle con los precios de la caché del catálogo. Devuelve (filas,
+    errores); cada error indica la posición del ítem y el motivo del rechazo.
+    Las filas se insertan con `_insertar_detalles` en un solo executemany.
+    """
+    errores = []
+    validos = []
+    for indice, producto_data in enumerate(productos):
+        if not isinstance(producto_data, dict):
+            errores.append({'indice': indice, 'id_producto': None, 'error': 'Formato de ítem inválido'})
+            continue
+        id_producto = producto_data.get('id_producto')
+        try:
+            id_producto = int(id_producto)
+            cantidad = int(producto_data.get('cantidad', 1))
+        except (ValueError, TypeError):
+            errores.append({'indice': indice, 'id_producto': id_producto, 'error': 'id_producto y cantidad deben ser números válidos'})
+            continue
+        if cantidad <= 0:
+            errores.append({'indice': indice, 'id_producto': id_producto, 'error': 'La cantidad debe ser mayor a 0'})
+            continue
+        validos.append((indice, id_producto, cantidad))
+
+    precios = _precios_activos(session, {id_producto for _, id_producto, _ in validos})
+
+    detalles = []
+    for indice, id_producto, cantidad in validos:
+        if id_producto not in precios:
+            errores.append({'indice': indice, 'id_producto': id_producto, 'error': f'No existe un producto activo con id {id_producto}'})
+            continue
+        detalles.append({
+            'id_comanda': id_comanda,
+            'id_producto': id_producto,
+            'cantidad': cantidad,
+            'precio_unitario': precios[id_producto],
+            'entregado': False
+        })
+    errores.sort(key=lambda e: e['indice'])
+    return detalles, errores
+
+
+def _insertar_detalles(session, filas):
+    """
+    Inserta las filas en un solo executemany y devuelve (id_detalle_comanda,
+    id_producto, cantidad) de cada una. Sin sort_by_parameter_order (en SQLite
+    lo haría de a una fila): el orden puede diferir del de `filas`, pero dos
+    filas con el mismo producto y cantidad son intercambiables.
+    """
+    if not filas:
+        return []
+    return session.execute(
+        insert(DetalleComanda).returning(
+            DetalleComanda.id_detalle_comanda, DetalleComanda.id_producto, DetalleComanda.cantidad
+        ),
+        filas
+    ).all()
+
 @comanda_bp.route('/', methods=['GET'])
-def listar_comandas():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_comandas(session):
     try:
         # Obtener parámetros de filtro
         id_mozo = request.args.get('id_mozo', type=int)
@@ -16,99 +98,218 @@ def listar_comandas():
         fecha = request.args.get('fecha', type=str)
         estado = request.args.get('estado', type=str)  # 'abierta', 'cerrada', 'cancelada', 'activa', 'baja'
         ordenar_por = request.args.get('ordenar_por', default='fecha', type=str)
+        vista, campos = parametros_proyeccion('comandas')
 
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-
-        query = session.query(Comanda)
+        if vista == 'summary':
+            query = consulta_resumen(session, 'comandas')
+        else:
+            # Plan de carga para evitar N+1 en json()
+            query = session.query(Comanda).options(*opciones_carga('comandas.listar'))
 
         # Filtros
         if id_mozo:
-            query = query.filter_by(id_mozo=id_mozo)
+            query = query.filter(Comanda.id_mozo == id_mozo)
         if id_mesa:
-            query = query.filter_by(id_mesa=id_mesa)
+            query = query.filter(Comanda.id_mesa == id_mesa)
         if fecha:
-            query = query.filter_by(fecha=fecha)
+            # Un día completo se filtra como rango para aprovechar el índice sobre fecha
+            try:
+                if es_solo_fecha(fecha):
+                    inicio, fin = rango_dia(fecha)
+                    query = query.filter(Comanda.fecha >= inicio, Comanda.fecha < fin)
+                else:
+                    query = query.filter(Comanda.fecha == parsear_fecha(fecha))
+            except ValueError as e:
+                return jsonify({'status':'error', 'message': str(e)}), 400
         
         # Filtros de estado
         if estado == 'abierta':
-            query = query.filter_by(estado='Abierta', baja=False)
+            query = query.filter(Comanda.estado == 'Abierta', Comanda.baja == False)
         elif estado == 'cerrada':
-            query = query.filter_by(estado='Cerrada', baja=False)
+            query = query.filter(Comanda.estado == 'Cerrada', Comanda.baja == False)
         elif estado == 'cancelada':
-            query = query.filter_by(estado='Cancelada', baja=False)
+            query = query.filter(Comanda.estado == 'Cancelada', Comanda.baja == False)
         elif estado == 'activa':
-            query = query.filter_by(baja=False)
+            query = query.filter(Comanda.baja == False)
         elif estado == 'baja':
-            query = query.filter_by(baja=True)
+            query = query.filter(Comanda.baja == True)
         else:
             # Por defecto solo mostrar activas (no dadas de baja)
-            query = query.filter_by(baja=False)
+            query = query.filter(Comanda.baja == False)
         
         # Ordenamiento
+        orden = []
         if ordenar_por == 'fecha':
-            query = query.order_by(Comanda.fecha.desc())
+            orden = [(Comanda.fecha, True)]
         elif ordenar_por == 'fecha_asc':
-            query = query.order_by(Comanda.fecha)
+            orden = [(Comanda.fecha, False)]
         elif ordenar_por == 'id_mozo':
-            query = query.order_by(Comanda.id_mozo)
+            orden = [(Comanda.id_mozo, False)]
         elif ordenar_por == 'estado':
-            query = query.order_by(Comanda.estado)
-
-        # Contar total antes de paginar
-        total = query.count()
+            orden = [(Comanda.estado, False)]
 
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        comandas = query.offset(offset).limit(per_page).all()
-        data = [c.json() for c in comandas]
+        # Paginación (offset o cursor)
+        comandas, pagination = paginar(query, Comanda, orden)
+        data = serializar(comandas, 'comandas', vista, campos)
 
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({'status':'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status':'error', 'message': f'Error al listar las comandas: {str(e)}'}), 500
-    finally:
-        session.close()
+
+def datos_comandas_abiertas(session):
+    """Comandas abiertas serializadas (compartido con el modo ASGI, ver asgi.py)"""
+    comandas = (
+        session.query(Comanda)
+        .options(*opciones_carga('comandas.abiertas'))
+        .filter_by(estado='Abierta', baja=False)
+        .all()
+    )
+    return [c.json() for c in comandas]
 
 @comanda_bp.route('/abiertas', methods=['GET'])
-def listar_comandas_abiertas():
+@con_sesion_lectura
+def listar_comandas_abiertas(session):
     """Lista solo las comandas abiertas (estado='Abierta' y baja=False)"""
-    session = SessionLocal()
     try:
-        comandas = session.query(Comanda).filter_by(estado='Abierta', baja=False).all()
-        data = [c.json() for c in comandas]
+        data = datos_comandas_abiertas(session)
         return jsonify({
             'status': 'success',
             'data': data
         }), 200
     except Exception as e:
         return jsonify({'status':'error', 'message': f'Error al listar comandas abiertas: {str(e)}'}), 500
+
+# ========== FEED DE CAMBIOS (LONG-POLL / SSE) ==========
+
+ESPERA_MAXIMA = 30          # segundos que puede bloquear un long-poll
+SSE_KEEPALIVE = 15          # comentario vacío para que los proxies no corten la conexión
+SSE_DURACION_MAXIMA = 300   # luego el cliente reconecta solo con Last-Event-ID
+
+# Con gunicorn gthread cada long-poll o stream SSE retiene un hilo del worker.
+# Se limitan las esperas simultáneas por proceso (por defecto todos los hilos
+# menos uno, que queda para el resto de la API). Pasado el límite el long-poll
+# recibe 503 con Retry-After (responder enseguida haría que el cliente vuelva a
+# preguntar sin pausa) y el SSE manda lo pendiente y cierra: el navegador
+# reconecta a los `retry` ms. Para muchas terminales conviene el modo ASGI
+# (asgi.py), que atiende /eventos en el event loop sin este límite.
+MAX_ESPERAS_EVENTOS = int(os.getenv('EVENTOS_MAX_ESPERAS') or max(1, int(os.getenv('GUNICORN_THREADS') or 4) - 1))
+REINTENTO_ESPERAS = 5       # segundos del Retry-After cuando se alcanza el límite
+_esperas_eventos = threading.BoundedSemaphore(MAX_ESPERAS_EVENTOS)
+
+
+def evento_sse(id_evento, tipo, datos):
+    return f'id: {id_evento}\nevent: {tipo}\ndata: {json.dumps(datos)}\n\n'
+
+
+def parametros_eventos(args, headers):
+    """
+    (desde, espera) de un pedido a /eventos. Sin `desde` (ni Last-Event-ID) se
+    arranca desde el último evento, sin esperar. ValueError si son inválidos.
+    """
+    desde = args.get('desde', default=headers.get('Last-Event-ID'))
+    espera = float(args.get('espera', default=25))
+    if not 0 <= espera <= ESPERA_MAXIMA:
+        raise ValueError
+    if desde in (None, ''):
+        return difusor.ultimo_id, 0
+    difusor.numero(desde)
+    return desde, espera
+
+
+def cuerpo_long_poll(eventos, resync, desde):
+    if eventos:
+        ultimo_id = eventos[-1]['id']
+    else:
+        ultimo_id = difusor.ultimo_id if resync else desde
+    return {'status': 'success', 'data': eventos, 'ultimo_id': ultimo_id, 'resync': resync}
+
+
+def bloques_sse(eventos, resync, desde):
+    """(texto SSE, nuevo `desde`) para el resultado de una espera"""
+    if resync:
+        desde = difusor.ultimo_id
+        return evento_sse(desde, 'resync', {}), desde
+    if eventos:
+        return ''.join(evento_sse(e['id'], e['tipo'], e) for e in eventos), eventos[-1]['id']
+    return ': keepalive\n\n', desde
+
+
+def _stream_eventos(desde):
+    yield 'retry: 3000\n\n'
+    if not _esperas_eventos.acquire(blocking=False):
+        # Worker al límite de esperas: lo pendiente y se cierra (el cliente reconecta)
+        bloque, _ = bloques_sse(*difusor.esperar(desde, 0), desde)
+        yield bloque
+        return
+    try:
+        fin = time.monotonic() + SSE_DURACION_MAXIMA
+        while True:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            bloque, desde = bloques_sse(*difusor.esperar(desde, min(SSE_KEEPALIVE, restante)), desde)
+            yield bloque
     finally:
-        session.close()
+        _esperas_eventos.release()
+
+
+@comanda_bp.route('/eventos', methods=['GET'])
+def eventos_comandas():
+    """
+    Cambios de las comandas posteriores al id `desde` (o al header Last-Event-ID):
+    comanda_abierta/modificada/cerrada/cancelada y detalle_agregado/modificado/
+    entregado/eliminado, con los ids afectados en `datos`.
+
+    - Accept: text/event-stream -> Server-Sent Events.
+    - Si no, long-poll: responde apenas hay eventos o a los `espera` segundos
+      (default 25, máximo 30). Sin `desde` responde enseguida con `ultimo_id`
+      para empezar a seguir el feed.
+    Con resync=true se perdieron eventos (o el id es de otro worker o de antes
+    de un reinicio): volver a pedir /comandas/abiertas.
+    """
+    try:
+        desde, espera = parametros_eventos(request.args, request.headers)
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': f'"desde" debe ser un id de evento y "espera" un número entre 0 y {ESPERA_MAXIMA}'
+        }), 400
+
+    iniciar_escucha()
+
+    if request.accept_mimetypes.best == 'text/event-stream':
+        return Response(
+            _stream_eventos(desde),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    if not espera:
+        eventos, resync = difusor.esperar(desde, 0)
+    elif _esperas_eventos.acquire(blocking=False):
+        try:
+            eventos, resync = difusor.esperar(desde, espera)
+        finally:
+            _esperas_eventos.release()
+    else:
+        respuesta = jsonify({
+            'status': 'error',
+            'message': 'Demasiados clientes esperando eventos en este proceso; reintentar más tarde'
+        })
+        respuesta.headers['Retry-After'] = str(REINTENTO_ESPERAS)
+        return respuesta, 503
+    return jsonify(cuerpo_long_poll(eventos, resync, desde)), 200
 
 @comanda_bp.route('/desde-reserva', methods=['POST'])
-def crear_comanda_desde_reserva():
+@con_sesion
+def crear_comanda_desde_reserva(session):
     """Crear una comanda asociada a una reserva existente"""
-    session = SessionLocal()
     try:
         data = request.get_json()
         
@@ -128,6 +329,9 @@ def crear_comanda_desde_reserva():
             id_mozo = int(data['id_mozo'])
         except (ValueError, TypeError):
             return jsonify({'status': 'error', 'message': 'Los IDs deben ser números válidos'}), 400
+        productos = data.get('productos') or []
+        if not isinstance(productos, list):
+            return jsonify({'status': 'error', 'message': 'El campo "productos" debe ser una lista'}), 400
         
         # 1. Validar que la reserva existe
         reserva = session.query(Reserva).get(id_reserva)
@@ -187,9 +391,8 @@ def crear_comanda_desde_reserva():
             }), 400
         
         # 8. Crear la comanda con la información de la reserva
-        fecha_actual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         nueva_comanda = Comanda(
-            fecha=fecha_actual,
+            fecha=datetime.now(),
             id_mozo=id_mozo,
             id_mesa=mesa.id_mesa,
             id_reserva=id_reserva,
@@ -199,36 +402,14 @@ def crear_comanda_desde_reserva():
         session.add(nueva_comanda)
         session.flush()  # Para obtener el id_comanda
         
-        # 9. Agregar productos si se proporcionan
-        productos = data.get('productos', [])
-        if productos:
-            for producto_data in productos:
-                id_producto = producto_data.get('id_producto')
-                cantidad = producto_data.get('cantidad', 1)
-                
-                try:
-                    id_producto = int(id_producto)
-                    cantidad = int(cantidad)
-                except (ValueError, TypeError):
-                    continue
-                
-                if not id_producto or cantidad <= 0:
-                    continue
-                
-                # Validar que el producto existe y está activo
-                producto = session.query(Producto).filter_by(id_producto=id_producto, baja=False).first()
-                if not producto:
-                    continue
-                
-                # Crear detalle de comanda
-                detalle = DetalleComanda(
-                    id_comanda=nueva_comanda.id_comanda,
-                    id_producto=id_producto,
-                    cantidad=cantidad,
-                    precio_unitario=producto.precio,
-                    entregado=False
-                )
-                session.add(detalle)
+        # 9. Agregar productos si se proporcionan (una consulta para todos los productos)
+        detalles, errores_productos = _armar_detalles(session, nueva_comanda.id_comanda, productos)
+        _insertar_detalles(session, detalles)
+        if detalles:
+            recalcular_total_comanda(session, nueva_comanda.id_comanda)
+        
+        emitir(session, 'comanda_abierta', id_comanda=nueva_comanda.id_comanda,
+               id_mesa=mesa.id_mesa, id_mozo=id_mozo)
         
         # 10. Actualizar estado de la reserva a "en_curso"
         reserva.estado = 'en_curso'
@@ -239,21 +420,23 @@ def crear_comanda_desde_reserva():
         
         session.commit()
         
-        return jsonify({
+        respuesta = {
             'status': 'success',
             'message': 'Comanda creada exitosamente desde la reserva',
             'data': nueva_comanda.json()
-        }), 201
+        }
+        if errores_productos:
+            respuesta['message'] = f'Comanda creada desde la reserva con {len(errores_productos)} producto(s) rechazado(s)'
+            respuesta['errores_productos'] = errores_productos
+        return jsonify(respuesta), 201
     
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': f'Error al crear comanda desde reserva: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/', methods=['POST'])
-def create_comanda():
-    session = SessionLocal()
+@con_sesion
+def create_comanda(session):
     try:
         data = request.get_json()
 
@@ -263,6 +446,13 @@ def create_comanda():
         # Validar campos obligatorios
         if 'fecha' not in data or data['fecha'] is None or data['fecha'] == '':
             return jsonify({'status':'error', 'message': f'El campo "fecha" es requerido'}), 400
+        try:
+            fecha = parsear_fecha(data['fecha'])
+        except ValueError as e:
+            return jsonify({'status':'error', 'message': str(e)}), 400
+        productos = data.get('productos') or []
+        if not isinstance(productos, list):
+            return jsonify({'status':'error', 'message': 'El campo "productos" debe ser una lista'}), 400
         
         # ✅ CONVERTIR id_mozo a entero (o None si está vacío)
         id_mozo = data.get('id_mozo')
@@ -307,7 +497,7 @@ def create_comanda():
         
         # Crear comanda (el cliente se asocia únicamente a la factura)
         nueva_comanda = Comanda(
-            fecha=data['fecha'],
+            fecha=fecha,
             id_mozo=id_mozo,
             id_mesa=id_mesa,
             estado='Abierta',
@@ -316,57 +506,40 @@ def create_comanda():
         session.add(nueva_comanda)
         session.flush()  # Para obtener el id_comanda
         
-        # Agregar productos si se proporcionan
-        productos = data.get('productos', [])
-        if productos:
-            for producto_data in productos:
-                id_producto = producto_data.get('id_producto')
-                cantidad = producto_data.get('cantidad', 1)
-                
-                # ✅ Convertir a enteros
-                try:
-                    id_producto = int(id_producto)
-                    cantidad = int(cantidad)
-                except (ValueError, TypeError):
-                    continue
-                
-                if not id_producto or cantidad <= 0:
-                    continue
-                
-                # Validar que el producto existe y está activo
-                producto = session.query(Producto).filter_by(id_producto=id_producto, baja=False).first()
-                if not producto:
-                    continue
-                
-                # Crear detalle de comanda
-                detalle = DetalleComanda(
-                    id_comanda=nueva_comanda.id_comanda,
-                    id_producto=id_producto,
-                    cantidad=cantidad,
-                    precio_unitario=producto.precio,
-                    entregado=False
-                )
-                session.add(detalle)
+        # Agregar productos si se proporcionan (una consulta para todos los productos)
+        detalles, errores_productos = _armar_detalles(session, nueva_comanda.id_comanda, productos)
+        _insertar_detalles(session, detalles)
+        if detalles:
+            recalcular_total_comanda(session, nueva_comanda.id_comanda)
+        emitir(session, 'comanda_abierta', id_comanda=nueva_comanda.id_comanda,
+               id_mesa=id_mesa, id_mozo=id_mozo)
         
         session.commit()
 
-        return jsonify({
+        respuesta = {
             'status':'success',
             'message': 'Comanda creada exitosamente',
             'data': nueva_comanda.json()
-        }), 201
+        }
+        if errores_productos:
+            respuesta['message'] = f'Comanda creada con {len(errores_productos)} producto(s) rechazado(s)'
+            respuesta['errores_productos'] = errores_productos
+        return jsonify(respuesta), 201
     
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al crear la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id_comanda>', methods=['GET'])
-def obtener_comanda(id_comanda):
-    session = SessionLocal()
+@con_sesion
+def obtener_comanda(session, id_comanda):
     try:
-        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
+        comanda = (
+            session.query(Comanda)
+            .options(*opciones_carga('comandas.obtener'))
+            .filter_by(id_comanda=id_comanda)
+            .first()
+        )
         if not comanda:
             return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
         
@@ -376,12 +549,10 @@ def obtener_comanda(id_comanda):
         }), 200
     except Exception as e:
         return jsonify({'status':'error', 'message': f'Error al obtener la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id>', methods=['PUT'])
-def modificar_comanda(id):
-    session = SessionLocal()
+@con_sesion
+def modificar_comanda(session, id):
     try:
         data = request.get_json()
         if not data:
@@ -400,7 +571,10 @@ def modificar_comanda(id):
         
         # Actualizar campos permitidos
         if 'fecha' in data:
-            comanda.fecha = data['fecha']
+            try:
+                comanda.fecha = parsear_fecha(data['fecha'])
+            except ValueError as e:
+                return jsonify({'status':'error', 'message': str(e)}), 400
 
         if 'id_mozo' in data:
             
@@ -436,6 +610,7 @@ def modificar_comanda(id):
         if 'observaciones' in data:
             comanda.observaciones = data['observaciones']
         
+        emitir(session, 'comanda_modificada', id_comanda=id)
         session.commit()
         return jsonify({
             'status':'success',
@@ -445,12 +620,10 @@ def modificar_comanda(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al modificar la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_comanda(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_comanda(session, id):
     try:
         comanda = session.query(Comanda).filter_by(id_comanda=id).first()
         if not comanda:
@@ -463,6 +636,7 @@ def eliminar_comanda(id):
         if comanda.estado == 'Abierta':
             comanda.estado = 'Cancelada'
         comanda.baja = True
+        emitir(session, 'comanda_cancelada', id_comanda=id)
         session.commit()
         return jsonify({
             'status':'success',
@@ -472,15 +646,13 @@ def eliminar_comanda(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al cancelar la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 # ========== RUTAS PARA GESTIÓN DE PRODUCTOS ==========
 
 @comanda_bp.route('/<int:id_comanda>/productos', methods=['POST'])
-def agregar_producto_comanda(id_comanda):
+@con_sesion
+def agregar_producto_comanda(session, id_comanda):
     """Agregar un producto a una comanda abierta"""
-    session = SessionLocal()
     try:
         data = request.get_json()
         
@@ -491,14 +663,19 @@ def agregar_producto_comanda(id_comanda):
         if 'id_producto' not in data or 'cantidad' not in data:
             return jsonify({'status':'error', 'message': 'Los campos "id_producto" y "cantidad" son requeridos'}), 400
         
-        id_producto = data['id_producto']
+        # "5" se acepta como 5 (como hacía la búsqueda por clave primaria)
+        id_producto = _como_id(data['id_producto'])
         cantidad = data['cantidad']
         
+        if id_producto is None:
+            return jsonify({'status':'error', 'message': 'El id_producto debe ser un número entero positivo'}), 400
+
         if not isinstance(cantidad, int) or cantidad <= 0:
             return jsonify({'status':'error', 'message': 'La cantidad debe ser un número entero positivo'}), 400
         
-        # Validar que la comanda existe y está abierta
-        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
+        # Validar que la comanda existe y está abierta. Se bloquea la fila: otra
+        # escritura de detalles espera y recalcula el total viendo este cambio
+        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).with_for_update().first()
         if not comanda:
             return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
         
@@ -508,9 +685,9 @@ def agregar_producto_comanda(id_comanda):
                 'message': f'No se pueden agregar productos a una comanda con estado "{comanda.estado}". Solo se pueden agregar productos a comandas abiertas.'
             }), 400
         
-        # Validar que el producto existe y está activo
-        producto = session.query(Producto).filter_by(id_producto=id_producto, baja=False).first()
-        if not producto:
+        # Validar que el producto existe y está activo (el precio se toma de la caché del catálogo)
+        precio = _precios_activos(session, {id_producto}).get(id_producto)
+        if precio is None:
             return jsonify({'status':'error', 'message': f'No existe un producto activo con id_producto {id_producto}'}), 400
         
         # Crear detalle de comanda
@@ -518,10 +695,13 @@ def agregar_producto_comanda(id_comanda):
             id_comanda=id_comanda,
             id_producto=id_producto,
             cantidad=cantidad,
-            precio_unitario=producto.precio,
+            precio_unitario=precio,
             entregado=False
         )
         session.add(detalle)
+        recalcular_total_comanda(session, id_comanda)
+        emitir(session, 'detalle_agregado', id_comanda=id_comanda, id_detalle=detalle.id_detalle_comanda,
+               id_producto=id_producto, cantidad=cantidad)
         session.commit()
         
         return jsonify({
@@ -533,13 +713,11 @@ def agregar_producto_comanda(id_comanda):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al agregar producto a la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id_comanda>/productos/<int:id_detalle>', methods=['PUT'])
-def modificar_cantidad_producto(id_comanda, id_detalle):
+@con_sesion
+def modificar_cantidad_producto(session, id_comanda, id_detalle):
     """Modificar la cantidad de un producto en una comanda abierta"""
-    session = SessionLocal()
     try:
         data = request.get_json()
         
@@ -550,8 +728,9 @@ def modificar_cantidad_producto(id_comanda, id_detalle):
         if not isinstance(cantidad, int) or cantidad <= 0:
             return jsonify({'status':'error', 'message': 'La cantidad debe ser un número entero positivo'}), 400
         
-        # Validar que la comanda existe y está abierta
-        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
+        # Validar que la comanda existe y está abierta. Se bloquea la fila: otra
+        # escritura de detalles espera y recalcula el total viendo este cambio
+        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).with_for_update().first()
         if not comanda:
             return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
         
@@ -574,6 +753,8 @@ def modificar_cantidad_producto(id_comanda, id_detalle):
             }), 404
         
         detalle.cantidad = cantidad
+        recalcular_total_comanda(session, id_comanda)
+        emitir(session, 'detalle_modificado', id_comanda=id_comanda, id_detalle=id_detalle, cantidad=cantidad)
         session.commit()
         
         return jsonify({
@@ -585,16 +766,15 @@ def modificar_cantidad_producto(id_comanda, id_detalle):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al modificar cantidad: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id_comanda>/productos/<int:id_detalle>', methods=['DELETE'])
-def eliminar_producto_comanda(id_comanda, id_detalle):
+@con_sesion
+def eliminar_producto_comanda(session, id_comanda, id_detalle):
     """Eliminar un producto de una comanda abierta"""
-    session = SessionLocal()
     try:
-        # Validar que la comanda existe y está abierta
-        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
+        # Validar que la comanda existe y está abierta. Se bloquea la fila: otra
+        # escritura de detalles espera y recalcula el total viendo este cambio
+        comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).with_for_update().first()
         if not comanda:
             return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
         
@@ -617,6 +797,8 @@ def eliminar_producto_comanda(id_comanda, id_detalle):
             }), 404
         
         session.delete(detalle)
+        recalcular_total_comanda(session, id_comanda)
+        emitir(session, 'detalle_eliminado', id_comanda=id_comanda, id_detalle=id_detalle)
         session.commit()
         
         return jsonify({
@@ -627,13 +809,11 @@ def eliminar_producto_comanda(id_comanda, id_detalle):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al eliminar producto de la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @comanda_bp.route('/<int:id_comanda>/productos/<int:id_detalle>/entregar', methods=['POST'])
-def entregar_producto(id_comanda, id_detalle):
+@con_sesion
+def entregar_producto(session, id_comanda, id_detalle):
     """Marcar un producto como entregado en una comanda abierta"""
-    session = SessionLocal()
     try:
         # Validar que la comanda existe y está abierta
         comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
@@ -659,6 +839,7 @@ def entregar_producto(id_comanda, id_detalle):
             }), 404
         
         detalle.entregado = True
+        emitir(session, 'detalle_entregado', id_comanda=id_comanda, id_detalle=id_detalle)
         session.commit()
         
         return jsonify({
@@ -670,15 +851,234 @@ def entregar_producto(id_comanda, id_detalle):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al marcar producto como entregado: {str(e)}'}), 500
-    finally:
-        session.close()
+
+# ========== OPERACIONES EN LOTE SOBRE LOS PRODUCTOS ==========
+
+OPERACIONES_LOTE = ('agregar', 'modificar', 'entregar', 'eliminar')
+MAX_OPERACIONES_LOTE = 200
+
+
+def _entero_positivo(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor > 0
+
+
+def _como_id(valor):
+    """Id entero a partir de un int o un string de dígitos; None si no es un entero positivo"""
+    if isinstance(valor, str) and valor.strip().isdigit():
+        valor = int(valor)
+    return valor if _entero_positivo(valor) else None
+
+
+def _validar_operaciones(session, id_comanda, operaciones):
+    """
+    Valida todas las operaciones contra la comanda con una consulta para los
+    detalles y otra para los productos. Devuelve (resultados, plan); si algún
+    resultado tiene ok=False el plan no debe aplicarse.
+    """
+    # Solo enteros válidos entran en sets y dicts: [1] o {} no son hashables
+    ids_detalle = {op.get('id_detalle') for op in operaciones
+                   if isinstance(op, dict) and op.get('op') in ('modificar', 'entregar', 'eliminar')
+                   and _entero_positivo(op.get('id_detalle'))}
+    existentes = {
+        fila.id_detalle_comanda for fila in session.query(DetalleComanda.id_detalle_comanda)
+        .filter(DetalleComanda.id_comanda == id_comanda, DetalleComanda.id_detalle_comanda.in_(ids_detalle))
+    } if ids_detalle else set()
+
+    ids_producto = {op.get('id_producto') for op in operaciones
+                    if isinstance(op, dict) and op.get('op') == 'agregar' and _entero_positivo(op.get('id_producto'))}
+    precios = _precios_activos(session, ids_producto)
+
+    plan = {'agregar': [], 'agregados': [], 'modificar': {}, 'entregar': set(), 'eliminar': set()}
+    resultados = []
+    for indice, op in enumerate(operaciones):
+        tipo = op.get('op') if isinstance(op, dict) else None
+        resultado = {'indice': indice, 'op': tipo, 'ok': False}
+        resultados.append(resultado)
+
+        if tipo not in OPERACIONES_LOTE:
+            resultado['error'] = f'Operación inválida; usar una de: {", ".join(OPERACIONES_LOTE)}'
+            continue
+
+        if tipo == 'agregar':
+            id_producto = op.get('id_producto')
+            cantidad = op.get('cantidad', 1)
+            resultado['id_producto'] = id_producto
+            if not _entero_positivo(cantidad):
+                resultado['error'] = 'La cantidad debe ser un número entero positivo'
+            elif not _entero_positivo(id_producto):
+                resultado['error'] = 'El id_producto debe ser un número entero positivo'
+            elif id_producto not in precios:
+                resultado['error'] = f'No existe un producto activo con id_producto {id_producto}'
+            else:
+                plan['agregar'].append({
+                    'id_comanda': id_comanda,
+                    'id_producto': id_producto,
+                    'cantidad': cantidad,
+                    'precio_unitario': precios[id_producto],
+                    'entregado': False
+                })
+                resultado['ok'] = True
+            continue
+
+        id_detalle = op.get('id_detalle')
+        resultado['id_detalle'] = id_detalle
+        if not _entero_positivo(id_detalle):
+            resultado['error'] = 'El id_detalle debe ser un número entero positivo'
+        elif id_detalle not in existentes:
+            resultado['error'] = f'No existe un detalle con id_detalle_comanda {id_detalle} en la comanda {id_comanda}'
+        elif id_detalle in plan['eliminar']:
+            resultado['error'] = 'El detalle se elimina en una operación anterior del mismo lote'
+        elif tipo == 'modificar':
+            cantidad = op.get('cantidad')
+            if not _entero_positivo(cantidad):
+                resultado['error'] = 'La cantidad debe ser un número entero positivo'
+            else:
+                plan['modificar'][id_detalle] = cantidad
+                resultado['ok'] = True
+        elif tipo == 'eliminar':
+            plan['eliminar'].add(id_detalle)
+            plan['modificar'].pop(id_detalle, None)
+            plan['entregar'].discard(id_detalle)
+            resultado['ok'] = True
+        else:
+            plan['entregar'].add(id_detalle)
+            resultado['ok'] = True
+
+    return resultados, plan
+
+
+def _aplicar_plan(session, plan):
+    """Aplica el plan validado con una sentencia por tipo de operación"""
+    if plan['eliminar']:
+        session.execute(
+            delete(DetalleComanda)
+            .where(DetalleComanda.id_detalle_comanda.in_(plan['eliminar']))
+            .execution_options(synchronize_session=False)
+        )
+    if plan['modificar']:
+        # UPDATE masivo por clave primaria (un executemany)
+        session.execute(update(DetalleComanda), [
+            {'id_detalle_comanda': id_detalle, 'cantidad': cantidad}
+            for id_detalle, cantidad in plan['modificar'].items()
+        ])
+    if plan['entregar']:
+        session.execute(
+            update(DetalleComanda)
+            .where(DetalleComanda.id_detalle_comanda.in_(plan['entregar']))
+            .values(entregado=True)
+            .execution_options(synchronize_session=False)
+        )
+    plan['agregados'] = _insertar_detalles(session, plan['agregar'])
+
+
+def _emitir_plan(session, id_comanda, plan):
+    """Un evento por detalle afectado (los agregados con el id que devolvió el INSERT)"""
+    for id_detalle in plan['eliminar']:
+        emitir(session, 'detalle_eliminado', id_comanda=id_comanda, id_detalle=id_detalle)
+    for id_detalle, cantidad in plan['modificar'].items():
+        emitir(session, 'detalle_modificado', id_comanda=id_comanda, id_detalle=id_detalle, cantidad=cantidad)
+    for id_detalle in plan['entregar']:
+        emitir(session, 'detalle_entregado', id_comanda=id_comanda, id_detalle=id_detalle)
+    for fila in sorted(plan['agregados']):
+        emitir(session, 'detalle_agregado', id_comanda=id_comanda, id_detalle=fila.id_detalle_comanda,
+               id_producto=fila.id_producto, cantidad=fila.cantidad)
+
+
+def _procesar_lote(session, id_comanda, operaciones):
+    """Valida la comanda una sola vez y aplica todas las operaciones en una transacción (todo o nada)"""
+    comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).with_for_update().first()
+    if not comanda:
+        return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
+
+    if comanda.estado != 'Abierta':
+        return jsonify({
+            'status':'error',
+            'message': f'No se pueden modificar productos de una comanda con estado "{comanda.estado}". Solo se pueden modificar comandas abiertas.'
+        }), 400
+
+    resultados, plan = _validar_operaciones(session, id_comanda, operaciones)
+    rechazadas = sum(1 for r in resultados if not r['ok'])
+    if rechazadas:
+        session.rollback()
+        return jsonify({
+            'status':'error',
+            'message': f'{rechazadas} operación(es) inválida(s); no se aplicó ningún cambio',
+            'resultados': resultados
+        }), 400
+
+    _aplicar_plan(session, plan)
+    if plan['agregar'] or plan['modificar'] or plan['eliminar']:
+        recalcular_total_comanda(session, id_comanda)
+    _emitir_plan(session, id_comanda, plan)
+    session.commit()
+
+    return jsonify({
+        'status':'success',
+        'message': f'{len(resultados)} operación(es) aplicada(s) exitosamente',
+        'resultados': resultados,
+        'data': comanda.json()
+    }), 200
+
+
+@comanda_bp.route('/<int:id_comanda>/productos/lote', methods=['POST'])
+@con_sesion
+def operar_productos_lote(session, id_comanda):
+    """
+    Aplica varias operaciones sobre los productos de una comanda abierta:
+    {"operaciones": [{"op": "agregar", "id_producto": 1, "cantidad": 2},
+                     {"op": "modificar", "id_detalle": 5, "cantidad": 3},
+                     {"op": "entregar", "id_detalle": 6},
+                     {"op": "eliminar", "id_detalle": 7}]}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        operaciones = data.get('operaciones')
+        if not isinstance(operaciones, list) or not operaciones:
+            return jsonify({'status':'error', 'message': 'El campo "operaciones" debe ser una lista no vacía'}), 400
+        if len(operaciones) > MAX_OPERACIONES_LOTE:
+            return jsonify({'status':'error', 'message': f'Se permiten hasta {MAX_OPERACIONES_LOTE} operaciones por lote'}), 400
+
+        return _procesar_lote(session, id_comanda, operaciones)
+
+    except Exception as e:
+        session.rollback()
+        return jsonify({'status':'error', 'message': f'Error al aplicar las operaciones: {str(e)}'}), 500
+
+
+@comanda_bp.route('/<int:id_comanda>/productos/entregar', methods=['POST'])
+@con_sesion
+def entregar_productos(session, id_comanda):
+    """
+    Marca varios productos como entregados: {"ids_detalle": [1, 2, 3]}.
+    Sin cuerpo (o sin ids_detalle) marca todos los pendientes de la comanda.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        ids_detalle = data.get('ids_detalle')
+        if ids_detalle is None:
+            ids_detalle = [
+                fila.id_detalle_comanda for fila in session.query(DetalleComanda.id_detalle_comanda)
+                .filter_by(id_comanda=id_comanda, entregado=False)
+            ]
+            if not ids_detalle:
+                if not session.query(Comanda.id_comanda).filter_by(id_comanda=id_comanda).first():
+                    return jsonify({'status':'error', 'message': f'No existe una comanda con id_comanda {id_comanda}'}), 404
+                return jsonify({'status':'error', 'message': 'La comanda no tiene productos pendientes de entrega'}), 400
+        elif not isinstance(ids_detalle, list) or not ids_detalle:
+            return jsonify({'status':'error', 'message': 'El campo "ids_detalle" debe ser una lista no vacía'}), 400
+
+        return _procesar_lote(session, id_comanda, [{'op': 'entregar', 'id_detalle': i} for i in ids_detalle])
+
+    except Exception as e:
+        session.rollback()
+        return jsonify({'status':'error', 'message': f'Error al marcar productos como entregados: {str(e)}'}), 500
 
 # ========== RUTA PARA CERRAR COMANDA ==========
 
 @comanda_bp.route('/<int:id_comanda>/cerrar', methods=['POST'])
-def cerrar_comanda(id_comanda):
+@con_sesion
+def cerrar_comanda(session, id_comanda):
     """Cerrar una comanda abierta (solo si todos los productos están entregados)"""
-    session = SessionLocal()
     try:
         # Validar que la comanda existe
         comanda = session.query(Comanda).filter_by(id_comanda=id_comanda).first()
@@ -705,7 +1105,8 @@ def cerrar_comanda(id_comanda):
         
         # Cerrar la comanda
         comanda.estado = 'Cerrada'
-        comanda.fecha_cierre = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        comanda.fecha_cierre = datetime.now()
+        emitir(session, 'comanda_cerrada', id_comanda=id_comanda)
         session.commit()
         
         return jsonify({
@@ -717,5 +1118,3 @@ def cerrar_comanda(id_comanda):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al cerrar la comanda: {str(e)}'}), 500
-    finally:
-        session.close()
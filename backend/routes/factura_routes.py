@@ -1,87 +1,62 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Factura, DetalleFactura, Comanda, DetalleComanda, Cliente
+from utils.paginacion import paginar, ParametroInvalido
+from utils.proyecciones import parametros_proyeccion, consulta_resumen, serializar
+from services.resumenes import registrar_venta
+from services.numeracion import siguiente_codigo_factura
+from services.eventos import emitir
 from datetime import datetime
+from services.cache import invalidar_en_escrituras
 
 factura_bp = Blueprint('factura', __name__)
 
+# Las escrituras cambian los datos de los reportes cacheados
+invalidar_en_escrituras(factura_bp, 'reportes')
+
 @factura_bp.route('/', methods=['GET'])
-def listar_facturas():
-    """Lista todas las facturas con paginación"""
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_facturas(session):
+    """Lista todas las facturas con paginación (?view=summary para la versión plana)"""
     try:
-        from sqlalchemy import func
-        from models import Pago
-        
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
         # Filtros
         id_comanda = request.args.get('id_comanda', type=int)
         solo_impagas = request.args.get('solo_impagas', type=str)
         solo_impagas = solo_impagas and solo_impagas.lower() in ('true', '1', 'yes')
+        vista, campos = parametros_proyeccion('facturas')
         
-        # Validar parámetros
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
-        query = session.query(Factura).filter_by(baja=False).order_by(Factura.fecha.desc())
+        if vista == 'summary':
+            query = consulta_resumen(session, 'facturas')
+        else:
+            query = session.query(Factura)
+        query = query.filter(Factura.baja == False)
         
         # Filtrar por id_comanda si se proporciona
         if id_comanda:
-            query = query.filter_by(id_comanda=id_comanda)
+            query = query.filter(Factura.id_comanda == id_comanda)
         
-        # Filtrar solo facturas impagas
+        # Filtrar solo facturas impagas (total_pagado se mantiene en la factura)
         if solo_impagas:
-            # Subquery para calcular el total pagado por factura
-            total_pagado_subq = session.query(
-                Pago.id_factura,
-                func.sum(Pago.monto).label('total_pagado')
-            ).group_by(Pago.id_factura).subquery()
-            
-            # Query principal con LEFT JOIN para incluir facturas sin pagos
-            query = query.outerjoin(
-                total_pagado_subq,
-                Factura.id_factura == total_pagado_subq.c.id_factura
-            ).filter(
-                (func.coalesce(total_pagado_subq.c.total_pagado, 0) < Factura.total)
-            )
+            query = query.filter(Factura.total_pagado < Factura.total)
         
-        # Contar total
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        facturas = query.offset(offset).limit(per_page).all()
-        data = [f.json() for f in facturas]
-        
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
+        # Paginación (offset o cursor) ordenada por fecha descendente
+        facturas, pagination = paginar(query, Factura, [(Factura.fecha, True)])
+        data = serializar(facturas, 'facturas', vista, campos)
         
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({'status':'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status':'error', 'message': f'Error al listar facturas: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @factura_bp.route('/<int:id_factura>', methods=['GET'])
-def obtener_factura(id_factura):
+@con_sesion
+def obtener_factura(session, id_factura):
     """Obtiene una factura específica"""
-    session = SessionLocal()
     try:
         factura = session.query(Factura).filter_by(id_factura=id_factura).first()
         if not factura:
@@ -93,13 +68,11 @@ def obtener_factura(id_factura):
         }), 200
     except Exception as e:
         return jsonify({'status':'error', 'message': f'Error al obtener la factura: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @factura_bp.route('/generar-desde-comanda/<int:id_comanda>', methods=['POST'])
-def generar_factura_desde_comanda(id_comanda):
+@con_sesion
+def generar_factura_desde_comanda(session, id_comanda):
     """Genera una factura a partir de una comanda abierta"""
-    session = SessionLocal()
     try:
         data = request.get_json() or {}
         
@@ -145,29 +118,17 @@ def generar_factura_desde_comanda(id_comanda):
         if not comanda.detalles or len(comanda.detalles) == 0:
             return jsonify({'status':'error', 'message': 'La comanda no tiene productos para facturar'}), 400
         
-        # Calcular total
-        total = comanda.calcular_total()
+        # Total mantenido en la comanda al agregar/modificar/eliminar detalles
+        total = comanda.total
         
-        # Generar código único de factura (formato: FACT-YYYYMMDD-XXXXX)
+        # Código único de factura (FACT-YYYYMMDD-XXXXX) tomado del contador del día
         fecha_actual = datetime.now()
-        fecha_str = fecha_actual.strftime('%Y%m%d')
-        # Buscar el último número de factura del día
-        ultima_factura = session.query(Factura).filter(
-            Factura.codigo.like(f'FACT-{fecha_str}-%')
-        ).order_by(Factura.codigo.desc()).first()
-        
-        if ultima_factura:
-            ultimo_numero = int(ultima_factura.codigo.split('-')[-1])
-            nuevo_numero = ultimo_numero + 1
-        else:
-            nuevo_numero = 1
-        
-        codigo_factura = f'FACT-{fecha_str}-{nuevo_numero:05d}'
+        codigo_factura = siguiente_codigo_factura(session, fecha_actual)
         
         # Crear factura
         nueva_factura = Factura(
             codigo=codigo_factura,
-            fecha=fecha_actual.strftime('%Y-%m-%d %H:%M:%S'),
+            fecha=fecha_actual,
             total=total,
             id_comanda=id_comanda,
             id_cliente=id_cliente
@@ -188,7 +149,11 @@ def generar_factura_desde_comanda(id_comanda):
         
         # Cambiar estado de la comanda a "Cerrada"
         comanda.estado = 'Cerrada'
-        comanda.fecha_cierre = fecha_actual.strftime('%Y-%m-%d %H:%M:%S')
+        comanda.fecha_cierre = fecha_actual
+
+        # Resumen diario de ventas (misma transacción que la factura)
+        registrar_venta(session, fecha_actual, comanda.id_mozo, comanda.detalles)
+        emitir(session, 'comanda_cerrada', id_comanda=comanda.id_comanda)
         
         session.commit()
         
@@ -201,13 +166,11 @@ def generar_factura_desde_comanda(id_comanda):
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error', 'message': f'Error al generar la factura: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @factura_bp.route('/<int:id>', methods=['DELETE'])
-def anular_factura(id):
+@con_sesion
+def anular_factura(session, id):
     """Anula una factura (baja lógica)"""
-    session = SessionLocal()
     try:
         factura = session.query(Factura).filter_by(id_factura=id).first()
         if not factura:
@@ -234,6 +197,4 @@ def anular_factura(id):
         }), 200
     except Exception as e:
         session.rollback()
-        return jsonify({'status':'error', 'message': f'Error al anular la factura: {str(e)}'}), 500
-    finally:
-        session.close()
\ No newline at end of file
+        return jsonify({'status':'error', 'message': f'Error al anular la factura: {str(e)}'}), 500
\ No newline at end of file
@@ -1,12 +1,18 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import MedioPago
+from utils.paginacion import paginar, ParametroInvalido
+from services.versiones import condicional, versionar_en_escrituras
 
 medio_pagos_bp = Blueprint('medio_pagos', __name__)
 
+# Las escrituras cambian la versión del catálogo (ETag de los listados)
+versionar_en_escrituras(medio_pagos_bp, 'medios_pago')
+
 @medio_pagos_bp.route('/', methods=['GET'])
-def listar_medio_pago():
-    session = SessionLocal()
+@condicional('medios_pago')
+@con_sesion_lectura
+def listar_medio_pago(session):
     try:
 
         nombre = request.args.get('nombre', type=str)
@@ -14,16 +20,6 @@ def listar_medio_pago():
         estado = request.args.get('estado', type=str)  # 'activa' o 'baja'
         ordenar_por = request.args.get('ordenar_por', default='nombre', type=str)
 
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(MedioPago)
 
          # Filtros
@@ -40,43 +36,33 @@ def listar_medio_pago():
             query = query.filter_by(baja=False)
 
         # Ordenamiento
+        orden = []
         if ordenar_por == 'nombre':
-            query = query.order_by(MedioPago.nombre)
-        
-        # Contar total antes de paginar
-        total = query.count()
+            orden = [(MedioPago.nombre, False)]
 
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        medio_pago = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        medio_pago, pagination = paginar(query, MedioPago, orden)
         data = [m.json() for m in medio_pago]
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar medios de pago: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 @medio_pagos_bp.route('/', methods=['POST'])
-def crear_medio_pago(): 
-    session = SessionLocal()
+@con_sesion
+def crear_medio_pago(session): 
     try:
         data = request.get_json()
 
@@ -136,12 +122,10 @@ def crear_medio_pago():
                 'status': 'error',
                 'message': f'Error al crear medio de pago: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 @medio_pagos_bp.route('/<int:id_medio_pago>', methods=['GET'])
-def obtener_medio_pago(id_medio_pago):
-    session = SessionLocal()
+@con_sesion
+def obtener_medio_pago(session, id_medio_pago):
     try:
         medio_pago = session.query(MedioPago).get(id_medio_pago)
 
@@ -159,12 +143,10 @@ def obtener_medio_pago(id_medio_pago):
             'status': 'error',
             'message': f'Error al obtener medio de pago: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 @medio_pagos_bp.route('/<int:id_medio_pago>', methods=['PUT'])
-def modificar_medio_pago(id_medio_pago):
-    session = SessionLocal()
+@con_sesion
+def modificar_medio_pago(session, id_medio_pago):
     try:
         data = request.get_json()
         medio_pago = session.query(MedioPago).get(id_medio_pago)
@@ -209,12 +191,10 @@ def modificar_medio_pago(id_medio_pago):
             'status': 'error',
             'message': f'Error al modificar medio de pago: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 @medio_pagos_bp.route('/<int:id_medio_pago>', methods=['DELETE'])
-def eliminar_medio_pago(id_medio_pago):
-    session = SessionLocal()
+@con_sesion
+def eliminar_medio_pago(session, id_medio_pago):
     try:
         medio_pago = session.query(MedioPago).get(id_medio_pago)
 
@@ -243,6 +223,4 @@ def eliminar_medio_pago(id_medio_pago):
         return jsonify({
             'status': 'error',
             'message': f'Error al dar de baja el medio de pago: {str(e)}'
-        }), 500
-    finally:
-        session.close()
\ No newline at end of file
+        }), 500
\ No newline at end of file
@@ -1,12 +1,20 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Mesa, Sector
+from datetime import timedelta
+from utils.fechas import parsear_fecha
+from utils.paginacion import paginar, ParametroInvalido
+from services.disponibilidad import mesas_disponibles
+from services.versiones import condicional, versionar_en_escrituras
 
 mesa_bp = Blueprint('mesa', __name__)
 
+# Las escrituras cambian la versión del catálogo (ETag de los listados)
+versionar_en_escrituras(mesa_bp, 'mesas')
+
 @mesa_bp.route('/', methods=['GET'])
-def listar_mesas():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_mesas(session):
     try:
         # Obtener parámetros de filtro
         sector_id = request.args.get('sector_id', type=int)
@@ -14,16 +22,6 @@ def listar_mesas():
         estado = request.args.get('estado', type=str)  # 'activa' o 'baja'
         ordenar_por = request.args.get('ordenar_por', default='numero', type=str)
         
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(Mesa)
         
         # Filtros
@@ -39,64 +37,68 @@ def listar_mesas():
             # Por defecto solo mostrar activas
             query = query.filter_by(baja=False)
         
-        # Ordenamiento
+        # Ordenamiento (ordenar por sector solo admite paginación por offset)
+        orden = []
         if ordenar_por == 'numero':
-            query = query.order_by(Mesa.numero)
+            orden = [(Mesa.numero, False)]
         elif ordenar_por == 'sector':
-            query = query.join(Sector).order_by(Sector.numero)
+            query = query.join(Sector)
+            orden = [(Sector.numero, False)]
         
-        # Contar total antes de paginar
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        mesas = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        mesas, pagination = paginar(query, Mesa, orden)
         data = [m.json() for m in mesas]
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar mesas: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/disponibles', methods=['GET'])
-def listar_mesas_disponibles():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_mesas_disponibles(session):
+    """
+    Mesas libres para un grupo en una ventana de tiempo.
+    ?fecha_hora=YYYY-MM-DD HH:MM:SS (default: ahora, para clientes sin reserva)
+    ?duracion=minutos (default RESERVA_DURACION_MINUTOS)
+    ?cant_comensales, ?sector_id
+    Excluye las mesas con reservas superpuestas y, si la ventana empieza antes
+    de que se liberen, las que tienen una comanda abierta o están ocupadas.
+    """
     try:
         # Obtener parámetros de filtro
         cant_comensales = request.args.get('cant_comensales', type=int)
         sector_id = request.args.get('sector_id', type=int)
-        
-        query = session.query(Mesa).filter_by(baja=False)
-        
-        # Filtros
-        if cant_comensales:
-            query = query.filter(Mesa.cant_comensales >= cant_comensales)
-        if sector_id:
-            query = query.filter_by(id_sector=sector_id)
-        
-        # TODO: Filtrar mesas ocupadas o reservadas cuando existan esos modelos
-        # Por ahora solo filtramos por baja=False
-        
-        mesas = query.all()
+        fecha_hora = request.args.get('fecha_hora', type=str)
+        duracion = request.args.get('duracion', type=int)
+
+        try:
+            inicio = parsear_fecha(fecha_hora) if fecha_hora else None
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        if duracion is not None and duracion <= 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'La duración debe ser un número entero positivo de minutos'
+            }), 400
+
+        opciones = {'duracion': timedelta(minutes=duracion)} if duracion else {}
+        mesas = mesas_disponibles(session, inicio, cant_comensales, sector_id, **opciones)
         data = [m.json() for m in mesas]
         
         return jsonify({
@@ -108,14 +110,13 @@ def listar_mesas_disponibles():
             'status': 'error',
             'message': f'Error al listar mesas disponibles: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/tipos', methods=['GET'])
-def listar_tipos_mesas():
+@condicional('mesas')
+@con_sesion_lectura
+def listar_tipos_mesas(session):
     """Endpoint para obtener los tipos únicos de mesas"""
-    session = SessionLocal()
     try:
         # Obtener tipos únicos de mesas activas
         tipos = session.query(Mesa.tipo).filter_by(baja=False).distinct().order_by(Mesa.tipo).all()
@@ -130,13 +131,11 @@ def listar_tipos_mesas():
             'status': 'error',
             'message': f'Error al listar tipos de mesas: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/', methods=['POST'])
-def crear_mesa():
-    session = SessionLocal()
+@con_sesion
+def crear_mesa(session):
     try:
         data = request.get_json()
         
@@ -216,13 +215,11 @@ def crear_mesa():
             'status': 'error',
             'message': f'Error al crear mesa: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/<int:id>', methods=['GET'])
-def obtener_mesa(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_mesa(session, id):
     try:
         mesa = session.query(Mesa).get(id)
         
@@ -242,13 +239,11 @@ def obtener_mesa(id):
             'status': 'error',
             'message': f'Error al obtener mesa: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/<int:id>', methods=['PUT'])
-def modificar_mesa(id):
-    session = SessionLocal()
+@con_sesion
+def modificar_mesa(session, id):
     try:
         data = request.get_json()
         mesa = session.query(Mesa).get(id)
@@ -321,13 +316,11 @@ def modificar_mesa(id):
             'status': 'error',
             'message': f'Error al modificar mesa: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @mesa_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_mesa(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_mesa(session, id):
     try:
         mesa = session.query(Mesa).get(id)
         
@@ -364,6 +357,4 @@ def eliminar_mesa(id):
             'status': 'error',
             'message': f'Error al dar de baja la mesa: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
@@ -1,42 +1,38 @@
+from decimal import Decimal, InvalidOperation
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Pago, Factura, MedioPago
+from utils.paginacion import paginar, ParametroInvalido
+from utils.fechas import parsear_fecha, filtro_rango
+from services.resumenes import registrar_cobro
+from services.saldos import acumular_pagado
+from services.cache import invalidar_en_escrituras
 
 pago_bp = Blueprint('pago', __name__)
 
+# Las escrituras cambian los datos de los reportes cacheados
+invalidar_en_escrituras(pago_bp, 'reportes')
+
 @pago_bp.route('/', methods=['GET'])
-def listar_pagos():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_pagos(session):
     try:
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
         # Filtros
         id_medio_pago = request.args.get('id_medio_pago', type=int)
         fecha_desde = request.args.get('fecha_desde')
         fecha_hasta = request.args.get('fecha_hasta')
         search = request.args.get('search')
 
-        # Validar parámetros
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-            
-        query = session.query(Pago).join(Factura).order_by(Pago.fecha.desc())
+        query = session.query(Pago).join(Factura)
         
         if id_medio_pago:
             query = query.filter(Pago.id_medio_pago == id_medio_pago)
             
-        if fecha_desde:
-            query = query.filter(Pago.fecha >= fecha_desde)
-            
-        if fecha_hasta:
-            # Asumiendo que fecha es string YYYY-MM-DD HH:MM:SS, si fecha_hasta es YYYY-MM-DD, agregamos hora final
-            if len(fecha_hasta) == 10:
-                fecha_hasta += ' 23:59:59'
-            query = query.filter(Pago.fecha <= fecha_hasta)
+        # Rango de fechas (fecha_hasta sin hora incluye el día completo)
+        try:
+            query = query.filter(*filtro_rango(Pago.fecha, fecha_desde, fecha_hasta))
+        except ValueError as e:
+            return jsonify({'status':'error','message':str(e)}), 400
             
         if search:
             search = f"%{search}%"
@@ -46,37 +42,23 @@ def listar_pagos():
                 (Pago.id_pago.cast(str).ilike(search))
             )
         
-        # Contar total
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        pagos = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor) ordenada por fecha descendente
+        pagos, pagination = paginar(query, Pago, [(Pago.fecha, True)])
         data = [p.json() for p in pagos]
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({'status':'error','message':str(e)}), 400
     except Exception as e:
         return jsonify({'status':'error','message':f'Error al listar pagos: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @pago_bp.route('/', methods=['POST'])
-def crear_pago():
-    session = SessionLocal()
+@con_sesion
+def crear_pago(session):
     try:
         data = request.get_json()
         if not data:
@@ -94,9 +76,13 @@ def crear_pago():
         try:
             id_factura = int(id_factura)
             id_medio_pago = int(id_medio_pago)
-            monto = float(monto)
-        except (ValueError, TypeError):
+            monto = Decimal(str(monto))
+        except (ValueError, TypeError, InvalidOperation):
             return jsonify({'status':'error','message':'Campos en formato inválido'}), 400
+        try:
+            fecha = parsear_fecha(fecha)
+        except ValueError as e:
+            return jsonify({'status':'error','message':str(e)}), 400
 
         # Validar existencia de factura y medio de pago
         factura = session.query(Factura).filter_by(id_factura=id_factura).first()
@@ -108,17 +94,17 @@ def crear_pago():
 
         pago = Pago(id_factura=id_factura, id_medio_pago=id_medio_pago, monto=monto, fecha=fecha)
         session.add(pago)
+        acumular_pagado(session, id_factura, monto)
+        registrar_cobro(session, fecha, id_medio_pago, monto)
         session.commit()
         return jsonify({'status':'success','message':'Pago creado','data':pago.json()}), 201
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error','message':f'Error al crear pago: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @pago_bp.route('/<int:id_pago>', methods=['GET'])
-def obtener_pago(id_pago):
-    session = SessionLocal()
+@con_sesion
+def obtener_pago(session, id_pago):
     try:
         pago = session.query(Pago).filter_by(id_pago=id_pago).first()
         if not pago:
@@ -126,50 +112,56 @@ def obtener_pago(id_pago):
         return jsonify({'status':'success','data':pago.json()}), 200
     except Exception as e:
         return jsonify({'status':'error','message':f'Error al obtener pago: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @pago_bp.route('/<int:id_pago>', methods=['PUT'])
-def modificar_pago(id_pago):
-    session = SessionLocal()
+@con_sesion
+def modificar_pago(session, id_pago):
     try:
         data = request.get_json()
         if not data:
             return jsonify({'status':'error','message':'No se proporcionaron datos'}), 400
-        pago = session.query(Pago).filter_by(id_pago=id_pago).first()
+        # Bloqueo de la fila: dos ediciones simultáneas calculan su delta sobre el monto ya actualizado
+        pago = session.query(Pago).filter_by(id_pago=id_pago).with_for_update().first()
         if not pago:
             return jsonify({'status':'error','message':f'No existe pago con id {id_pago}'}), 404
 
         monto = data.get('monto')
         fecha = data.get('fecha')
+        fecha_anterior, monto_anterior = pago.fecha, pago.monto
         if monto is not None:
             try:
-                pago.monto = float(monto)
-            except (ValueError, TypeError):
+                pago.monto = Decimal(str(monto))
+            except (ValueError, TypeError, InvalidOperation):
                 return jsonify({'status':'error','message':'monto inválido'}), 400
         if fecha is not None:
-            pago.fecha = fecha
+            try:
+                pago.fecha = parsear_fecha(fecha)
+            except ValueError as e:
+                return jsonify({'status':'error','message':str(e)}), 400
+
+        # Mover el pago en el resumen de cobros: se revierte el valor anterior y se suma el nuevo
+        registrar_cobro(session, fecha_anterior, pago.id_medio_pago, -monto_anterior, cantidad=-1)
+        registrar_cobro(session, pago.fecha, pago.id_medio_pago, pago.monto)
+        acumular_pagado(session, pago.id_factura, Decimal(str(pago.monto)) - Decimal(str(monto_anterior)))
 
         session.commit()
         return jsonify({'status':'success','message':'Pago actualizado','data':pago.json()}), 200
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error','message':f'Error al modificar pago: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @pago_bp.route('/<int:id_pago>', methods=['DELETE'])
-def eliminar_pago(id_pago):
-    session = SessionLocal()
+@con_sesion
+def eliminar_pago(session, id_pago):
     try:
-        pago = session.query(Pago).filter_by(id_pago=id_pago).first()
+        pago = session.query(Pago).filter_by(id_pago=id_pago).with_for_update().first()
         if not pago:
             return jsonify({'status':'error','message':f'No existe pago con id {id_pago}'}), 404
         session.delete(pago)
+        registrar_cobro(session, pago.fecha, pago.id_medio_pago, -pago.monto, cantidad=-1)
+        acumular_pagado(session, pago.id_factura, -Decimal(str(pago.monto)))
         session.commit()
         return jsonify({'status':'success','message':'Pago eliminado'}), 200
     except Exception as e:
         session.rollback()
         return jsonify({'status':'error','message':f'Error al eliminar pago: {str(e)}'}), 500
-    finally:
-        session.close()
@@ -1,12 +1,21 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from sqlalchemy.orm import contains_eager
+from db import con_sesion, con_sesion_lectura
 from models import Producto, Seccion, Plato, Postre, Bebida
+from utils.paginacion import paginar, ParametroInvalido
+from models.proyecciones import consulta_menu, agrupar_menu, TIPOS_MENU
+from services.cache import cacheado
+from services.versiones import condicional, versionar_en_escrituras
 
 producto_bp = Blueprint('producto', __name__)
 
+# Las escrituras cambian la versión del catálogo (ETag de los listados)
+versionar_en_escrituras(producto_bp, 'productos')
+
 @producto_bp.route('/', methods=['GET'])
-def listar_productos():
-    session = SessionLocal()
+@condicional('productos')
+@con_sesion_lectura
+def listar_productos(session):
     try:
         # Parámetros
         nombre = request.args.get('nombre', type=str)
@@ -16,16 +25,6 @@ def listar_productos():
         precio_max = request.args.get('precio_max', type=float)
         ordenar_por = request.args.get('ordenar_por', default='nombre', type=str)
 
-        # Paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-
-        # Validaciones
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-
         query = session.query(Producto)
 
         # FILTRO: Activos / Inactivos
@@ -53,55 +52,46 @@ def listar_productos():
             query = query.filter(Producto.precio <= precio_max)
 
         # Ordenamiento
+        orden = []
         if ordenar_por == 'nombre':
-            query = query.order_by(Producto.nombre.asc())
+            orden = [(Producto.nombre, False)]
         elif ordenar_por == 'precio':
-            query = query.order_by(Producto.precio.asc())
+            orden = [(Producto.precio, False)]
 
-        # Total antes de paginar
-        total = query.count()
-
-        # Paginación
-        offset = (page - 1) * per_page
-        productos = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        productos, pagination = paginar(query, Producto, orden)
 
         data = [p.json() for p in productos]
 
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
 
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar productos: {str(e)}'
         }), 500
 
-    finally:
-        session.close()
 
 
 
 @producto_bp.route('/', methods=['POST'])
-def crear_producto():
-    session = SessionLocal()
+@con_sesion
+def crear_producto(session):
     data = request.get_json()
 
     campos_requeridos = ['codigo', 'nombre', 'precio', 'id_seccion', 'tipo']
     for campo in campos_requeridos:
         if campo not in data:
-            session.close()
             return jsonify({
                 'status': 'error',
                 'message': f'El campo "{campo}" es requerido'
@@ -109,14 +99,12 @@ def crear_producto():
 
     seccion = session.query(Seccion).filter_by(id_seccion=data['id_seccion']).first()
     if not seccion or seccion.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'La sección indicada no existe o está dada de baja'
         }), 200
 
     if session.query(Producto).filter_by(codigo=data['codigo']).first():
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El código de producto ya existe'
@@ -145,7 +133,6 @@ def crear_producto():
             cm3=data.get('cm3', None)  # opcional
         )
     else:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El tipo de producto no es válido'
@@ -155,7 +142,6 @@ def crear_producto():
     session.commit()
 
     res = producto.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -166,10 +152,9 @@ def crear_producto():
 
 
 @producto_bp.route('/<int:id>', methods=['GET'])
-def obtener_producto(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_producto(session, id):
     producto = session.query(Producto).get(id)
-    session.close()
 
     if not producto or producto.baja:
         return jsonify({
@@ -183,13 +168,12 @@ def obtener_producto(id):
     }), 200
 
 @producto_bp.route('/<int:id>', methods=['PUT'])
-def editar_producto(id):
-    session = SessionLocal()
+@con_sesion
+def editar_producto(session, id):
     data = request.get_json()
     producto = session.query(Producto).get(id)
 
     if not producto or producto.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Producto no encontrado o dado de baja'
@@ -200,7 +184,6 @@ def editar_producto(id):
             setattr(producto, campo, data[campo])
     session.commit()
     res = producto.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -210,12 +193,11 @@ def editar_producto(id):
 
 
 @producto_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_producto(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_producto(session, id):
     producto = session.query(Producto).get(id)
 
     if not producto or producto.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Producto no encontrado o ya dado de baja'
@@ -224,7 +206,6 @@ def eliminar_producto(id):
     producto.baja = True
     session.commit()
     res = producto.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -233,13 +214,43 @@ def eliminar_producto(id):
     }), 200
 
 
+@producto_bp.route('/menu', methods=['GET'])
+@condicional('productos', 'secciones')
+@cacheado('menu')
+@con_sesion_lectura
+def obtener_menu(session):
+    """
+    Menú activo completo agrupado por sección y subtipo (platos, postres,
+    bebidas, otros), armado con una sola consulta. La caché y el ETag dependen
+    de las versiones de productos y secciones.
+    """
+    try:
+        menu = agrupar_menu(consulta_menu(session).all())
+        return jsonify({
+            'status': 'success',
+            'data': menu,
+            'total': sum(len(seccion[tipo]) for seccion in menu for tipo in TIPOS_MENU)
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error al obtener el menú: {str(e)}'
+        }), 500
+
+
 # Rutas para Plato
 @producto_bp.route('/platos', methods=['GET'])
-def listar_platos():
-    session = SessionLocal()
-    platos = session.query(Plato).join(Producto).filter(Producto.baja == False).all()
+@condicional('productos')
+@con_sesion_lectura
+def listar_platos(session):
+    # contains_eager: el producto sale del mismo join (sin una consulta por fila en json())
+    platos = (
+        session.query(Plato).join(Plato.producto)
+        .options(contains_eager(Plato.producto))
+        .filter(Producto.baja == False)
+        .all()
+    )
     data = [p.json() for p in platos]
-    session.close()
     return jsonify({
         'status': 'success',
         'data': data
@@ -247,14 +258,13 @@ def listar_platos():
 
 
 @producto_bp.route('/platos', methods=['POST'])
-def crear_plato():
-    session = SessionLocal()
+@con_sesion
+def crear_plato(session):
     data = request.get_json()
 
     campos_requeridos = ['codigo', 'nombre', 'precio', 'id_seccion']
     for campo in campos_requeridos:
         if campo not in data:
-            session.close()
             return jsonify({
                 'status': 'error',
                 'message': f'El campo "{campo}" es requerido'
@@ -262,14 +272,12 @@ def crear_plato():
 
     seccion = session.query(Seccion).filter_by(id_seccion=data['id_seccion']).first()
     if not seccion or seccion.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'La sección indicada no existe o está dada de baja'
         }), 200
 
     if session.query(Producto).filter_by(codigo=data['codigo']).first():
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El código de producto ya existe'
@@ -290,7 +298,6 @@ def crear_plato():
     session.add(plato)
     session.commit()
     res = plato.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -300,10 +307,9 @@ def crear_plato():
 
 
 @producto_bp.route('/platos/<int:id>', methods=['GET'])
-def obtener_plato(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_plato(session, id):
     plato = session.query(Plato).filter_by(id_plato=id).first()
-    session.close()
 
     if not plato or (plato.producto and plato.producto.baja):
         return jsonify({
@@ -318,13 +324,12 @@ def obtener_plato(id):
 
 
 @producto_bp.route('/platos/<int:id>', methods=['PUT'])
-def editar_plato(id):
-    session = SessionLocal()
+@con_sesion
+def editar_plato(session, id):
     data = request.get_json()
     plato = session.query(Plato).filter_by(id_plato=id).first()
 
     if not plato or (plato.producto and plato.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Plato no encontrado o dado de baja'
@@ -337,7 +342,6 @@ def editar_plato(id):
                 setattr(producto, campo, data[campo])
     session.commit()
     res = plato.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -347,12 +351,11 @@ def editar_plato(id):
 
 
 @producto_bp.route('/platos/<int:id>', methods=['DELETE'])
-def eliminar_plato(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_plato(session, id):
     plato = session.query(Plato).filter_by(id_plato=id).first()
 
     if not plato or (plato.producto and plato.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Plato no encontrado o ya dado de baja'
@@ -362,7 +365,6 @@ def eliminar_plato(id):
         plato.producto.baja = True
     session.commit()
     res = plato.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -373,11 +375,16 @@ def eliminar_plato(id):
 
 # Rutas para Postre
 @producto_bp.route('/postres', methods=['GET'])
-def listar_postres():
-    session = SessionLocal()
-    postres = session.query(Postre).join(Producto).filter(Producto.baja == False).all()
+@condicional('productos')
+@con_sesion_lectura
+def listar_postres(session):
+    postres = (
+        session.query(Postre).join(Postre.producto)
+        .options(contains_eager(Postre.producto))
+        .filter(Producto.baja == False)
+        .all()
+    )
     data = [p.json() for p in postres]
-    session.close()
     return jsonify({
         'status': 'success',
         'data': data
@@ -385,14 +392,13 @@ def listar_postres():
 
 
 @producto_bp.route('/postres', methods=['POST'])
-def crear_postre():
-    session = SessionLocal()
+@con_sesion
+def crear_postre(session):
     data = request.get_json()
 
     campos_requeridos = ['codigo', 'nombre', 'precio', 'id_seccion']
     for campo in campos_requeridos:
         if campo not in data:
-            session.close()
             return jsonify({
                 'status': 'error',
                 'message': f'El campo "{campo}" es requerido'
@@ -400,14 +406,12 @@ def crear_postre():
 
     seccion = session.query(Seccion).filter_by(id_seccion=data['id_seccion']).first()
     if not seccion or seccion.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'La sección indicada no existe o está dada de baja'
         }), 200
 
     if session.query(Producto).filter_by(codigo=data['codigo']).first():
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El código de producto ya existe'
@@ -428,7 +432,6 @@ def crear_postre():
     session.add(postre)
     session.commit()
     res = postre.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -438,10 +441,9 @@ def crear_postre():
 
 
 @producto_bp.route('/postres/<int:id>', methods=['GET'])
-def obtener_postre(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_postre(session, id):
     postre = session.query(Postre).filter_by(id_postre=id).first()
-    session.close()
 
     if not postre or (postre.producto and postre.producto.baja):
         return jsonify({
@@ -456,13 +458,12 @@ def obtener_postre(id):
 
 
 @producto_bp.route('/postres/<int:id>', methods=['PUT'])
-def editar_postre(id):
-    session = SessionLocal()
+@con_sesion
+def editar_postre(session, id):
     data = request.get_json()
     postre = session.query(Postre).filter_by(id_postre=id).first()
 
     if not postre or (postre.producto and postre.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Postre no encontrado o dado de baja'
@@ -475,7 +476,6 @@ def editar_postre(id):
                 setattr(producto, campo, data[campo])
     session.commit()
     res = postre.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -485,12 +485,11 @@ def editar_postre(id):
 
 
 @producto_bp.route('/postres/<int:id>', methods=['DELETE'])
-def eliminar_postre(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_postre(session, id):
     postre = session.query(Postre).filter_by(id_postre=id).first()
 
     if not postre or (postre.producto and postre.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Postre no encontrado o ya dado de baja'
@@ -500,7 +499,6 @@ def eliminar_postre(id):
         postre.producto.baja = True
     session.commit()
     res = postre.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -511,11 +509,16 @@ def eliminar_postre(id):
 
 # Rutas para Bebida
 @producto_bp.route('/bebidas', methods=['GET'])
-def listar_bebidas():
-    session = SessionLocal()
-    bebidas = session.query(Bebida).join(Producto).filter(Producto.baja == False).all()
+@condicional('productos')
+@con_sesion_lectura
+def listar_bebidas(session):
+    bebidas = (
+        session.query(Bebida).join(Bebida.producto)
+        .options(contains_eager(Bebida.producto))
+        .filter(Producto.baja == False)
+        .all()
+    )
     data = [b.json() for b in bebidas]
-    session.close()
     return jsonify({
         'status': 'success',
         'data': data
@@ -523,14 +526,13 @@ def listar_bebidas():
 
 
 @producto_bp.route('/bebidas', methods=['POST'])
-def crear_bebida():
-    session = SessionLocal()
+@con_sesion
+def crear_bebida(session):
     data = request.get_json()
 
     campos_requeridos = ['codigo', 'nombre', 'precio', 'id_seccion', 'cm3']
     for campo in campos_requeridos:
         if campo not in data:
-            session.close()
             return jsonify({
                 'status': 'error',
                 'message': f'El campo "{campo}" es requerido'
@@ -538,14 +540,12 @@ def crear_bebida():
 
     seccion = session.query(Seccion).filter_by(id_seccion=data['id_seccion']).first()
     if not seccion or seccion.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'La sección indicada no existe o está dada de baja'
         }), 200
 
     if session.query(Producto).filter_by(codigo=data['codigo']).first():
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El código de producto ya existe'
@@ -566,7 +566,6 @@ def crear_bebida():
     session.add(bebida)
     session.commit()
     res = bebida.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -576,10 +575,9 @@ def crear_bebida():
 
 
 @producto_bp.route('/bebidas/<int:id>', methods=['GET'])
-def obtener_bebida(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_bebida(session, id):
     bebida = session.query(Bebida).filter_by(id_bebida=id).first()
-    session.close()
 
     if not bebida or (bebida.producto and bebida.producto.baja):
         return jsonify({
@@ -594,13 +592,12 @@ def obtener_bebida(id):
 
 
 @producto_bp.route('/bebidas/<int:id>', methods=['PUT'])
-def editar_bebida(id):
-    session = SessionLocal()
+@con_sesion
+def editar_bebida(session, id):
     data = request.get_json()
     bebida = session.query(Bebida).filter_by(id_bebida=id).first()
 
     if not bebida or (bebida.producto and bebida.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Bebida no encontrada o dada de baja'
@@ -617,7 +614,6 @@ def editar_bebida(id):
     
     session.commit()
     res = bebida.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -627,12 +623,11 @@ def editar_bebida(id):
 
 
 @producto_bp.route('/bebidas/<int:id>', methods=['DELETE'])
-def eliminar_bebida(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_bebida(session, id):
     bebida = session.query(Bebida).filter_by(id_bebida=id).first()
 
     if not bebida or (bebida.producto and bebida.producto.baja):
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Bebida no encontrada o ya dada de baja'
@@ -642,7 +637,6 @@ def eliminar_bebida(id):
         bebida.producto.baja = True
     session.commit()
     res = bebida.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
@@ -1,211 +1,353 @@
-from flask import Blueprint, jsonify
-from sqlalchemy import func, cast,TIMESTAMP
-from db import SessionLocal
+from flask import Blueprint, jsonify, request
+from sqlalchemy import func
+from db import con_sesion_lectura
+from services.cache import cache, cacheado
+from utils.fechas import (
+    parsear_fecha, filtro_rango, truncar_fecha, formatear_periodo, GRANULARIDADES
+)
 
 from models import (
-    Factura, 
-    DetalleFactura,
     Producto,
     MedioPago,
-    Pago,
     Comanda,
-    DetalleComanda,
     Reserva,
     Mesa,
     Sector,
-    Mozo
+    Mozo,
+    ResumenVentaDiaria,
+    ResumenCobroDiario
 )
 
 reporte_bp = Blueprint("reportes", __name__)
 
+# Todos los reportes aceptan:
+#   ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD  (ambos inclusive, opcionales)
+#   ?granularidad=dia|semana|mes        (también day|week|month)
+# El agrupamiento por período se hace en SQL. Los rankings (productos, medios de
+# pago, sectores, mozos) devuelven totales si no se pide granularidad.
+
+
+def _parametros_reporte(granularidad_default=None):
+    """Lee desde/hasta/granularidad del request; lanza ValueError si son inválidos"""
+    desde = request.args.get('desde', type=str)
+    hasta = request.args.get('hasta', type=str)
+    granularidad = request.args.get('granularidad', default=granularidad_default, type=str)
+
+    if desde:
+        parsear_fecha(desde)
+    if hasta:
+        parsear_fecha(hasta)
+    if granularidad is not None and granularidad not in GRANULARIDADES:
+        raise ValueError('granularidad debe ser una de: dia, semana, mes')
+    return desde, hasta, granularidad
+
+
+def _filtro_dias(columna_dia, desde, hasta):
+    """Rango inclusivo sobre una columna DATE de los resúmenes"""
+    condiciones = []
+    if desde:
+        condiciones.append(columna_dia >= parsear_fecha(desde).date())
+    if hasta:
+        condiciones.append(columna_dia <= parsear_fecha(hasta).date())
+    return condiciones
+
+
+def _dialecto(session):
+    return session.get_bind().dialect.name
+
+
+def _top_por_periodo(session, consulta, limite):
+    """
+    Aplica el top-N dentro de cada período con row_number() sobre una consulta
+    que ya tiene las columnas 'periodo' y 'valor'.
+    """
+    sub = consulta.subquery()
+    orden = func.row_number().over(partition_by=sub.c.periodo, order_by=sub.c.valor.desc()).label('posicion')
+    numeradas = session.query(sub, orden).subquery()
+    return (
+        session.query(numeradas)
+        .filter(numeradas.c.posicion <= limite)
+        .order_by(numeradas.c.periodo, numeradas.c.posicion)
+        .all()
+    )
+
+
+# ======================================================
+#  ESTADÍSTICAS DE LA CACHÉ
+# ======================================================
+@reporte_bp.route("/cache", methods=["GET"])
+def estadisticas_cache():
+    """Aciertos/fallos de la caché de reportes (por proceso)"""
+    return jsonify({"status": "success", "data": cache.estadisticas()}), 200
+
 # ======================================================
 #  1) VENTAS MENSUALES
 # ======================================================
 @reporte_bp.route("/ventas/mensuales", methods=["GET"])
-def ventas_mensuales():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def ventas_mensuales(session):
     try:
+        desde, hasta, granularidad = _parametros_reporte('mes')
+
+        # Se agrega sobre el resumen diario (una fila por día × producto × mozo)
+        periodo = truncar_fecha(ResumenVentaDiaria.dia, granularidad, _dialecto(session))
         resultados = (
             session.query(
-                func.date_trunc(
-                    'month',
-                    cast(Factura.fecha, TIMESTAMP)  # <-- aquí hacemos el cast
-                ).label("mes"),
-                func.sum(Factura.total).label("total")
+                periodo.label("periodo"),
+                func.sum(ResumenVentaDiaria.total).label("total")
             )
-            .group_by(func.date_trunc('month', cast(Factura.fecha, TIMESTAMP)))
-            .order_by(func.date_trunc('month', cast(Factura.fecha, TIMESTAMP)))
+            .filter(*_filtro_dias(ResumenVentaDiaria.dia, desde, hasta))
+            .group_by(periodo)
+            .order_by(periodo)
             .all()
         )
 
-        data = [
-            {"mes": str(r.mes.date()), "total": float(r.total)}
-            for r in resultados
-        ]
+        data = []
+        for r in resultados:
+            fila = {"periodo": formatear_periodo(r.periodo), "total": float(r.total)}
+            if GRANULARIDADES[granularidad] == 'month':
+                fila["mes"] = fila["periodo"]
+            data.append(fila)
 
         return jsonify({"status": "success", "data": data}), 200
-    
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error en ventas mensuales: {str(e)}"}), 500
-    finally:
-        session.close()
 
 # ======================================================
 #  2) PRODUCTOS MÁS VENDIDOS
 # ======================================================
 
 @reporte_bp.route("/productos/mas-vendidos", methods=["GET"])
-def productos_mas_vendidos():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def productos_mas_vendidos(session):
     try:
-        # Hacemos join desde DetalleFactura -> DetalleComanda -> Producto
-        resultados = (
-            session.query(
-                Producto.nombre,
-                func.sum(DetalleFactura.cantidad).label("cantidad_vendida")
-            )
-            .join(DetalleComanda, DetalleFactura.id_detalle_comanda == DetalleComanda.id_detalle_comanda)
-            .join(Producto, DetalleComanda.id_producto == Producto.id_producto)
-            .group_by(Producto.nombre)
-            .order_by(func.sum(DetalleFactura.cantidad).desc())
-            .limit(10)
-            .all()
-        )
+        desde, hasta, granularidad = _parametros_reporte()
 
-        data = [
-            {"producto": r.nombre, "cantidad": int(r.cantidad_vendida)}
-            for r in resultados
-        ]
+        cantidad_vendida = func.sum(ResumenVentaDiaria.cantidad)
+        filtros = _filtro_dias(ResumenVentaDiaria.dia, desde, hasta)
+
+        if granularidad is None:
+            resultados = (
+                session.query(
+                    Producto.nombre,
+                    cantidad_vendida.label("cantidad_vendida")
+                )
+                .join(ResumenVentaDiaria, ResumenVentaDiaria.id_producto == Producto.id_producto)
+                .filter(*filtros)
+                .group_by(Producto.nombre)
+                .order_by(cantidad_vendida.desc())
+                .limit(10)
+                .all()
+            )
+            data = [
+                {"producto": r.nombre, "cantidad": int(r.cantidad_vendida)}
+                for r in resultados
+            ]
+        else:
+            # Top 10 dentro de cada período
+            periodo = truncar_fecha(ResumenVentaDiaria.dia, granularidad, _dialecto(session))
+            consulta = (
+                session.query(
+                    periodo.label("periodo"),
+                    Producto.nombre.label("nombre"),
+                    cantidad_vendida.label("valor")
+                )
+                .join(ResumenVentaDiaria, ResumenVentaDiaria.id_producto == Producto.id_producto)
+                .filter(*filtros)
+                .group_by(periodo, Producto.nombre)
+            )
+            data = [
+                {"periodo": formatear_periodo(r.periodo), "producto": r.nombre, "cantidad": int(r.valor)}
+                for r in _top_por_periodo(session, consulta, 10)
+            ]
 
         return jsonify({"status": "success", "data": data}), 200
 
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error en productos más vendidos: {str(e)}"}), 500
-    finally:
-        session.close()
 
 # ======================================================
 #  3) RESERVAS POR DÍA
 # ======================================================
 @reporte_bp.route("/reservas/por-dia", methods=["GET"])
-def reservas_por_dia():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def reservas_por_dia(session):
     try:
+        desde, hasta, granularidad = _parametros_reporte('dia')
+
+        # Se agrupa por día (o semana/mes), no por el timestamp exacto de la reserva
+        periodo = truncar_fecha(Reserva.fecha_hora, granularidad, _dialecto(session))
         resultados = (
             session.query(
-                Reserva.fecha_hora,
+                periodo.label("periodo"),
                 func.count(Reserva.id_reserva).label("cantidad")
             )
-            .group_by(Reserva.fecha_hora)
-            .order_by(Reserva.fecha_hora)
+            .filter(*filtro_rango(Reserva.fecha_hora, desde, hasta))
+            .group_by(periodo)
+            .order_by(periodo)
             .all()
         )
 
         data = [
-            {"fecha": str(r.fecha_hora), "cantidad": int(r.cantidad)}
+            {"fecha": formatear_periodo(r.periodo), "cantidad": int(r.cantidad)}
             for r in resultados
         ]
 
         return jsonify({"status": "success", "data": data}), 200
-    
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error en reservas por día: {str(e)}"}), 500
-    finally:
-        session.close()
 
 
 # ======================================================
 #  4) MEDIOS DE PAGO
 # ======================================================
 @reporte_bp.route("/medios-pago", methods=["GET"])
-def medios_pago_usados():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def medios_pago_usados(session):
     try:
-        resultados = (
-            session.query(
-                MedioPago.nombre,
-                func.sum(Pago.monto).label("total"),
-                func.count(Pago.id_pago).label("cantidad")
-            )
-            .join(Pago, MedioPago.id_medio_pago == Pago.id_medio_pago)
-            .group_by(MedioPago.nombre)
-            .all()
+        desde, hasta, granularidad = _parametros_reporte()
+
+        columnas = [
+            MedioPago.nombre,
+            func.sum(ResumenCobroDiario.total).label("total"),
+            func.sum(ResumenCobroDiario.cantidad).label("cantidad")
+        ]
+        agrupamiento = [MedioPago.nombre]
+        if granularidad is not None:
+            periodo = truncar_fecha(ResumenCobroDiario.dia, granularidad, _dialecto(session))
+            columnas.insert(0, periodo.label("periodo"))
+            agrupamiento.insert(0, periodo)
+
+        query = (
+            session.query(*columnas)
+            .join(ResumenCobroDiario, MedioPago.id_medio_pago == ResumenCobroDiario.id_medio_pago)
+            .filter(*_filtro_dias(ResumenCobroDiario.dia, desde, hasta))
+            .group_by(*agrupamiento)
+            # Los días cuyos pagos se eliminaron quedan con cantidad 0
+            .having(func.sum(ResumenCobroDiario.cantidad) > 0)
         )
+        if granularidad is not None:
+            query = query.order_by(agrupamiento[0])
+        resultados = query.all()
 
-        data = [
-            {
+        data = []
+        for r in resultados:
+            fila = {
                 "medio_pago": r.nombre,
                 "total": float(r.total),
                 "cantidad": int(r.cantidad)
             }
-            for r in resultados
-        ]
+            if granularidad is not None:
+                fila["periodo"] = formatear_periodo(r.periodo)
+            data.append(fila)
 
         return jsonify({"status": "success", "data": data}), 200
 
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error en medios de pago: {str(e)}"}), 500
-    finally:
-        session.close()
 
 
 # ======================================================
 #  5) USO DE SECTORES
 # ======================================================
 @reporte_bp.route("/sectores/uso", methods=["GET"])
-def uso_sectores():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def uso_sectores(session):
     try:
-        resultados = (
-            session.query(
-                Sector.numero.label("sector_numero"),
-                func.count(Mesa.id_mesa).label("uso")
-            )
+        desde, hasta, granularidad = _parametros_reporte()
+
+        columnas = [
+            Sector.numero.label("sector_numero"),
+            func.count(Mesa.id_mesa).label("uso")
+        ]
+        agrupamiento = [Sector.numero]
+        if granularidad is not None:
+            periodo = truncar_fecha(Comanda.fecha, granularidad, _dialecto(session))
+            columnas.insert(0, periodo.label("periodo"))
+            agrupamiento.insert(0, periodo)
+
+        query = (
+            session.query(*columnas)
             .join(Mesa, Sector.id_sector == Mesa.id_sector)
             .join(Comanda, Comanda.id_mesa == Mesa.id_mesa)
-            .group_by(Sector.numero)
-            .all()
+            .filter(*filtro_rango(Comanda.fecha, desde, hasta))
+            .group_by(*agrupamiento)
         )
+        if granularidad is not None:
+            query = query.order_by(agrupamiento[0])
+        resultados = query.all()
 
-        data = [
-            {"sector": r.sector_numero, "uso": int(r.uso)}
-            for r in resultados
-        ]
+        data = []
+        for r in resultados:
+            fila = {"sector": r.sector_numero, "uso": int(r.uso)}
+            if granularidad is not None:
+                fila["periodo"] = formatear_periodo(r.periodo)
+            data.append(fila)
 
         return jsonify({"status": "success", "data": data}), 200
 
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error en uso de sectores: {str(e)}"}), 500
-    finally:
-        session.close()
 
 # ======================================================
 #  6) FACTURACIÓN DE MOZOS
 # ======================================================
 @reporte_bp.route("/mozos/facturacion", methods=["GET"])
-def facturacion_mozos():
-    session = SessionLocal()
+@cacheado("reportes")
+@con_sesion_lectura
+def facturacion_mozos(session):
     try:
+        desde, hasta, granularidad = _parametros_reporte()
+
+        total_facturado = func.sum(ResumenVentaDiaria.total)
+        columnas = [
+            Mozo.nombre_apellido.label("mozo_nombre"),
+            total_facturado.label("total_facturado")
+        ]
+        agrupamiento = [Mozo.nombre_apellido]
+        orden = [total_facturado.desc()]
+        if granularidad is not None:
+            periodo = truncar_fecha(ResumenVentaDiaria.dia, granularidad, _dialecto(session))
+            columnas.insert(0, periodo.label("periodo"))
+            agrupamiento.insert(0, periodo)
+            orden.insert(0, periodo)
+
         resultados = (
-            session.query(
-                Mozo.nombre_apellido.label("mozo_nombre"),
-                func.sum(Factura.total).label("total_facturado")
-            )
-            .join(Comanda, Mozo.id == Comanda.id_mozo)
-            .join(Factura, Factura.id_comanda == Comanda.id_comanda)
-            .group_by(Mozo.nombre_apellido)
-            .order_by(func.sum(Factura.total).desc())
+            session.query(*columnas)
+            .join(ResumenVentaDiaria, Mozo.id == ResumenVentaDiaria.id_mozo)
+            .filter(*_filtro_dias(ResumenVentaDiaria.dia, desde, hasta))
+            .group_by(*agrupamiento)
+            .order_by(*orden)
             .all()
         )
 
-        data = [
-            {"mozo": r.mozo_nombre, "facturado": float(r.total_facturado)}
-            for r in resultados
-        ]
+        data = []
+        for r in resultados:
+            fila = {"mozo": r.mozo_nombre, "facturado": float(r.total_facturado)}
+            if granularidad is not None:
+                fila["periodo"] = formatear_periodo(r.periodo)
+            data.append(fila)
 
         return jsonify({"status": "success", "data": data}), 200
 
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error al obtener facturación de mozos: {str(e)}"}), 500
-    finally:
-        session.close()
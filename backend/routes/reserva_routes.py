@@ -1,14 +1,20 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models.reserva import Reserva
 from models import Cliente, Mesa
+from utils.paginacion import paginar, ParametroInvalido
 from datetime import datetime
+from services.cache import invalidar_en_escrituras
+from services.disponibilidad import mesa_disponible
 
 reserva_bp = Blueprint('reserva_bp', __name__)
 
+# Las escrituras cambian los datos de los reportes cacheados
+invalidar_en_escrituras(reserva_bp, 'reportes')
+
 @reserva_bp.route('/', methods=['GET'])
-def listar_reservas():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_reservas(session):
     try:
         cancelado = request.args.get('cancelado', type=str)
         cliente_id = request.args.get('cliente_id', type=int)
@@ -16,15 +22,6 @@ def listar_reservas():
         fecha_hasta = request.args.get('fecha_hasta', type=str)
         order_by = request.args.get('order_by', default='fecha_hora', type=str)
         
-        # Paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(Reserva)
         
         # Filtros
@@ -52,16 +49,12 @@ def listar_reservas():
 
         # Orden
         if order_by == 'numero':
-            query = query.order_by(Reserva.numero)
+            orden = [(Reserva.numero, False)]
         else:
-            query = query.order_by(Reserva.fecha_hora)
-        
-        # Total antes de paginar
-        total = query.count()
+            orden = [(Reserva.fecha_hora, False)]
         
-        # Paginación
-        offset = (page - 1) * per_page
-        reservas = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        reservas, pagination = paginar(query, Reserva, orden)
         
         data = []
         for r in reservas:
@@ -77,71 +70,69 @@ def listar_reservas():
             item['estado'] = estado
             data.append(item)
         
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        session.close()
 
         
-@reserva_bp.route('/hoy', methods=['GET'])
-def listar_reservas_hoy():
-    """Lista las reservas activas de hoy en horario de Argentina"""
-    session = SessionLocal()
+def _rango_hoy_utc():
+    """Inicio y fin del día actual en horario de Argentina, expresados en UTC sin tzinfo (como en la BD)"""
+    from datetime import datetime, timedelta, timezone
     try:
-        from datetime import datetime, timedelta, timezone
+        import pytz
+        tz_argentina = pytz.timezone('America/Argentina/Buenos_Aires')
+        utc = pytz.UTC
+    except ImportError:
         try:
-            import pytz
-            tz_argentina = pytz.timezone('America/Argentina/Buenos_Aires')
-            utc = pytz.UTC
+            # Fallback a zoneinfo si pytz no está disponible
+            from zoneinfo import ZoneInfo
+            tz_argentina = ZoneInfo('America/Argentina/Buenos_Aires')
         except ImportError:
-            try:
-                # Fallback a zoneinfo si pytz no está disponible
-                from zoneinfo import ZoneInfo
-                tz_argentina = ZoneInfo('America/Argentina/Buenos_Aires')
-            except ImportError:
-                # Fallback final: Offset fijo UTC-3
-                tz_argentina = timezone(timedelta(hours=-3))
-            utc = timezone.utc
-        
-        # Obtener fecha actual en Argentina
-        ahora_arg = datetime.now(tz_argentina)
-        
-        # Inicio del día en Argentina (00:00:00)
-        inicio_dia_arg = ahora_arg.replace(hour=0, minute=0, second=0, microsecond=0)
-        # Fin del día en Argentina (23:59:59)
-        fin_dia_arg = ahora_arg.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        # Convertir a UTC para comparar con BD
-        inicio_dia_utc = inicio_dia_arg.astimezone(utc).replace(tzinfo=None)
-        fin_dia_utc = fin_dia_arg.astimezone(utc).replace(tzinfo=None)
-        
-        # Consultar reservas activas del día
-        reservas = session.query(Reserva).filter(
-            Reserva.cancelado == False,
-            Reserva.fecha_hora >= inicio_dia_utc,
-            Reserva.fecha_hora <= fin_dia_utc
-        ).all()
-        
-        data = []
-        for r in reservas:
-            item = r.json()
-            item['estado'] = 'activa'
-            data.append(item)
-        
+            # Fallback final: Offset fijo UTC-3
+            tz_argentina = timezone(timedelta(hours=-3))
+        utc = timezone.utc
+    
+    # Obtener fecha actual en Argentina
+    ahora_arg = datetime.now(tz_argentina)
+    
+    # Inicio del día en Argentina (00:00:00)
+    inicio_dia_arg = ahora_arg.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Fin del día en Argentina (23:59:59)
+    fin_dia_arg = ahora_arg.replace(hour=23, minute=59, second=59, microsecond=999999)
+    
+    # Convertir a UTC para comparar con BD
+    return inicio_dia_arg.astimezone(utc).replace(tzinfo=None), fin_dia_arg.astimezone(utc).replace(tzinfo=None)
+
+def datos_reservas_hoy(session):
+    """Reservas activas de hoy serializadas (compartido con el modo ASGI, ver asgi.py)"""
+    inicio_dia_utc, fin_dia_utc = _rango_hoy_utc()
+    
+    # Consultar reservas activas del día
+    reservas = session.query(Reserva).filter(
+        Reserva.cancelado == False,
+        Reserva.fecha_hora >= inicio_dia_utc,
+        Reserva.fecha_hora <= fin_dia_utc
+    ).all()
+    
+    data = []
+    for r in reservas:
+        item = r.json()
+        item['estado'] = 'activa'
+        data.append(item)
+    return data
+
+@reserva_bp.route('/hoy', methods=['GET'])
+@con_sesion_lectura
+def listar_reservas_hoy(session):
+    """Lista las reservas activas de hoy en horario de Argentina"""
+    try:
+        data = datos_reservas_hoy(session)
         return jsonify({
             'status': 'success',
             'data': data,
@@ -149,12 +140,10 @@ def listar_reservas_hoy():
         }), 200
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        session.close()
 
 @reserva_bp.route('/', methods=['POST'])
-def crear_reserva():
-    session = SessionLocal()
+@con_sesion
+def crear_reserva(session):
     try:
         data = request.get_json()
 
@@ -190,13 +179,8 @@ def crear_reserva():
         if mesa.cant_comensales < data['cant_personas']:
             return jsonify({'status': 'error', 'message': 'Capacidad de mesa insuficiente'}), 400
         
-        # Validación de disponibilidad de mesa
-        reserva_existente = session.query(Reserva).filter_by(
-            id_mesa=data['id_mesa'],
-            fecha_hora=fecha_reserva,  # Usar el datetime parseado
-            cancelado=False
-        ).first()
-        if reserva_existente:
+        # Validación de disponibilidad de mesa (reservas superpuestas y ocupación actual)
+        if not mesa_disponible(session, mesa.id_mesa, fecha_reserva):
             return jsonify({'status': 'error', 'message': 'La mesa ya está reservada para la fecha y hora seleccionadas'}), 400
 
         # Validación de duplicado de número
@@ -225,12 +209,10 @@ def crear_reserva():
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        session.close()
 
 @reserva_bp.route('/<int:reserva_id>', methods=['GET'])
-def obtener_reserva(reserva_id):   # 👈 corregido nombre del parámetro
-    session = SessionLocal()
+@con_sesion
+def obtener_reserva(session, reserva_id):   # 👈 corregido nombre del parámetro
     try:
         reserva = session.query(Reserva).get(reserva_id)
         if not reserva:
@@ -239,12 +221,10 @@ def obtener_reserva(reserva_id):   # 👈 corregido nombre del parámetro
         return jsonify({'status': 'success', 'data': reserva.json()}), 200
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Error al obtener reserva: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @reserva_bp.route('/<int:id>/cancelar', methods=['PUT'])
-def cancelar_reserva(id):
-    session = SessionLocal()
+@con_sesion
+def cancelar_reserva(session, id):
     try:
         reserva = session.query(Reserva).get(id)
         if not reserva:
@@ -267,12 +247,10 @@ def cancelar_reserva(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': f'Error al cancelar reserva: {str(e)}'}), 500
-    finally:
-        session.close()
 
 @reserva_bp.route('/<int:id>', methods=['PUT'])
-def actualizar_reserva(id):
-    session = SessionLocal()
+@con_sesion
+def actualizar_reserva(session, id):
     try:
         data = request.get_json()
         reserva = session.query(Reserva).get(id)
@@ -309,14 +287,10 @@ def actualizar_reserva(id):
         if mesa.cant_comensales < nueva_cant:
             return jsonify({'status': 'error', 'message': 'Capacidad de mesa insuficiente'}), 400
 
-        # Validar disponibilidad de mesa en la nueva fecha (excluir la propia reserva)
-        conflicto = session.query(Reserva).filter(
-            Reserva.id_mesa == nueva_mesa_id,
-            Reserva.fecha_hora == nueva_fecha,
-            Reserva.cancelado == False,
-            Reserva.id_reserva != id
-        ).first()
-        if conflicto:
+        # Validar disponibilidad si cambia la fecha o la mesa (excluir la propia reserva;
+        # si no cambian, la comanda abierta de una reserva en curso no debe bloquearla)
+        cambia_horario = nueva_fecha != reserva.fecha_hora or nueva_mesa_id != reserva.id_mesa
+        if cambia_horario and not mesa_disponible(session, mesa.id_mesa, nueva_fecha, excluir_reserva=id):
             return jsonify({'status': 'error', 'message': 'La mesa ya está reservada para la fecha y hora seleccionadas'}), 400
 
         # Aplicar cambios
@@ -332,13 +306,11 @@ def actualizar_reserva(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        session.close()
 
 
 @reserva_bp.route('/<int:id>/ausencia', methods=['PUT'])
-def ausencia_reserva(id):
-    session = SessionLocal()
+@con_sesion
+def ausencia_reserva(session, id):
     try:
         reserva = session.query(Reserva).get(id)
         if not reserva:
@@ -364,14 +336,12 @@ def ausencia_reserva(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': f'Error al marcar ausencia: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
 @reserva_bp.route('/<int:id>/asistida', methods=['PUT'])
-def marcar_reserva_asistida(id):
+@con_sesion
+def marcar_reserva_asistida(session, id):
     """Marcar una reserva como asistida (cambiar estado de 'activa' a 'asistida')"""
-    session = SessionLocal()
     try:
         reserva = session.query(Reserva).get(id)
         if not reserva:
@@ -401,5 +371,3 @@ def marcar_reserva_asistida(id):
     except Exception as e:
         session.rollback()
         return jsonify({'status': 'error', 'message': f'Error al marcar reserva como asistida: {str(e)}'}), 500
-    finally:
-        session.close()
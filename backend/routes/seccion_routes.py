@@ -1,25 +1,21 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Seccion
+from utils.paginacion import paginar, ParametroInvalido
+from services.versiones import condicional, versionar_en_escrituras
 
 seccion_bp = Blueprint('seccion', __name__)
 
+# Las escrituras cambian la versión del catálogo (ETag de los listados)
+versionar_en_escrituras(seccion_bp, 'secciones')
+
 @seccion_bp.route('/', methods=['GET'])
-def listar_secciones():
-    session = SessionLocal()
+@condicional('secciones')
+@con_sesion_lectura
+def listar_secciones(session):
     try:
         activos = request.args.get('activos', type=str)
         
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(Seccion)
         
         # Filtros
@@ -31,48 +27,33 @@ def listar_secciones():
             # Por defecto solo mostrar activos
             query = query.filter_by(baja=False)
         
-        # Ordenamiento por nombre
-        query = query.order_by(Seccion.nombre)
-        
-        # Contar total antes de paginar
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        secciones = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor) ordenada por nombre
+        secciones, pagination = paginar(query, Seccion, [(Seccion.nombre, False)])
         
         data = [s.json() for s in secciones]
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar secciones: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @seccion_bp.route('/', methods=['POST'])
-def crear_seccion():
-    session = SessionLocal()
+@con_sesion
+def crear_seccion(session):
     data = request.get_json()
     if not data or 'nombre' not in data:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'El campo "nombre" es requerido'
@@ -82,7 +63,6 @@ def crear_seccion():
     session.add(nueva)
     session.commit()
     res = nueva.json()
-    session.close()
     return jsonify({
         'status': 'success',
         'message': 'Sección creada correctamente',
@@ -91,10 +71,9 @@ def crear_seccion():
 
 
 @seccion_bp.route('/<int:id>', methods=['GET'])
-def obtener_seccion(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_seccion(session, id):
     seccion = session.query(Seccion).get(id)
-    session.close()
     if not seccion or seccion.baja:
         return jsonify({
             'status': 'error',
@@ -107,11 +86,10 @@ def obtener_seccion(id):
 
 
 @seccion_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_seccion(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_seccion(session, id):
     seccion = session.query(Seccion).get(id)
     if not seccion or seccion.baja:
-        session.close()
         return jsonify({
             'status': 'error',
             'message': 'Sección no encontrada o ya dada de baja'
@@ -120,7 +98,6 @@ def eliminar_seccion(id):
     seccion.baja = True
     session.commit()
     res = seccion.json()
-    session.close()
     return jsonify({
         'status': 'success',
         'message': 'Sección dada de baja correctamente',
@@ -129,19 +106,17 @@ def eliminar_seccion(id):
 
 
 @seccion_bp.route('/<int:id>', methods=['PUT'])
-def actualizar_seccion(id):
-    session = SessionLocal()
+@con_sesion
+def actualizar_seccion(session, id):
     data = request.get_json()
 
     seccion = session.query(Seccion).get(id)
     if not seccion:
-        session.close()
         return jsonify({'status': 'error', 'message': 'Sección no encontrada'}), 404
 
     seccion.nombre = data.get('nombre', seccion.nombre)
     session.commit()
     res = seccion.json()
-    session.close()
 
     return jsonify({
         'status': 'success',
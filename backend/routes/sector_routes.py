@@ -1,25 +1,20 @@
 from flask import Blueprint, jsonify, request
-from db import SessionLocal
+from db import con_sesion, con_sesion_lectura
 from models import Sector, Mesa
+from utils.paginacion import paginar, ParametroInvalido
+from services.versiones import condicional, versionar_en_escrituras
 
 sector_bp = Blueprint('sector', __name__)
 
+# Las escrituras cambian la versión del catálogo (ETag de los listados)
+versionar_en_escrituras(sector_bp, 'sectores')
+
 @sector_bp.route('/', methods=['GET'])
-def listar_sectores():
-    session = SessionLocal()
+@con_sesion_lectura
+def listar_sectores(session):
     try:
         estado = request.args.get('estado', type=str)  # 'activo' o 'baja'
         
-        # Parámetros de paginación
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
-        
-        # Validar parámetros de paginación
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
         query = session.query(Sector)
         
         if estado == 'activo':
@@ -30,12 +25,8 @@ def listar_sectores():
             # Por defecto solo mostrar activos
             query = query.filter_by(baja=False)
         
-        # Contar total antes de paginar
-        total = query.count()
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        sectores = query.offset(offset).limit(per_page).all()
+        # Paginación (offset o cursor)
+        sectores, pagination = paginar(query, Sector, [])
         
         data = []
         for s in sectores:
@@ -48,34 +39,28 @@ def listar_sectores():
             sector_data['cantidad_mesas'] = mesas_activas
             data.append(sector_data)
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         return jsonify({
             'status': 'success',
             'data': data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
+    except ParametroInvalido as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al listar sectores: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @sector_bp.route('/todos', methods=['GET'])
-def listar_todos_sectores():
+@condicional('sectores', 'mesas')  # incluye la cantidad de mesas activas
+@con_sesion_lectura
+def listar_todos_sectores(session):
     """Endpoint para obtener todos los sectores activos sin paginación (para usar en selects)"""
-    session = SessionLocal()
     try:
         query = session.query(Sector).filter_by(baja=False).order_by(Sector.numero)
         sectores = query.all()
@@ -100,13 +85,11 @@ def listar_todos_sectores():
             'status': 'error',
             'message': f'Error al listar sectores: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @sector_bp.route('/', methods=['POST'])
-def crear_sector():
-    session = SessionLocal()
+@con_sesion
+def crear_sector(session):
     try:
         data = request.get_json()
         
@@ -144,13 +127,11 @@ def crear_sector():
             'status': 'error',
             'message': f'Error al crear sector: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @sector_bp.route('/<int:id>', methods=['GET'])
-def obtener_sector(id):
-    session = SessionLocal()
+@con_sesion
+def obtener_sector(session, id):
     try:
         sector = session.query(Sector).get(id)
         
@@ -177,13 +158,11 @@ def obtener_sector(id):
             'status': 'error',
             'message': f'Error al obtener sector: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @sector_bp.route('/<int:id>', methods=['PUT'])
-def modificar_sector(id):
-    session = SessionLocal()
+@con_sesion
+def modificar_sector(session, id):
     try:
         data = request.get_json()
         sector = session.query(Sector).get(id)
@@ -224,13 +203,11 @@ def modificar_sector(id):
             'status': 'error',
             'message': f'Error al modificar sector: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
 
 @sector_bp.route('/<int:id>', methods=['DELETE'])
-def eliminar_sector(id):
-    session = SessionLocal()
+@con_sesion
+def eliminar_sector(session, id):
     try:
         sector = session.query(Sector).get(id)
         
@@ -281,6 +258,4 @@ def eliminar_sector(id):
             'status': 'error',
             'message': f'Error al dar de baja el sector: {str(e)}'
         }), 500
-    finally:
-        session.close()
 
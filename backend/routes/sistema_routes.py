@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+import db
+
+sistema_bp = Blueprint('sistema', __name__)
+
+@sistema_bp.route('/pool', methods=['GET'])
+def estado_pool():
+    """Ocupación y contadores del pool de conexiones de este proceso"""
+    try:
+        return jsonify({'status': 'success', 'data': db.estado_pool()}), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Error al obtener el estado del pool: {str(e)}'}), 500
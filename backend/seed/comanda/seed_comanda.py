@@ -59,6 +59,7 @@ def seed_comandas(session, mozos, mesas, productos=None, cantidad=20):
                     entregado=entregado
                 )
                 session.add(detalle)
+                comanda.total += producto.precio * cantidad
         
         comandas.append(comanda)
     
@@ -5,6 +5,7 @@ from random import randint, choice
 from datetime import datetime
 from decimal import Decimal
 from models import Factura, DetalleComanda
+from services.numeracion import formatear_codigo_factura
 
 
 def seed_facturas(session, clientes, comandas=None):
@@ -20,6 +21,8 @@ def seed_facturas(session, clientes, comandas=None):
     print("📦 Creando facturas...")
 
     facturas = []
+    # Códigos con el formato de la API; main() sincroniza después numeracion_factura
+    ahora = datetime.utcnow()
 
     if comandas:
         # Filtrar comandas que tengan al menos un detalle (más realista)
@@ -41,8 +44,8 @@ def seed_facturas(session, clientes, comandas=None):
         for i, c in enumerate(comandas_con_detalles):
             cliente = choice(clientes)
             id_comanda = getattr(c, 'id_comanda', None)
-            codigo = f"F-{randint(1000,9999)}-{i}"
-            fecha = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            codigo = formatear_codigo_factura(ahora, i + 1)
+            fecha = ahora.strftime('%Y-%m-%d %H:%M:%S')
             # total por ahora lo tomamos de la comanda si existe, sino aleatorio
             try:
                 total_val = Decimal(str(c.calcular_total())) if getattr(c, 'calcular_total', None) else Decimal(f"{randint(100, 2000)}.{randint(0,99):02d}")
@@ -62,8 +65,8 @@ def seed_facturas(session, clientes, comandas=None):
         num_facturas = max(5, len(clientes) // 2)
         for i in range(num_facturas):
             cliente = choice(clientes)
-            codigo = f"F-{randint(1000,9999)}-{i}"
-            fecha = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            codigo = formatear_codigo_factura(ahora, i + 1)
+            fecha = ahora.strftime('%Y-%m-%d %H:%M:%S')
             total = Decimal(f"{randint(100, 2000)}.{randint(0,99):02d}")
 
             factura = Factura(
@@ -16,6 +16,10 @@ from models import (
     Sector, Mesa, MedioPago, Cliente, Mozo, Comanda, DetalleComanda, Reserva
 )
 from models import Factura, DetalleFactura, Pago
+from models import ResumenVentaDiaria, ResumenCobroDiario, NumeracionFactura
+from services.numeracion import sincronizar_numeracion_factura
+from services.resumenes import reconstruir_resumenes
+from services.versiones import incrementar_version, RECURSOS_CATALOGO
 
 # Importar seeders
 from seed.sector.seed_sector import seed_sectores
@@ -37,6 +41,12 @@ def limpiar_datos(session):
     print("⚠️  Limpiando datos existentes...")
     try:
         # Limpiar en orden de dependencias (primero las tablas dependientes)
+        # Resúmenes diarios (FK a producto, mozo y medio_pago) y numeración de facturas.
+        # version_recurso no se borra: las versiones deben seguir creciendo para
+        # que los ETag y las claves de caché anteriores al seed no vuelvan a coincidir
+        session.query(ResumenVentaDiaria).delete()
+        session.query(ResumenCobroDiario).delete()
+        session.query(NumeracionFactura).delete()
         # Detalles y facturas
         session.query(Pago).delete()
         session.query(DetalleFactura).delete()
@@ -58,8 +68,9 @@ def limpiar_datos(session):
         print("✅ Datos limpiados")
     except Exception as e:
         session.rollback()
-        print(f"⚠️  Error al limpiar datos: {str(e)}")
-        print("   Continuando con la carga...")
+        # Cargar sobre datos viejos solo terminaría en duplicados
+        print(f"❌ Error al limpiar datos: {str(e)}")
+        raise
 
 
 def main():
@@ -94,6 +105,16 @@ def main():
         # Crear pagos
         pagos = seed_pagos(session, facturas, medios_pago)
 
+        # Facturas y pagos se cargaron por fuera de la API: armar los resúmenes de
+        # los reportes y dejar el contador de facturas después de los códigos usados
+        resumenes = reconstruir_resumenes(session)
+        sincronizar_numeracion_factura(session)
+
+        # El catálogo y los clientes cambiaron por fuera de la API: invalidar los ETag
+        # que tengan los navegadores y el índice de autocompletado de clientes
+        incrementar_version(session, *RECURSOS_CATALOGO, 'clientes')
+        session.commit()
+
         print("=" * 50)
         print("✅ ¡Carga de datos completada exitosamente!")
         print(f"📊 Resumen:")
@@ -109,6 +130,7 @@ def main():
         print(f"   - Facturas: {len(facturas)}")
         print(f"   - Detalles de factura: {len(detalles)}")
         print(f"   - Pagos: {len(pagos)}")
+        print(f"   - Resúmenes diarios: {resumenes['ventas']} de ventas, {resumenes['cobros']} de cobros")
 
     except Exception as e:
         session.rollback()
@@ -42,6 +42,7 @@ def seed_pagos(session, facturas, medios_pago):
                 fecha=fecha_pago
             )
             session.add(pago)
+            factura.total_pagado = monto_a_pagar
             pagos.append(pago)
             
     session.commit()
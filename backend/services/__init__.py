@@ -0,0 +1 @@
+# Lógica de negocio compartida por rutas y comandos de Flask
@@ -0,0 +1,132 @@
+"""
+Índice en memoria del proceso para el autocompletado de clientes
+(GET /api/clientes/autocomplete), usado por la caja al facturar.
+
+Mantiene dos listas ordenadas (documento y apellido normalizado) de los
+clientes activos; un prefijo se resuelve con bisect sin tocar la tabla cliente.
+La vigencia se controla igual que services/catalogo.py: las escrituras de
+cliente_routes incrementan la versión 'clientes' de `version_recurso` al hacer
+commit y cada uso lee esa única fila; si cambió (en este u otro worker) se
+reconstruye el índice con una consulta.
+
+Con cientos de miles de clientes la reconstrucción tarda segundos: se hace en un
+hilo aparte (una sola a la vez) y mientras tanto se sigue respondiendo con el
+snapshot anterior. Solo la primera carga (o la siguiente a invalidar()) espera.
+"""
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from sqlalchemy.orm import Session
+
+from models import Cliente
+from services.versiones import versiones
+
+MAX_SUGERENCIAS = 20
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Pérez' y 'perez' se buscan igual"""
+    descompuesto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _con_prefijo(claves, prefijo):
+    """Posiciones de las claves (ordenadas) que empiezan con el prefijo"""
+    i = bisect_left(claves, (prefijo,))
+    while i < len(claves) and claves[i][0].startswith(prefijo):
+        yield claves[i][1]
+        i += 1
+
+
+class IndiceClientes:
+    """Snapshot de los clientes activos asociado a una versión (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (versión, (clientes por id, [(documento, id)], [(apellido nombre normalizado, id)])) o None
+        self._vigencia = None
+        self._hilo = None
+        # Cambia con invalidar(): descarta las reconstrucciones que ya estaban en curso
+        self._generacion = 0
+        self.recargas = 0
+
+    @staticmethod
+    def _construir(session):
+        version = versiones(session, ('clientes',))['clientes'][0]
+        filas = session.query(Cliente.id_cliente, Cliente.documento, Cliente.nombre, Cliente.apellido) \
+            .filter(Cliente.baja == False).all()
+        return version, (
+            {f.id_cliente: f for f in filas},
+            sorted((f.documento, f.id_cliente) for f in filas),
+            sorted((normalizar(f'{f.apellido} {f.nombre}'), f.id_cliente) for f in filas),
+        )
+
+    def _instalar(self, vigencia):
+        # Una sola asignación: los lectores sin lock siempre ven versión y snapshot juntos
+        self._vigencia = vigencia
+        self.recargas += 1
+
+    def _reconstruir(self, bind, generacion):
+        try:
+            with Session(bind) as session:
+                vigencia = self._construir(session)
+        except Exception:
+            logger.exception('No se pudo reconstruir el índice de clientes; se sigue usando el anterior')
+            return
+        with self._lock:
+            # Las versiones solo crecen: no pisar un snapshot más nuevo
+            if generacion == self._generacion and self._vigencia is not None and vigencia[0] >= self._vigencia[0]:
+                self._instalar(vigencia)
+
+    def _vigente(self, session):
+        version = versiones(session, ('clientes',))['clientes'][0]
+        vigencia = self._vigencia
+        # <=: una réplica atrasada no vuelve el índice a datos viejos
+        if vigencia is not None and version <= vigencia[0]:
+            return vigencia[1]
+        with self._lock:
+            if self._vigencia is None:
+                # Primera carga: no hay snapshot para servir mientras tanto
+                self._instalar(self._construir(session))
+            elif version > self._vigencia[0] and not (self._hilo and self._hilo.is_alive()):
+                # Con su propia sesión sobre la misma base: la del request se cierra al responder
+                self._hilo = threading.Thread(
+                    target=self._reconstruir, args=(session.get_bind(), self._generacion),
+                    name='autocompletado-clientes', daemon=True
+                )
+                self._hilo.start()
+            return self._vigencia[1]
+
+    def sugerencias(self, session, prefijo, limite=10):
+        """
+        Hasta `limite` clientes cuyo documento o apellido empieza con el prefijo.
+        Primero los de documento (ordenados por documento), después los de apellido.
+        """
+        clientes, por_documento, por_apellido = self._vigente(session)
+        encontrados = []
+        for ids in (_con_prefijo(por_documento, prefijo.strip()), _con_prefijo(por_apellido, normalizar(prefijo))):
+            for id_cliente in ids:
+                if len(encontrados) == limite:
+                    break
+                if id_cliente not in encontrados:
+                    encontrados.append(id_cliente)
+        return [clientes[i] for i in encontrados]
+
+    def esperar(self, timeout=None):
+        """Espera a que termine la reconstrucción en curso (si hay una)"""
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+
+    def invalidar(self):
+        """Fuerza la reconstrucción en el próximo uso (cambios hechos por fuera de la API)"""
+        with self._lock:
+            self._generacion += 1
+            self._vigencia = None
+
+
+indice_clientes = IndiceClientes()
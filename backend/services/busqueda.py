@@ -0,0 +1,156 @@
+"""
+Búsqueda de clientes y productos con relevancia y coincidencia por prefijo
+(mientras se escribe). La usa GET /api/buscar.
+
+PostgreSQL (índices de la migración busqueda_trigram):
+- tsvector 'simple' sobre el nombre, con to_tsquery de prefijos ('juan:* & pe:*'),
+  así cada palabra escrita matchea el comienzo de alguna palabra del nombre;
+- pg_trgm (word_similarity, operador %>) para tolerar errores de tipeo;
+- ILIKE 'x%' sobre documento / código (índice de trigramas).
+La relevancia suma ts_rank + similitud + un bonus por prefijo exacto.
+
+SQLite (tests / desarrollo): cada palabra debe ser prefijo de alguna palabra de
+los campos (LIKE 'x%' o '% x%') y la relevancia se arma con CASE.
+"""
+import re
+
+from sqlalchemy import and_, case, func, literal, literal_column, or_, text
+
+from models import Cliente, Producto
+
+MAX_RESULTADOS = 50
+# Umbral de word_similarity para el operador %> (pg_trgm usa 0.6 por defecto)
+SIMILITUD_MINIMA = 0.4
+# Letras y dígitos: el resto (incluido '_') separa palabras
+_PALABRA = re.compile(r'[^\W_]+')
+
+
+def palabras(termino):
+    """Palabras buscables del término (sin operadores de tsquery ni comodines de LIKE)"""
+    return _PALABRA.findall((termino or '').lower())
+
+
+def _like_escapado(valor):
+    return valor.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _texto(*columnas):
+    """col1 || ' ' || col2: misma expresión que los índices de la migración"""
+    expresion = columnas[0]
+    for columna in columnas[1:]:
+        expresion = expresion.op('||')(literal_column("' '")).op('||')(columna)
+    return expresion
+
+
+def _consulta_prefijos(tokens):
+    return ' & '.join(f'{t}:*' for t in tokens)
+
+
+def _buscar_postgresql(session, columnas_salida, columnas_texto, columna_clave, termino, tokens, filtros, limite):
+    texto = _texto(*columnas_texto)
+    vector = func.to_tsvector(literal_column("'simple'"), texto)
+    consulta_ts = func.to_tsquery(literal_column("'simple'"), _consulta_prefijos(tokens))
+    termino_normalizado = ' '.join(tokens)
+    prefijo_clave = columna_clave.ilike(f'{_like_escapado(termino.strip())}%')
+
+    # Solo para esta transacción
+    session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :umbral, true)"),
+                    {'umbral': str(SIMILITUD_MINIMA)})
+    # pg_trgm ya ignora mayúsculas: la expresión queda igual a la de los índices
+    relevancia = (
+        func.ts_rank(vector, consulta_ts)
+        + func.word_similarity(termino_normalizado, texto)
+        + case((prefijo_clave, 1.0), else_=0.0)
+    ).label('relevancia')
+    return (
+        session.query(*columnas_salida, relevancia)
+        .filter(*filtros)
+        .filter(or_(
+            vector.op('@@')(consulta_ts),
+            prefijo_clave,
+            # texto %> término = word_similarity(término, texto) > umbral; con la
+            # columna a la izquierda el planner puede usar el índice de trigramas
+            texto.op('%>')(literal(termino_normalizado)),
+        ))
+        .order_by(relevancia.desc(), *columnas_texto)
+        .limit(limite)
+        .all()
+    )
+
+
+def _buscar_sqlite(session, columnas_salida, columnas_texto, columna_clave, termino, tokens, filtros, limite):
+    condiciones = []
+    puntaje = []
+    for token in tokens:
+        patron = _like_escapado(token)
+        alternativas = [func.lower(columna_clave).like(f'{patron}%', escape='\\')]
+        for peso, columna in enumerate(reversed(columnas_texto), start=1):
+            empieza = func.lower(columna).like(f'{patron}%', escape='\\')
+            palabra = func.lower(columna).like(f'% {patron}%', escape='\\')
+            alternativas += [empieza, palabra]
+            puntaje += [case((empieza, 0.5 * peso), else_=0.0), case((palabra, 0.25 * peso), else_=0.0)]
+        condiciones.append(or_(*alternativas))
+    prefijo_clave = func.lower(columna_clave).like(f'{_like_escapado(termino.strip().lower())}%', escape='\\')
+    puntaje.append(case((prefijo_clave, 1.0), else_=0.0))
+
+    relevancia = sum(puntaje[1:], puntaje[0]).label('relevancia')
+    return (
+        session.query(*columnas_salida, relevancia)
+        .filter(*filtros)
+        .filter(and_(*condiciones))
+        .order_by(relevancia.desc(), *columnas_texto)
+        .limit(limite)
+        .all()
+    )
+
+
+def _buscar(session, columnas_salida, columnas_texto, columna_clave, termino, filtros, limite):
+    tokens = palabras(termino)
+    if not tokens:
+        return []
+    limite = min(limite, MAX_RESULTADOS)
+    if session.get_bind().dialect.name == 'postgresql':
+        return _buscar_postgresql(session, columnas_salida, columnas_texto, columna_clave,
+                                  termino, tokens, filtros, limite)
+    return _buscar_sqlite(session, columnas_salida, columnas_texto, columna_clave, termino, tokens, filtros, limite)
+
+
+def buscar_clientes(session, termino, limite=10):
+    """Clientes activos por documento (prefijo) o nombre y apellido (prefijo por palabra, con errores de tipeo en PG)"""
+    filas = _buscar(
+        session,
+        (Cliente.id_cliente, Cliente.documento, Cliente.nombre, Cliente.apellido),
+        (Cliente.apellido, Cliente.nombre), Cliente.documento,
+        termino, (Cliente.baja == False,), limite
+    )
+    return [{
+        'id_cliente': f.id_cliente,
+        'documento': f.documento,
+        'nombre': f.nombre,
+        'apellido': f.apellido,
+        'relevancia': round(float(f.relevancia), 4),
+    } for f in filas]
+
+
+def buscar_productos(session, termino, limite=10):
+    """Productos activos por código (prefijo) o nombre (prefijo por palabra, con errores de tipeo en PG)"""
+    filas = _buscar(
+        session,
+        (Producto.id_producto, Producto.codigo, Producto.nombre, Producto.precio, Producto.id_seccion),
+        (Producto.nombre,), Producto.codigo,
+        termino, (Producto.baja == False,), limite
+    )
+    return [{
+        'id_producto': f.id_producto,
+        'codigo': f.codigo,
+        'nombre': f.nombre,
+        'precio': float(f.precio),
+        'id_seccion': f.id_seccion,
+        'relevancia': round(float(f.relevancia), 4),
+    } for f in filas]
+
+
+BUSCADORES = {
+    'clientes': buscar_clientes,
+    'productos': buscar_productos,
+}
@@ -0,0 +1,221 @@
+"""
+Caché de respuestas JSON para endpoints de solo lectura (reportes).
+
+- Backend por defecto: LRU en memoria del proceso con TTL.
+- Backend compartido opcional: Redis, si el paquete `redis` está instalado y se
+  define CACHE_REDIS_URL (útil con varios workers de gunicorn).
+
+La clave es endpoint + query string normalizado. Las escrituras que afectan a
+los reportes invalidan el espacio completo (ver `invalidar_en_escrituras`).
+Variables de entorno: CACHE_TTL (segundos, default 60), CACHE_MAX_ENTRADAS
+(default 512), CACHE_REDIS_URL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, Response
+
+from db import forzar_primaria
+
+try:
+    import redis
+except ImportError:  # dependencia opcional
+    redis = None
+
+TTL_DEFAULT = int(os.getenv('CACHE_TTL', '60'))
+MAX_ENTRADAS_DEFAULT = int(os.getenv('CACHE_MAX_ENTRADAS', '512'))
+METODOS_ESCRITURA = ('POST', 'PUT', 'PATCH', 'DELETE')
+# @condicional (services/versiones.py) deja aquí la versión de los datos del
+# request; si está, forma parte de la clave y los cambios no necesitan invalidar
+ENTORNO_VERSION = 'restaurante.version_recurso'
+
+
+class CacheLocal:
+    """LRU con TTL en memoria del proceso (thread-safe)"""
+
+    nombre = 'memoria'
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_DEFAULT):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, espacio, clave):
+        with self._lock:
+            entrada = self._datos.get((espacio, clave))
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence < time.monotonic():
+                del self._datos[(espacio, clave)]
+                return None
+            self._datos.move_to_end((espacio, clave))
+            return valor
+
+    def guardar(self, espacio, clave, valor, ttl):
+        with self._lock:
+            self._datos[(espacio, clave)] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end((espacio, clave))
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, espacio):
+        with self._lock:
+            for llave in [k for k in self._datos if k[0] == espacio]:
+                del self._datos[llave]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def tamanio(self):
+        return len(self._datos)
+
+
+class CacheRedis:
+    """
+    Backend compartido entre procesos. Cada espacio tiene un número de
+    generación; invalidar es un INCR y las claves viejas vencen solas por TTL.
+    """
+
+    nombre = 'redis'
+
+    def __init__(self, url, prefijo='restaurante:cache'):
+        self._cliente = redis.Redis.from_url(url)
+        self.prefijo = prefijo
+
+    def _generacion(self, espacio):
+        return int(self._cliente.get(f'{self.prefijo}:{espacio}:gen') or 0)
+
+    def _clave(self, espacio, clave):
+        return f'{self.prefijo}:{espacio}:{self._generacion(espacio)}:{clave}'
+
+    def obtener(self, espacio, clave):
+        valor = self._cliente.get(self._clave(espacio, clave))
+        if valor is None:
+            return None
+        estado, cuerpo = valor.split(b'\n', 1)
+        return int(estado), cuerpo
+
+    def guardar(self, espacio, clave, valor, ttl):
+        estado, cuerpo = valor
+        self._cliente.set(self._clave(espacio, clave), str(estado).encode() + b'\n' + cuerpo, ex=ttl)
+
+    def invalidar(self, espacio):
+        self._cliente.incr(f'{self.prefijo}:{espacio}:gen')
+
+    def limpiar(self):
+        for llave in self._cliente.scan_iter(f'{self.prefijo}:*'):
+            self._cliente.delete(llave)
+
+    def tamanio(self):
+        return None
+
+
+class CacheRespuestas:
+    """Fachada sobre el backend con contadores de aciertos/fallos por espacio"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._contadores = {}
+
+    def _contar(self, espacio, campo):
+        with self._lock:
+            contadores = self._contadores.setdefault(
+                espacio, {'hits': 0, 'misses': 0, 'invalidaciones': 0}
+            )
+            contadores[campo] += 1
+
+    def obtener(self, espacio, clave):
+        valor = self.backend.obtener(espacio, clave)
+        self._contar(espacio, 'hits' if valor is not None else 'misses')
+        return valor
+
+    def guardar(self, espacio, clave, valor, ttl):
+        self.backend.guardar(espacio, clave, valor, ttl)
+
+    def invalidar(self, espacio):
+        self.backend.invalidar(espacio)
+        self._contar(espacio, 'invalidaciones')
+
+    def limpiar(self):
+        self.backend.limpiar()
+        with self._lock:
+            self._contadores.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            espacios = {}
+            for espacio, c in self._contadores.items():
+                consultas = c['hits'] + c['misses']
+                espacios[espacio] = dict(c, hit_ratio=round(c['hits'] / consultas, 4) if consultas else None)
+        return {
+            'backend': self.backend.nombre,
+            'entradas': self.backend.tamanio(),
+            'espacios': espacios,
+        }
+
+
+def _crear_backend():
+    url = os.getenv('CACHE_REDIS_URL')
+    if url and redis is not None:
+        return CacheRedis(url)
+    return CacheLocal()
+
+
+cache = CacheRespuestas(_crear_backend())
+
+
+def _clave_request():
+    """endpoint + parámetros ordenados, para que ?a=1&b=2 y ?b=2&a=1 compartan entrada"""
+    parametros = '&'.join(
+        f'{k}={v}' for k, valores in sorted(request.args.lists()) for v in sorted(valores)
+    )
+    version = request.environ.get(ENTORNO_VERSION)
+    if version:
+        return f'{request.endpoint}@{version}?{parametros}'
+    return f'{request.endpoint}?{parametros}'
+
+
+def cacheado(espacio, ttl=None):
+    """
+    Decorador para vistas GET que devuelven (jsonify(...), status).
+    Solo se guardan respuestas 200; se agrega el header X-Cache: HIT|MISS.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            clave = _clave_request()
+            guardado = cache.obtener(espacio, clave)
+            if guardado is not None:
+                estado, cuerpo = guardado
+                respuesta = Response(cuerpo, status=estado, mimetype='application/json')
+                respuesta.headers['X-Cache'] = 'HIT'
+                return respuesta
+
+            # Lo que se guarda lo ven todos los clientes (también quien acaba de
+            # escribir e invalidó la caché): se llena desde la primaria, no la réplica
+            forzar_primaria()
+            resultado = vista(*args, **kwargs)
+            respuesta, estado = resultado if isinstance(resultado, tuple) else (resultado, resultado.status_code)
+            if estado == 200:
+                cache.guardar(espacio, clave, (estado, respuesta.get_data()), ttl or TTL_DEFAULT)
+            respuesta.headers['X-Cache'] = 'MISS'
+            return respuesta, estado
+        return envoltura
+    return decorador
+
+
+def invalidar_en_escrituras(blueprint, *espacios):
+    """Registra un after_request que invalida los espacios tras cada escritura exitosa del blueprint"""
+    @blueprint.after_request
+    def _invalidar_cache(respuesta):
+        if request.method in METODOS_ESCRITURA and respuesta.status_code < 400:
+            for espacio in espacios:
+                cache.invalidar(espacio)
+        return respuesta
+    return _invalidar_cache
@@ -0,0 +1,66 @@
+"""
+Caché en memoria del proceso del catálogo de productos (id -> precio/baja/sección).
+
+La usan las rutas de comandas para validar productos y capturar el precio al
+cargar ítems, sin consultar la tabla producto en cada ítem. La vigencia se
+controla con la versión 'productos' de `version_recurso` (services/versiones.py),
+que las escrituras de producto_routes incrementan al hacer commit: cada uso lee
+esa única fila y, si la versión cambió (en este u otro worker), se recarga el
+catálogo completo con una consulta.
+"""
+import threading
+from collections import namedtuple
+
+from models import Producto
+from services.versiones import versiones
+
+ProductoCatalogo = namedtuple('ProductoCatalogo', ['precio', 'baja', 'id_seccion'])
+
+
+class CatalogoProductos:
+    """Snapshot del catálogo asociado a una versión (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._productos = {}
+        self.recargas = 0
+
+    def _vigentes(self, session):
+        version = versiones(session, ('productos',))['productos'][0]
+        if version == self._version:
+            return self._productos
+        with self._lock:
+            if version != self._version:
+                filas = session.query(
+                    Producto.id_producto, Producto.precio, Producto.baja, Producto.id_seccion
+                ).all()
+                self._productos = {
+                    f.id_producto: ProductoCatalogo(f.precio, bool(f.baja), f.id_seccion) for f in filas
+                }
+                self._version = version
+                self.recargas += 1
+            return self._productos
+
+    def obtener(self, session, id_producto):
+        """ProductoCatalogo del producto (o None si no existe)"""
+        return self._vigentes(session).get(id_producto)
+
+    def precios_activos(self, session, ids_producto):
+        """{id_producto: precio} de los productos activos indicados"""
+        if not ids_producto:
+            return {}
+        productos = self._vigentes(session)
+        return {
+            i: productos[i].precio for i in ids_producto
+            if i in productos and not productos[i].baja
+        }
+
+    def invalidar(self):
+        """Fuerza la recarga en el próximo uso (cambios hechos por fuera de la API)"""
+        with self._lock:
+            self._version = None
+            self._productos = {}
+
+
+catalogo = CatalogoProductos()
@@ -0,0 +1,91 @@
+"""
+Disponibilidad de mesas para reservas y clientes sin reserva (walk-in).
+
+Una mesa está libre en la ventana [inicio, inicio + duración) si:
+- está activa y tiene capacidad suficiente;
+- ninguna reserva vigente de la mesa se superpone con la ventana. Cada reserva
+  ocupa [fecha_hora, fecha_hora + duración); como todas duran lo mismo, la
+  superposición es el rango  inicio - duración < fecha_hora < inicio + duración,
+  que se resuelve con el índice (id_mesa, fecha_hora) de reserva;
+- si la ventana empieza antes de que se libere la mesa hoy (ahora + duración),
+  no tiene una comanda abierta ni estado 'ocupada'.
+
+Todo se evalúa en una sola consulta (NOT EXISTS por mesa), tanto para listar
+mesas libres como para validar una mesa al crear o mover una reserva.
+
+Variable de entorno: RESERVA_DURACION_MINUTOS (120).
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import joinedload
+
+from models import Comanda, Mesa, Reserva
+
+DURACION_RESERVA = timedelta(minutes=int(os.getenv('RESERVA_DURACION_MINUTOS', '120')))
+
+# Reservas que ocupan la mesa (las completadas ya la liberaron)
+ESTADOS_RESERVA_VIGENTE = ('activa', 'asistida', 'en_curso')
+ESTADOS_MESA_OCUPADA = ('ocupada',)
+
+
+def _reserva_superpuesta(inicio, duracion, excluir_reserva):
+    condiciones = [
+        Reserva.id_mesa == Mesa.id_mesa,
+        Reserva.cancelado == False,
+        Reserva.estado.in_(ESTADOS_RESERVA_VIGENTE),
+        Reserva.fecha_hora > inicio - duracion,
+        Reserva.fecha_hora < inicio + duracion,
+    ]
+    if excluir_reserva is not None:
+        condiciones.append(Reserva.id_reserva != excluir_reserva)
+    return exists().where(and_(*condiciones))
+
+
+def _ocupada_ahora():
+    comanda_abierta = exists().where(and_(
+        Comanda.id_mesa == Mesa.id_mesa,
+        Comanda.estado == 'Abierta',
+        Comanda.baja == False,
+    ))
+    return or_(comanda_abierta, Mesa.estado.in_(ESTADOS_MESA_OCUPADA))
+
+
+def consulta_disponibles(session, inicio=None, cant_personas=None, id_sector=None,
+                         duracion=DURACION_RESERVA, excluir_reserva=None, ahora=None):
+    """
+    Query de las mesas libres en [inicio, inicio + duración) (inicio None = ahora).
+    `excluir_reserva` ignora esa reserva (al mover una reserva existente).
+    Ordenadas por capacidad: primero la mesa más chica en la que entra el grupo.
+    """
+    ahora = ahora or datetime.now()
+    inicio = inicio or ahora
+
+    query = session.query(Mesa).filter(
+        Mesa.baja == False,
+        ~_reserva_superpuesta(inicio, duracion, excluir_reserva),
+    )
+    if cant_personas:
+        query = query.filter(Mesa.cant_comensales >= cant_personas)
+    if id_sector:
+        query = query.filter(Mesa.id_sector == id_sector)
+    if inicio < ahora + duracion:
+        query = query.filter(~_ocupada_ahora())
+    return query.order_by(Mesa.cant_comensales, Mesa.numero)
+
+
+def mesas_disponibles(session, inicio=None, cant_personas=None, id_sector=None,
+                      duracion=DURACION_RESERVA, ahora=None):
+    """Mesas libres (con su sector cargado en la misma consulta)"""
+    return consulta_disponibles(
+        session, inicio, cant_personas, id_sector, duracion, ahora=ahora
+    ).options(joinedload(Mesa.sector)).all()
+
+
+def mesa_disponible(session, id_mesa, inicio, duracion=DURACION_RESERVA, excluir_reserva=None, ahora=None):
+    """True si la mesa está libre en la ventana (misma regla que el listado)"""
+    consulta = consulta_disponibles(
+        session, inicio, duracion=duracion, excluir_reserva=excluir_reserva, ahora=ahora
+    ).filter(Mesa.id_mesa == id_mesa)
+    return session.query(consulta.order_by(None).exists()).scalar()
@@ -0,0 +1,241 @@
+"""
+Feed de cambios de las comandas abiertas (GET /api/comandas/eventos).
+
+Las rutas de escritura registran eventos con `emitir(session, tipo, ...)`; se
+publican recién cuando la sesión hace commit (un rollback los descarta), así un
+cliente nunca ve un cambio que no llegó a la base.
+
+- Por defecto el difusor es en memoria del proceso: un buffer circular con ids
+  crecientes que los clientes leen por long-poll (?desde=<id>) o SSE
+  (Last-Event-ID). Si el cliente pide un id que ya salió del buffer recibe
+  `resync` y debe volver a pedir /api/comandas/abiertas.
+- Los ids tienen la forma '<época>-<n>': la época (pid + token aleatorio) es
+  propia de cada proceso y cambia al reiniciar. Con varios workers el balanceo
+  puede llevar al cliente a otro proceso, cuya numeración no es comparable: un
+  id de otra época recibe `resync` en lugar de eventos salteados o repetidos.
+- Con varios workers (gunicorn) cada proceso solo ve sus propias escrituras;
+  con EVENTOS_PG_NOTIFY=1 (PostgreSQL) los eventos se envían con pg_notify
+  dentro de la transacción y un hilo por proceso los escucha con LISTEN y los
+  publica en el difusor local.
+- `esperar` bloquea el hilo que llama (rutas Flask); `esperar_async` espera en
+  el event loop (modo ASGI, asgi.py) sin ocupar un hilo por cliente.
+
+Variables de entorno: EVENTOS_PG_NOTIFY (0/1), EVENTOS_MAX_BUFFER (1000).
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CANAL_NOTIFY = 'comandas_eventos'
+USAR_NOTIFY = os.getenv('EVENTOS_PG_NOTIFY', '0') == '1'
+MAX_BUFFER = int(os.getenv('EVENTOS_MAX_BUFFER', '1000'))
+
+TIPOS_EVENTO = (
+    'comanda_abierta', 'comanda_modificada', 'comanda_cerrada', 'comanda_cancelada',
+    'detalle_agregado', 'detalle_modificado', 'detalle_entregado', 'detalle_eliminado',
+)
+
+
+def _nueva_epoca():
+    # El pid distingue los workers; el token, dos procesos que reusan el mismo pid
+    return f'{os.getpid()}.{secrets.token_hex(4)}'
+
+
+class Difusor:
+    """Buffer circular de eventos con espera bloqueante o async (thread-safe)"""
+
+    def __init__(self, max_eventos=MAX_BUFFER):
+        self._eventos = deque(maxlen=max_eventos)
+        self._ultimo = 0
+        self._condicion = threading.Condition()
+        # (loop, asyncio.Event) de los clientes esperando en un event loop
+        self._avisos = set()
+        self.epoca = _nueva_epoca()
+
+    def _id(self, numero):
+        return f'{self.epoca}-{numero}'
+
+    @property
+    def ultimo_id(self):
+        with self._condicion:
+            return self._id(self._ultimo)
+
+    def numero(self, id_evento):
+        """
+        Número de secuencia de un id de este difusor, o None si es de otra época
+        (otro worker o un reinicio). ValueError si no tiene la forma '<época>-<n>'.
+        """
+        epoca, _, numero = str(id_evento).rpartition('-')
+        if not epoca or not numero.isdigit():
+            raise ValueError(f'Id de evento inválido: {id_evento}')
+        return int(numero) if epoca == self.epoca else None
+
+    def publicar(self, tipo, datos):
+        with self._condicion:
+            self._ultimo += 1
+            evento = {'id': self._id(self._ultimo), 'tipo': tipo, 'datos': datos, 'ts': time.time()}
+            self._eventos.append(evento)
+            self._condicion.notify_all()
+            for loop, aviso in self._avisos:
+                try:
+                    loop.call_soon_threadsafe(aviso.set)
+                except RuntimeError:
+                    # Loop ya cerrado: su espera terminó
+                    pass
+            return evento
+
+    def _posteriores(self, desde):
+        """(eventos posteriores al id `desde`, resync). resync=True si se perdieron eventos"""
+        numero = self.numero(desde)
+        if numero is None or numero > self._ultimo:
+            # Id de otro proceso o de antes de un reinicio: el cliente debe resincronizar
+            return [], True
+        if not self._eventos or numero >= self._ultimo:
+            return [], False
+        primero = self._ultimo - len(self._eventos) + 1
+        if numero < primero - 1:
+            return [], True
+        return list(self._eventos)[numero - primero + 1:], False
+
+    def esperar(self, desde, timeout):
+        """Bloquea hasta que haya eventos posteriores a `desde` o venza el timeout"""
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                eventos, resync = self._posteriores(desde)
+                restante = limite - time.monotonic()
+                if eventos or resync or restante <= 0:
+                    return eventos, resync
+                self._condicion.wait(restante)
+
+    async def esperar_async(self, desde, timeout):
+        """Como esperar(), pero cede el event loop mientras no haya eventos"""
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + timeout
+        aviso = asyncio.Event()
+        with self._condicion:
+            self._avisos.add((loop, aviso))
+        try:
+            while True:
+                with self._condicion:
+                    # publicar() hace set después de este clear si llega un evento nuevo
+                    aviso.clear()
+                    eventos, resync = self._posteriores(desde)
+                restante = limite - loop.time()
+                if eventos or resync or restante <= 0:
+                    return eventos, resync
+                try:
+                    await asyncio.wait_for(aviso.wait(), restante)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condicion:
+                self._avisos.discard((loop, aviso))
+
+    def limpiar(self):
+        with self._condicion:
+            self._eventos.clear()
+
+    def reiniciar_tras_fork(self):
+        """
+        Llamar en cada proceso hijo (gunicorn post_fork con preload_app): el
+        difusor se creó en el master y todos los workers heredarían su época.
+        """
+        self._condicion = threading.Condition()
+        self._avisos = set()
+        with self._condicion:
+            self._eventos.clear()
+            self._ultimo = 0
+            self.epoca = _nueva_epoca()
+
+
+difusor = Difusor()
+
+
+def emitir(session, tipo, **datos):
+    """Registra un evento en la sesión; se publica al hacer commit"""
+    if tipo not in TIPOS_EVENTO:
+        raise ValueError(f'Tipo de evento desconocido: {tipo}')
+    session.info.setdefault('eventos_pendientes', []).append((tipo, datos))
+
+
+@event.listens_for(Session, 'before_commit')
+def _notificar_pendientes(session):
+    if not USAR_NOTIFY or not session.info.get('eventos_pendientes'):
+        return
+    # pg_notify dentro de la transacción: PostgreSQL lo entrega solo si hay commit
+    for tipo, datos in session.info.pop('eventos_pendientes'):
+        session.execute(
+            text('SELECT pg_notify(:canal, :payload)'),
+            {'canal': CANAL_NOTIFY, 'payload': json.dumps({'tipo': tipo, 'datos': datos})}
+        )
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_pendientes(session):
+    for tipo, datos in session.info.pop('eventos_pendientes', []):
+        difusor.publicar(tipo, datos)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_pendientes(session, transaccion_previa):
+    # El rollback de un savepoint no descarta los eventos de la transacción externa
+    if not transaccion_previa.nested:
+        session.info.pop('eventos_pendientes', None)
+
+
+# ========== LISTEN/NOTIFY (OPCIONAL) ==========
+
+_escucha = {'hilo': None, 'pid': None}
+_escucha_lock = threading.Lock()
+
+
+def _escuchar_notify(engine):
+    """Hilo de fondo: LISTEN sobre una conexión propia y publicación en el difusor local"""
+    while True:
+        cruda = None
+        try:
+            # Conexión fuera del pool: queda tomada mientras viva el proceso
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            cruda = engine.dialect.connect(*cargs, **cparams)
+            cruda.autocommit = True
+            with cruda.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL_NOTIFY}')
+            while True:
+                if select.select([cruda], [], [], 5) == ([], [], []):
+                    continue
+                cruda.poll()
+                while cruda.notifies:
+                    aviso = cruda.notifies.pop(0)
+                    contenido = json.loads(aviso.payload)
+                    difusor.publicar(contenido['tipo'], contenido['datos'])
+        except Exception:
+            logger.exception('Se perdió la conexión LISTEN %s; reintentando', CANAL_NOTIFY)
+            time.sleep(1)
+        finally:
+            if cruda is not None:
+                cruda.close()
+
+
+def iniciar_escucha():
+    """Arranca (una vez por proceso, después del fork) el hilo LISTEN si EVENTOS_PG_NOTIFY=1"""
+    if not USAR_NOTIFY:
+        return
+    import db
+    with _escucha_lock:
+        if _escucha['pid'] == os.getpid() and _escucha['hilo'].is_alive():
+            return
+        hilo = threading.Thread(target=_escuchar_notify, args=(db.engine,), name='eventos-listen', daemon=True)
+        hilo.start()
+        _escucha.update(hilo=hilo, pid=os.getpid())
@@ -0,0 +1,57 @@
+"""
+Asignación atómica de códigos de factura (FACT-YYYYMMDD-NNNNN).
+
+El número sale de un único INSERT ... ON CONFLICT DO UPDATE ... RETURNING sobre
+la fila del día en `numeracion_factura`: la base bloquea esa fila hasta el fin
+de la transacción, así dos cierres simultáneos nunca reciben el mismo número.
+Como el incremento se hace en la misma transacción que la factura, un rollback
+también lo deshace y la numeración queda sin huecos.
+"""
+from datetime import datetime
+
+from models import Factura, NumeracionFactura
+from services.sql import insert_upsert
+
+PREFIJO_FACTURA = 'FACT'
+
+
+def siguiente_numero_factura(session, fecha):
+    """Reserva y devuelve el próximo número de factura del día de `fecha`"""
+    stmt = insert_upsert(session, NumeracionFactura).values(dia=fecha.date(), ultimo=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['dia'],
+        set_={'ultimo': NumeracionFactura.ultimo + 1},
+    ).returning(NumeracionFactura.ultimo)
+    return session.execute(stmt).scalar_one()
+
+
+def formatear_codigo_factura(fecha, numero):
+    return f"{PREFIJO_FACTURA}-{fecha.strftime('%Y%m%d')}-{numero:05d}"
+
+
+def siguiente_codigo_factura(session, fecha):
+    """Código de la próxima factura del día de `fecha` (debe usarse dentro de la transacción que la crea)"""
+    return formatear_codigo_factura(fecha, siguiente_numero_factura(session, fecha))
+
+
+def sincronizar_numeracion_factura(session):
+    """
+    Lleva el contador de cada día al mayor número usado por las facturas
+    existentes con código FACT-YYYYMMDD-NNNNN (cargadas por fuera de la API,
+    p. ej. el seed). No hace commit. Devuelve la cantidad de días actualizados.
+    """
+    ultimos = {}
+    for (codigo,) in session.query(Factura.codigo).filter(Factura.codigo.like(f'{PREFIJO_FACTURA}-%')):
+        partes = codigo.split('-')
+        if len(partes) != 3:
+            continue
+        try:
+            dia, numero = datetime.strptime(partes[1], '%Y%m%d').date(), int(partes[2])
+        except ValueError:
+            continue
+        ultimos[dia] = max(ultimos.get(dia, 0), numero)
+
+    for dia, ultimo in ultimos.items():
+        stmt = insert_upsert(session, NumeracionFactura).values(dia=dia, ultimo=ultimo)
+        session.execute(stmt.on_conflict_do_update(index_elements=['dia'], set_={'ultimo': ultimo}))
+    return len(ultimos)
@@ -0,0 +1,122 @@
+"""
+Mantenimiento incremental de los resúmenes diarios de ventas y cobros.
+
+Las rutas que generan facturas o registran pagos llaman a estas funciones antes
+del commit, así el resumen se actualiza en la misma transacción que el dato de
+origen. `reconstruir_resumenes` recalcula un rango de días desde cero (backfill
+o reparación) y se expone como comando de Flask: `flask reconstruir-resumenes`.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select, delete, insert
+
+from models import (
+    Factura, DetalleFactura, Comanda, DetalleComanda, Pago,
+    ResumenVentaDiaria, ResumenCobroDiario
+)
+from services.sql import insert_upsert
+
+
+def _acumular(session, modelo, claves, filas):
+    """Suma cantidad/total sobre las filas existentes (o las crea) con un único upsert"""
+    if not filas:
+        return
+    stmt = insert_upsert(session, modelo).values(filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=claves,
+        set_={
+            'cantidad': modelo.cantidad + stmt.excluded.cantidad,
+            'total': modelo.total + stmt.excluded.total,
+        }
+    )
+    session.execute(stmt)
+
+
+def registrar_venta(session, fecha, id_mozo, detalles):
+    """Acumula en el resumen de ventas los detalles de comanda facturados en `fecha`"""
+    por_producto = defaultdict(lambda: [0, Decimal('0')])
+    for detalle in detalles:
+        acumulado = por_producto[detalle.id_producto]
+        acumulado[0] += detalle.cantidad
+        acumulado[1] += Decimal(str(detalle.precio_unitario)) * detalle.cantidad
+
+    filas = [
+        {'dia': fecha.date(), 'id_producto': id_producto, 'id_mozo': id_mozo,
+         'cantidad': cantidad, 'total': total}
+        for id_producto, (cantidad, total) in por_producto.items()
+    ]
+    _acumular(session, ResumenVentaDiaria, ['dia', 'id_producto', 'id_mozo'], filas)
+
+
+def registrar_cobro(session, fecha, id_medio_pago, monto, cantidad=1):
+    """Acumula un pago en el resumen de cobros; con cantidad=-1 y monto negativo lo revierte"""
+    _acumular(session, ResumenCobroDiario, ['dia', 'id_medio_pago'], [{
+        'dia': fecha.date(),
+        'id_medio_pago': id_medio_pago,
+        'cantidad': cantidad,
+        'total': Decimal(str(monto)),
+    }])
+
+
+def reconstruir_resumenes(session, desde=None, hasta=None):
+    """
+    Recalcula los resúmenes de los días [desde, hasta] (ambos date, opcionales)
+    a partir de facturas y pagos. Devuelve la cantidad de filas generadas.
+    No hace commit.
+    """
+    def rango(columna):
+        condiciones = []
+        if desde:
+            condiciones.append(columna >= datetime(desde.year, desde.month, desde.day))
+        if hasta:
+            condiciones.append(columna < datetime(hasta.year, hasta.month, hasta.day) + timedelta(days=1))
+        return condiciones
+
+    def rango_resumen(modelo):
+        condiciones = []
+        if desde:
+            condiciones.append(modelo.dia >= desde)
+        if hasta:
+            condiciones.append(modelo.dia <= hasta)
+        return condiciones
+
+    session.execute(delete(ResumenVentaDiaria).where(*rango_resumen(ResumenVentaDiaria)))
+    session.execute(delete(ResumenCobroDiario).where(*rango_resumen(ResumenCobroDiario)))
+
+    dia_factura = func.date(Factura.fecha)
+    ventas = (
+        select(
+            dia_factura,
+            DetalleComanda.id_producto,
+            Comanda.id_mozo,
+            func.sum(DetalleFactura.cantidad),
+            func.sum(DetalleFactura.subtotal),
+        )
+        .select_from(DetalleFactura)
+        .join(Factura, DetalleFactura.id_factura == Factura.id_factura)
+        .join(DetalleComanda, DetalleFactura.id_detalle_comanda == DetalleComanda.id_detalle_comanda)
+        .join(Comanda, Factura.id_comanda == Comanda.id_comanda)
+        .where(*rango(Factura.fecha))
+        .group_by(dia_factura, DetalleComanda.id_producto, Comanda.id_mozo)
+    )
+    filas_ventas = session.execute(
+        insert(ResumenVentaDiaria).from_select(
+            ['dia', 'id_producto', 'id_mozo', 'cantidad', 'total'], ventas
+        )
+    ).rowcount
+
+    dia_pago = func.date(Pago.fecha)
+    cobros = (
+        select(dia_pago, Pago.id_medio_pago, func.count(Pago.id_pago), func.sum(Pago.monto))
+        .where(*rango(Pago.fecha))
+        .group_by(dia_pago, Pago.id_medio_pago)
+    )
+    filas_cobros = session.execute(
+        insert(ResumenCobroDiario).from_select(
+            ['dia', 'id_medio_pago', 'cantidad', 'total'], cobros
+        )
+    ).rowcount
+
+    return {'ventas': filas_ventas, 'cobros': filas_cobros}
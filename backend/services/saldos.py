@@ -0,0 +1,36 @@
+"""
+Mantenimiento de factura.total_pagado.
+
+Las rutas de pago aplican la variación con un UPDATE ... SET total_pagado =
+total_pagado + :delta en la misma transacción que el pago, así dos cobros
+simultáneos sobre la misma factura no se pisan. `recalcular_total_pagado`
+vuelve a sumar los pagos (reparación o después de cargas masivas).
+"""
+from sqlalchemy import func, select, update
+
+from models import Factura, Pago
+
+
+def acumular_pagado(session, id_factura, delta):
+    """Suma `delta` (negativo para revertir) al total pagado de la factura"""
+    if not delta:
+        return
+    session.execute(
+        update(Factura)
+        .where(Factura.id_factura == id_factura)
+        .values(total_pagado=Factura.total_pagado + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recalcular_total_pagado(session, id_factura=None):
+    """Recalcula total_pagado desde la tabla pago (todas las facturas o una). Devuelve filas actualizadas"""
+    pagado = (
+        select(func.coalesce(func.sum(Pago.monto), 0))
+        .where(Pago.id_factura == Factura.id_factura)
+        .scalar_subquery()
+    )
+    stmt = update(Factura).values(total_pagado=pagado).execution_options(synchronize_session=False)
+    if id_factura is not None:
+        stmt = stmt.where(Factura.id_factura == id_factura)
+    return session.execute(stmt).rowcount
@@ -0,0 +1,12 @@
+"""Utilidades SQL compartidas por los servicios"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def insert_upsert(session, modelo):
+    """INSERT con soporte de ON CONFLICT según el motor de la sesión"""
+    dialecto = session.get_bind().dialect.name
+    if dialecto == 'postgresql':
+        return postgresql.insert(modelo)
+    if dialecto == 'sqlite':
+        return sqlite.insert(modelo)
+    raise NotImplementedError(f'INSERT ... ON CONFLICT no soportado para {dialecto}')
@@ -0,0 +1,62 @@
+"""
+Mantenimiento de comanda.total.
+
+Después de agregar, modificar o eliminar detalles, las rutas llaman a
+`recalcular_total_comanda`, que reescribe el total con un único UPDATE sobre la
+suma de detalle_comanda (índice por id_comanda) en la misma transacción. Así el
+listado de comandas y la facturación leen una columna en lugar de cargar todos
+los detalles. `verificar_totales_comanda` detecta (y opcionalmente repara)
+diferencias; se expone como `flask verificar-totales-comanda`.
+"""
+from sqlalchemy import func, select, update
+
+from models import Comanda, DetalleComanda
+
+
+def _suma_detalles():
+    return (
+        select(func.coalesce(func.sum(DetalleComanda.precio_unitario * DetalleComanda.cantidad), 0))
+        .where(DetalleComanda.id_comanda == Comanda.id_comanda)
+        .scalar_subquery()
+    )
+
+
+def recalcular_total_comanda(session, id_comanda):
+    """
+    Reescribe comanda.total desde sus detalles (hace flush de los cambios pendientes).
+    El llamador debe haber bloqueado la comanda (with_for_update) antes de tocar
+    sus detalles: en READ COMMITTED la subconsulta SUM usa la foto de la sentencia
+    y dos escrituras simultáneas sin bloqueo dejan un total que omite la otra.
+    """
+    session.execute(
+        update(Comanda)
+        .where(Comanda.id_comanda == id_comanda)
+        .values(total=_suma_detalles())
+        .execution_options(synchronize_session='fetch')
+    )
+
+
+def verificar_totales_comanda(session, reparar=False):
+    """
+    Compara comanda.total con la suma de sus detalles.
+    Devuelve la lista de diferencias [{id_comanda, total, calculado}]; con reparar=True las corrige.
+    """
+    calculado = _suma_detalles().label('calculado')
+    filas = (
+        session.query(Comanda.id_comanda, Comanda.total, calculado)
+        .filter(Comanda.total != calculado)
+        .order_by(Comanda.id_comanda)
+        .all()
+    )
+    diferencias = [
+        {'id_comanda': f.id_comanda, 'total': float(f.total), 'calculado': float(f.calculado)}
+        for f in filas
+    ]
+    if reparar and diferencias:
+        session.execute(
+            update(Comanda)
+            .where(Comanda.id_comanda.in_([d['id_comanda'] for d in diferencias]))
+            .values(total=_suma_detalles())
+            .execution_options(synchronize_session=False)
+        )
+    return diferencias
@@ -0,0 +1,118 @@
+"""
+GET condicional (ETag / Last-Modified) para los endpoints de catálogo.
+
+Cada recurso (productos, secciones, sectores, mesas, medios_pago) tiene un
+contador en `version_recurso`. Los blueprints que lo modifican se registran con
+`versionar_en_escrituras(bp, 'recurso')`: en cada escritura el contador se
+incrementa en el mismo commit que el cambio (si hay rollback no cambia).
+
+Las rutas GET decoradas con `@condicional('recurso', ...)` leen solo esas
+filas; si el cliente manda If-None-Match con la versión vigente (o un
+If-Modified-Since posterior al último cambio) se responde 304 sin consultar el
+catálogo. El ETag es débil porque identifica la versión de los datos, no los
+bytes exactos de la respuesta.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import obtener_sesion
+from models import VersionRecurso
+from services.cache import METODOS_ESCRITURA, ENTORNO_VERSION
+from services.sql import insert_upsert
+
+RECURSOS_CATALOGO = ('productos', 'secciones', 'sectores', 'mesas', 'medios_pago')
+
+
+def _ahora_utc():
+    # Sin tzinfo como el resto de las columnas; en UTC porque es lo que usan los headers HTTP
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def incrementar_version(session, *recursos):
+    """Suma 1 a la versión de cada recurso (crea la fila si no existe)"""
+    ahora = _ahora_utc()
+    # Orden fijo para que dos transacciones no se bloqueen en orden inverso
+    for recurso in sorted(set(recursos)):
+        stmt = insert_upsert(session, VersionRecurso).values(recurso=recurso, version=1, actualizado=ahora)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['recurso'],
+            set_={'version': VersionRecurso.version + 1, 'actualizado': ahora}
+        )
+        session.execute(stmt)
+
+
+def versiones(session, recursos):
+    """{recurso: (version, actualizado)}; los recursos nunca modificados tienen versión 0"""
+    filas = session.query(VersionRecurso.recurso, VersionRecurso.version, VersionRecurso.actualizado) \
+        .filter(VersionRecurso.recurso.in_(recursos)).all()
+    actuales = {r: (0, None) for r in recursos}
+    actuales.update({f.recurso: (f.version, f.actualizado) for f in filas})
+    return actuales
+
+
+# nombre del blueprint -> recursos que modifican sus escrituras
+_recursos_por_blueprint = {}
+
+
+def versionar_en_escrituras(blueprint, *recursos):
+    """Registra los recursos que modifican las escrituras del blueprint (se versionan al hacer commit)"""
+    _recursos_por_blueprint[blueprint.name] = _recursos_por_blueprint.get(blueprint.name, ()) + recursos
+
+
+@event.listens_for(Session, 'before_commit')
+def _versionar_en_commit(session):
+    # Solo la sesión del request: los commits de CLI/seed versionan explícitamente
+    if not has_request_context() or g.get('db_session') is not session:
+        return
+    if request.method not in METODOS_ESCRITURA or not request.blueprint:
+        return
+    # request.blueprint es el nombre completo ('api.producto')
+    recursos = _recursos_por_blueprint.get(request.blueprint.rpartition('.')[2])
+    if recursos:
+        incrementar_version(session, *recursos)
+
+
+def _no_modificado(etag, modificado):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and modificado:
+        return modificado.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def condicional(*recursos):
+    """
+    Decorador para GET de catálogo (va entre @bp.route y @con_sesion_lectura).
+    Agrega ETag, Last-Modified y Cache-Control: no-cache a las respuestas 200 y
+    responde 304 si el cliente ya tiene la versión vigente.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # Misma sesión que usará la vista: versión y datos salen de la misma base
+            actuales = versiones(obtener_sesion(lectura=True), recursos)
+            etag = '-'.join(f'{r}.{actuales[r][0]}' for r in sorted(actuales))
+            fechas = [a for _, a in actuales.values() if a is not None]
+            modificado = max(fechas).replace(tzinfo=timezone.utc) if fechas else None
+            # Para que un @cacheado interno use la versión en la clave
+            request.environ[ENTORNO_VERSION] = etag
+
+            if _no_modificado(etag, modificado):
+                respuesta = Response(status=304)
+            else:
+                resultado = vista(*args, **kwargs)
+                respuesta, estado = resultado if isinstance(resultado, tuple) else (resultado, resultado.status_code)
+                if estado != 200:
+                    return respuesta, estado
+
+            respuesta.set_etag(etag, weak=True)
+            if modificado is not None:
+                respuesta.last_modified = modificado
+            respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
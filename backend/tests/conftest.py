@@ -1,6 +1,6 @@
 import pytest
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -33,32 +33,29 @@ def setup_test_db():
 
 @pytest.fixture(scope='function', autouse=True)
 def setup_test_db_for_routes(monkeypatch):
-    """Reemplaza SessionLocal en db.py para cada test"""
+    """Reemplaza el engine y SessionLocal de db.py para cada test"""
     import db as db_module
-    # Usar monkeypatch para reemplazar SessionLocal en todos los módulos que lo usan
+    # Las rutas obtienen la sesión con db.obtener_sesion(), que usa db.SessionLocal
     monkeypatch.setattr(db_module, 'engine', test_engine)
     monkeypatch.setattr(db_module, 'SessionLocal', TestSessionLocal)
-    
-    # También reemplazar en los módulos de rutas que ya lo importaron
-    import routes.cliente_routes as cr
-    import routes.comanda_routes as comr
-    import routes.mesa_routes as mr
-    import routes.mozo_routes as mor
-    import routes.producto_routes as pr
-    import routes.seccion_routes as sr
-    import routes.sector_routes as secr
-    import routes.medio_pagos_routes as mpr
-    import routes.reserva_routes as resr
-    
-    monkeypatch.setattr(cr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(comr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(mr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(mor, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(pr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(sr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(secr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(mpr, 'SessionLocal', TestSessionLocal)
-    monkeypatch.setattr(resr, 'SessionLocal', TestSessionLocal)
+    # Sin réplica de lectura: las rutas @con_sesion_lectura también usan la base de test
+    monkeypatch.setattr(db_module, 'SessionLectura', None)
+
+@pytest.fixture(scope='function', autouse=True)
+def limpiar_cache():
+    """Vacía las cachés (respuestas, catálogo y autocompletado) para que no se arrastren datos entre tests"""
+    from services.cache import cache
+    from services.catalogo import catalogo
+    from services.autocompletado import indice_clientes
+    cache.limpiar()
+    catalogo.invalidar()
+    indice_clientes.invalidar()
+    yield
+    cache.limpiar()
+    catalogo.invalidar()
+    # La reconstrucción en segundo plano usa la misma conexión de test
+    indice_clientes.esperar()
+    indice_clientes.invalidar()
 
 @pytest.fixture(scope='session')
 def test_app():
@@ -101,6 +98,18 @@ def test_db_session(test_app):
     connection.close()
     session.close()
 
+@pytest.fixture(scope='function')
+def contador_consultas():
+    """Cuenta las sentencias SQL ejecutadas contra la base de test"""
+    sentencias = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(test_engine, 'before_cursor_execute', registrar)
+    yield sentencias
+    event.remove(test_engine, 'before_cursor_execute', registrar)
+
 # Fixtures para datos de ejemplo
 @pytest.fixture
 def sample_cliente_data():
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from db_async import url_async
+from models import Cliente, Comanda, Mesa, Mozo, Reserva, Sector
+
+
+async def _pedir(app, path, headers=()):
+    """GET contra una app ASGI dentro del event loop en curso; devuelve (status, headers, body)"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(k.encode(), v.encode()) for k, v in headers],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    mensajes = []
+
+    pedido = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if pedido:
+            return pedido.pop()
+        # Como un servidor real: después del cuerpo, receive() espera la desconexión
+        await asyncio.Event().wait()
+
+    async def send(mensaje):
+        mensajes.append(mensaje)
+
+    await app(scope, receive, send)
+    inicio = next(m for m in mensajes if m['type'] == 'http.response.start')
+    cuerpo = b''.join(m.get('body', b'') for m in mensajes if m['type'] == 'http.response.body')
+    return inicio['status'], dict(inicio['headers']), cuerpo
+
+
+def _get(app, path, headers=()):
+    """Ejecuta un GET contra una app ASGI y devuelve (status, headers, body)"""
+    return asyncio.run(_pedir(app, path, headers))
+
+
+class TestUrlAsync:
+    """Tests de la derivación de URLs async"""
+
+    @pytest.mark.parametrize('url, esperada', [
+        ('postgresql://u:p@db:5432/restaurante', 'postgresql+asyncpg://u:p@db:5432/restaurante'),
+        ('postgresql+psycopg2://u:p@db/restaurante', 'postgresql+asyncpg://u:p@db/restaurante'),
+        ('sqlite:///local.db', 'sqlite+aiosqlite:///local.db'),
+    ])
+    def test_cambia_driver(self, url, esperada):
+        """Test: Se reemplaza el driver y se conserva el resto de la URL"""
+        assert url_async(url) == esperada
+
+    def test_url_invalida(self):
+        """Test: Una URL sin esquema se rechaza"""
+        with pytest.raises(ValueError):
+            url_async('restaurante')
+
+
+class TestAppAsgi:
+    """Tests del modo ASGI: rutas de polling async y delegación a Flask"""
+
+    @pytest.fixture
+    def asgi_app(self, tmp_path, monkeypatch):
+        pytest.importorskip('a2wsgi')
+        pytest.importorskip('aiosqlite')
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        import db as db_module
+        import db_async
+        import asgi
+
+        # Base en archivo compartida por el engine síncrono (Flask) y el async
+        url = f'sqlite:///{tmp_path / "asgi.db"}'
+        engine = create_engine(url, connect_args={'check_same_thread': False})
+        Base.metadata.create_all(bind=engine)
+        fabrica = sessionmaker(bind=engine)
+        monkeypatch.setattr(db_module, 'SessionLocal', fabrica)
+        engine_async = create_async_engine(url_async(url))
+        monkeypatch.setitem(db_async._fabricas, False, async_sessionmaker(engine_async, expire_on_commit=False))
+
+        with fabrica() as session:
+            sector = Sector(numero=1)
+            session.add(sector)
+            session.flush()
+            mozo = Mozo(documento='87654321', nombre_apellido='Carlos García', direccion='Calle Falsa 123',
+                        telefono='9876543210', id_sector=sector.id_sector)
+            mesa = Mesa(numero=1, tipo='Interior', cant_comensales=4, id_sector=sector.id_sector)
+            cliente = Cliente(documento='12345678', nombre='Juan', apellido='Pérez', num_telefono='1234567890',
+                              email='juan@example.com')
+            session.add_all([mozo, mesa, cliente])
+            session.flush()
+            session.add(Comanda(fecha='2024-01-15', id_mozo=mozo.id, id_mesa=mesa.id_mesa))
+            session.add(Reserva(numero=1, fecha_hora=datetime.utcnow(), cant_personas=2,
+                                id_cliente=cliente.id_cliente, id_mesa=mesa.id_mesa))
+            session.commit()
+
+        yield asgi.app
+        asyncio.run(engine_async.dispose())
+        engine.dispose()
+
+    @pytest.mark.parametrize('path', ['/api/comandas/abiertas', '/api/reservas/hoy'])
+    def test_misma_respuesta_que_flask(self, asgi_app, test_client, path):
+        """Test: Las rutas async devuelven exactamente el mismo JSON que las rutas Flask"""
+        estado, headers, cuerpo = _get(asgi_app, path, [('origin', 'http://localhost:3000')])
+        esperado = test_client.get(path)
+
+        assert estado == 200
+        assert headers[b'access-control-allow-origin'] == b'http://localhost:3000'
+        assert esperado.status_code == 200
+        assert json.loads(cuerpo) == esperado.get_json()
+        assert len(esperado.get_json()['data']) == 1
+
+    def test_otras_rutas_se_delegan_a_flask(self, asgi_app):
+        """Test: El resto de los blueprints se sirve sin cambios a través de a2wsgi"""
+        estado, headers, cuerpo = _get(asgi_app, '/api/sectores/')
+        assert estado == 200
+        assert b'"numero":1' in cuerpo.replace(b' ', b'')
+
+    def test_requests_delegados_en_paralelo(self, asgi_app, monkeypatch):
+        """Test: Dos requests delegados a Flask se atienden a la vez (no en un único hilo)"""
+        from app import app as flask_app
+        # Cada request espera al otro: si se atendieran de a uno, la barrera vencería
+        barrera = threading.Barrier(2, timeout=5)
+        vista = flask_app.view_functions['api.sector.listar_sectores']
+
+        def vista_con_barrera(*args, **kwargs):
+            barrera.wait()
+            return vista(*args, **kwargs)
+
+        monkeypatch.setitem(flask_app.view_functions, 'api.sector.listar_sectores', vista_con_barrera)
+
+        async def dos_pedidos():
+            return await asyncio.gather(_pedir(asgi_app, '/api/sectores/'), _pedir(asgi_app, '/api/sectores/'))
+
+        resultados = asyncio.run(dos_pedidos())
+        assert [estado for estado, _, _ in resultados] == [200, 200]
+        assert not barrera.broken
+
+
+class TestEventosAsgi:
+    """Tests del feed /api/comandas/eventos atendido en el event loop"""
+
+    @pytest.fixture
+    def asgi_app(self):
+        pytest.importorskip('a2wsgi')
+        import asgi
+        return asgi.app
+
+    def test_long_poll_espera_en_el_event_loop(self, asgi_app, monkeypatch):
+        """Test: El long-poll no usa el pool de hilos de Flask y se despierta al publicar"""
+        import asgi
+        from services.eventos import difusor
+
+        async def sin_flask(scope, receive, send):
+            raise AssertionError('/eventos no debe delegarse a Flask')
+
+        monkeypatch.setattr(asgi, 'wsgi', sin_flask)
+        inicio = difusor.ultimo_id
+        threading.Timer(0.05, difusor.publicar, args=('comanda_cerrada', {'id_comanda': 7})).start()
+
+        estado, _, cuerpo = _get(asgi_app, f'/api/comandas/eventos?desde={inicio}&espera=5')
+        data = json.loads(cuerpo)
+        assert estado == 200
+        assert [(e['tipo'], e['datos']) for e in data['data']] == [('comanda_cerrada', {'id_comanda': 7})]
+        assert data['ultimo_id'] == difusor.ultimo_id and not data['resync']
+
+    def test_id_de_otro_worker_pide_resync(self, asgi_app):
+        """Test: Un id con otra época responde resync enseguida"""
+        from services.eventos import difusor
+        estado, _, cuerpo = _get(asgi_app, '/api/comandas/eventos?desde=1.otro-5&espera=5')
+        assert estado == 200
+        assert json.loads(cuerpo)['resync'] is True
+        assert json.loads(cuerpo)['ultimo_id'] == difusor.ultimo_id
+
+    def test_sse(self, asgi_app, monkeypatch):
+        """Test: Con Accept text/event-stream se envían los eventos desde Last-Event-ID"""
+        import routes.comanda_routes as comanda_routes
+        from services.eventos import difusor
+        monkeypatch.setattr(comanda_routes, 'SSE_DURACION_MAXIMA', 0.2)
+        inicio = difusor.ultimo_id
+        evento = difusor.publicar('comanda_modificada', {'id_comanda': 3})
+
+        estado, headers, cuerpo = _get(asgi_app, '/api/comandas/eventos', [
+            ('accept', 'text/event-stream'), ('last-event-id', inicio), ('origin', 'http://localhost:3000')
+        ])
+        assert estado == 200
+        assert headers[b'content-type'].startswith(b'text/event-stream')
+        assert headers[b'access-control-allow-origin'] == b'http://localhost:3000'
+        assert f'id: {evento["id"]}\nevent: comanda_modificada\n'.encode() in cuerpo
+
+    def test_parametros_invalidos(self, asgi_app):
+        """Test: desde/espera inválidos devuelven 400 como en la ruta Flask"""
+        assert _get(asgi_app, '/api/comandas/eventos?desde=abc')[0] == 400
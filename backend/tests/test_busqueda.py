@@ -0,0 +1,160 @@
+import os
+import re
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session, sessionmaker
+
+from db import Base
+from models import Cliente, Producto, Seccion
+from services.busqueda import buscar_clientes, buscar_productos, palabras
+from tests.utils.test_helpers import assert_response_success, assert_response_error
+
+TEST_POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def datos_busqueda(test_db_session):
+    """Clientes y productos con nombres parecidos para probar prefijos y relevancia"""
+    seccion = Seccion(nombre='Cocina')
+    test_db_session.add(seccion)
+    test_db_session.flush()
+    test_db_session.add_all([
+        Cliente(documento='30111222', nombre='Juan', apellido='Pérez', num_telefono='1', email='a@x.com'),
+        Cliente(documento='30999888', nombre='Juana', apellido='Gómez', num_telefono='2', email='b@x.com'),
+        Cliente(documento='27555666', nombre='María José', apellido='Juarez', num_telefono='3', email='c@x.com'),
+        Cliente(documento='30111999', nombre='Juan', apellido='Baja', num_telefono='4', email='d@x.com', baja=True),
+        Producto(codigo='MIL-1', nombre='Milanesa napolitana', precio=1500, id_seccion=seccion.id_seccion),
+        Producto(codigo='PAP-1', nombre='Papas fritas', precio=600, id_seccion=seccion.id_seccion),
+        Producto(codigo='MIL-2', nombre='Sándwich de milanesa', precio=1200, id_seccion=seccion.id_seccion),
+        Producto(codigo='MIL-3', nombre='Milanesa vieja', precio=1000, id_seccion=seccion.id_seccion, baja=True),
+    ])
+    test_db_session.commit()
+    return test_db_session
+
+
+class TestBusquedaServicio:
+    """Tests de services/busqueda.py (implementación LIKE de SQLite)"""
+
+    def test_palabras_descarta_operadores(self):
+        """Test: El término se parte en palabras sin caracteres de tsquery ni comodines"""
+        assert palabras("  Pé%rez & o'neil_x ") == ['pé', 'rez', 'o', 'neil', 'x']
+        assert palabras('%&') == []
+
+    def test_prefijo_por_palabra(self, datos_busqueda):
+        """Test: Cada palabra escrita matchea el comienzo de alguna palabra del nombre o apellido"""
+        resultado = buscar_clientes(datos_busqueda, 'jua')
+        assert {c['documento'] for c in resultado} == {'30111222', '30999888', '27555666'}
+
+        resultado = buscar_clientes(datos_busqueda, 'jos mar')
+        assert [c['documento'] for c in resultado] == ['27555666']
+
+        # "uan" no es prefijo de ninguna palabra
+        assert buscar_clientes(datos_busqueda, 'uan') == []
+
+    def test_documento_por_prefijo_primero(self, datos_busqueda):
+        """Test: Un prefijo de documento devuelve solo clientes activos, con relevancia máxima"""
+        resultado = buscar_clientes(datos_busqueda, '30111')
+        assert [c['documento'] for c in resultado] == ['30111222']
+        assert resultado[0]['relevancia'] >= 1
+
+    def test_ranking_apellido_antes_que_nombre(self, datos_busqueda):
+        """Test: Coincidir con el apellido pesa más que con el nombre"""
+        resultado = buscar_clientes(datos_busqueda, 'jua')
+        assert resultado[0]['apellido'] == 'Juarez'
+
+    def test_productos_activos_y_limite(self, datos_busqueda):
+        """Test: Productos por nombre o código, sin dados de baja, respetando el límite"""
+        resultado = buscar_productos(datos_busqueda, 'mila')
+        assert [p['codigo'] for p in resultado] == ['MIL-1', 'MIL-2']
+        assert resultado[0]['relevancia'] > resultado[1]['relevancia']
+
+        assert len(buscar_productos(datos_busqueda, 'mil', limite=1)) == 1
+        assert [p['nombre'] for p in buscar_productos(datos_busqueda, 'pap-')] == ['Papas fritas']
+
+
+class _ConsultaCapturada(Query):
+    def all(self):
+        self.session.consultas.append(self.statement)
+        return []
+
+
+class _SesionPostgresql(Session):
+    """Arma las consultas del camino PostgreSQL sin conectarse a una base"""
+
+    def __init__(self):
+        super().__init__(query_cls=_ConsultaCapturada)
+        self.consultas = []
+
+    def get_bind(self, *args, **kwargs):
+        return SimpleNamespace(dialect=postgresql.dialect())
+
+    def execute(self, *args, **kwargs):
+        return None
+
+
+class TestBusquedaPostgresqlSql:
+    """SQL generado para PostgreSQL (sin base: se compila la consulta)"""
+
+    def test_similitud_con_la_columna_a_la_izquierda(self):
+        """Test: El filtro es texto %> término (word_similarity(término, texto)), como espera el índice"""
+        session = _SesionPostgresql()
+        buscar_clientes(session, 'jaun')
+        compilada = session.consultas[0].compile(dialect=postgresql.dialect())
+
+        similitud = re.search(r"\(\(cliente\.apellido \|\| ' '\) \|\| cliente\.nombre\) %%> %\((\w+)\)s", str(compilada))
+        assert similitud and compilada.params[similitud.group(1)] == 'jaun'
+        assert re.search(r'%\(\w+\)s %%> ', str(compilada)) is None
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason='Definir TEST_POSTGRES_URL para la búsqueda con pg_trgm')
+class TestBusquedaPostgresql:
+    """Búsqueda real contra PostgreSQL con pg_trgm"""
+
+    @pytest.fixture
+    def pg_session(self):
+        engine = create_engine(TEST_POSTGRES_URL)
+        with engine.begin() as conexion:
+            conexion.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+    def test_tolera_errores_de_tipeo_sin_matchear_nombres_largos(self, pg_session):
+        """Test: 'jaun' encuentra a Juan Pérez por similitud pero no a cualquier nombre largo"""
+        pg_session.add_all([
+            Cliente(documento='30111222', nombre='Juan', apellido='Pérez', num_telefono='1', email='a@x.com'),
+            Cliente(documento='27555666', nombre='Maximiliano Sebastián', apellido='Rodríguez Fernández',
+                    num_telefono='2', email='b@x.com'),
+        ])
+        pg_session.commit()
+
+        assert [c['documento'] for c in buscar_clientes(pg_session, 'jaun')] == ['30111222']
+
+
+class TestBuscarRoute:
+    """Tests del endpoint GET /api/buscar"""
+
+    def test_buscar_todos_los_tipos(self, test_client, datos_busqueda):
+        """Test: Sin tipo se busca en clientes y productos"""
+        data = assert_response_success(test_client.get('/api/buscar/?q=ju'))
+        assert set(data['data']) == {'clientes', 'productos'}
+        assert len(data['data']['clientes']) == 3
+        assert data['data']['productos'] == []
+
+    def test_buscar_un_tipo(self, test_client, datos_busqueda):
+        """Test: ?tipo limita la búsqueda y ?limite la cantidad de resultados"""
+        data = assert_response_success(test_client.get('/api/buscar/?q=mil&tipo=productos&limite=1'))
+        assert list(data['data']) == ['productos']
+        assert [p['codigo'] for p in data['data']['productos']] == ['MIL-1']
+
+    @pytest.mark.parametrize('query', ['', 'q=', 'q=%25%26', 'q=ju&tipo=mesas', 'q=ju&limite=0', 'q=ju&limite=51'])
+    def test_parametros_invalidos(self, test_client, query):
+        """Test: Término vacío, tipo desconocido o límite fuera de rango devuelven 400"""
+        assert_response_error(test_client.get(f'/api/buscar/?{query}'), 400)
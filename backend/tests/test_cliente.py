@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 from sqlalchemy.exc import IntegrityError
 from models import Cliente
@@ -384,3 +387,173 @@ class TestClienteRoutes:
         data = assert_response_success(response)
         assert data['pagination']['per_page'] == 10
 
+
+    def _crear_clientes(self, test_client, sample_cliente_data, cantidad):
+        for i in range(cantidad):
+            cliente_data = sample_cliente_data.copy()
+            cliente_data['documento'] = f'3000{i:04d}'
+            # Apellidos repetidos para forzar el desempate por clave primaria
+            cliente_data['apellido'] = f'Apellido{i // 3:02d}'
+            test_client.post('/api/clientes/', json=cliente_data)
+
+    def test_listar_clientes_cursor_recorre_todas_las_paginas(self, test_client, sample_cliente_data):
+        """Test: La paginación por cursor recorre todo sin repetir ni saltear registros"""
+        self._crear_clientes(test_client, sample_cliente_data, 23)
+
+        vistos = []
+        cursor = ''
+        paginas = 0
+        while True:
+            response = test_client.get(f'/api/clientes/?per_page=5&cursor={cursor}')
+            data = assert_response_success(response)
+            pagination = data['pagination']
+            assert pagination['modo'] == 'cursor'
+            assert pagination['total'] is None
+            vistos.extend(c['id_cliente'] for c in data['data'])
+            paginas += 1
+            if not pagination['has_next']:
+                assert pagination['next_cursor'] is None
+                break
+            cursor = pagination['next_cursor']
+
+        assert paginas == 5
+        assert len(vistos) == 23
+        assert len(set(vistos)) == 23
+
+        # El orden coincide con el del modo offset
+        response = test_client.get('/api/clientes/?per_page=100')
+        data = assert_response_success(response)
+        assert [c['id_cliente'] for c in data['data']] == vistos
+
+    def test_listar_clientes_cursor_pagina_anterior(self, test_client, sample_cliente_data):
+        """Test: prev_cursor vuelve a la página anterior"""
+        self._crear_clientes(test_client, sample_cliente_data, 12)
+
+        primera = assert_response_success(test_client.get('/api/clientes/?per_page=5&cursor='))
+        assert primera['pagination']['has_prev'] == False
+        segunda = assert_response_success(
+            test_client.get(f"/api/clientes/?per_page=5&cursor={primera['pagination']['next_cursor']}")
+        )
+        assert segunda['pagination']['has_prev'] == True
+        anterior = assert_response_success(
+            test_client.get(f"/api/clientes/?per_page=5&cursor={segunda['pagination']['prev_cursor']}")
+        )
+        assert [c['id_cliente'] for c in anterior['data']] == [c['id_cliente'] for c in primera['data']]
+
+    def test_listar_clientes_cursor_con_conteo(self, test_client, sample_cliente_data):
+        """Test: El total es opcional en modo cursor (estimado cae a exacto fuera de PostgreSQL)"""
+        self._crear_clientes(test_client, sample_cliente_data, 7)
+
+        response = test_client.get('/api/clientes/?per_page=5&cursor=&conteo=estimado')
+        data = assert_response_success(response)
+        assert data['pagination']['total'] == 7
+
+        response = test_client.get('/api/clientes/?per_page=5&conteo=ninguno')
+        data = assert_response_success(response)
+        assert data['pagination']['total'] is None
+        assert data['pagination']['has_next'] == True
+
+    def test_listar_clientes_cursor_invalido(self, test_client, sample_cliente_data):
+        """Test: Un cursor corrupto o de otro ordenamiento devuelve 400"""
+        self._crear_clientes(test_client, sample_cliente_data, 7)
+
+        response = test_client.get('/api/clientes/?cursor=no-es-un-cursor')
+        assert_response_error(response, 400)
+
+        data = assert_response_success(test_client.get('/api/clientes/?per_page=5&cursor='))
+        cursor = data['pagination']['next_cursor']
+        response = test_client.get(f'/api/clientes/?ordenar_por=documento&cursor={cursor}')
+        assert_response_error(response, 400)
+
+        response = test_client.get('/api/clientes/?conteo=aproximado')
+        assert_response_error(response, 400)
+
+
+class TestClienteAutocomplete:
+    """Tests del autocompletado de clientes (/clientes/autocomplete)"""
+
+    CLIENTES = [
+        ('30111222', 'Juan', 'Pérez'),
+        ('30999888', 'Ana', 'Peralta'),
+        ('27555666', 'Luis', 'Gómez'),
+    ]
+
+    def _crear(self, test_client, sample_cliente_data, documento, nombre, apellido):
+        cliente_data = dict(sample_cliente_data, documento=documento, nombre=nombre, apellido=apellido)
+        return test_client.post('/api/clientes/', json=cliente_data).get_json()['data']['id_cliente']
+
+    def test_prefijo_documento_y_apellido(self, test_client, sample_cliente_data):
+        """Test: Matchea por prefijo de documento o de apellido (sin acentos) y devuelve solo id/documento/nombre"""
+        for cliente in self.CLIENTES:
+            self._crear(test_client, sample_cliente_data, *cliente)
+
+        data = assert_response_success(test_client.get('/api/clientes/autocomplete?q=301'))
+        assert data['data'] == [{'documento': '30111222', 'id_cliente': data['data'][0]['id_cliente'],
+                                 'nombre': 'Pérez, Juan'}]
+
+        data = assert_response_success(test_client.get('/api/clientes/autocomplete?q=PE'))
+        assert [c['documento'] for c in data['data']] == ['30999888', '30111222']
+
+        data = assert_response_success(test_client.get('/api/clientes/autocomplete?q=perez j'))
+        assert [c['documento'] for c in data['data']] == ['30111222']
+
+        data = assert_response_success(test_client.get('/api/clientes/autocomplete?q=3&limite=1'))
+        assert [c['documento'] for c in data['data']] == ['30111222']
+
+    def test_indice_se_refresca_con_escrituras(self, test_client, sample_cliente_data):
+        """Test: El índice se reconstruye solo después de una escritura en clientes"""
+        from services.autocompletado import indice_clientes
+        id_cliente = self._crear(test_client, sample_cliente_data, '30111222', 'Juan', 'Pérez')
+        recargas = indice_clientes.recargas
+
+        assert len(test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']) == 1
+        assert len(test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']) == 1
+        assert indice_clientes.recargas == recargas + 1
+
+        # La escritura dispara la reconstrucción en segundo plano; hasta que termina se sirve el snapshot anterior
+        self._crear(test_client, sample_cliente_data, '30999888', 'Ana', 'Peralta')
+        test_client.get('/api/clientes/autocomplete?q=pe')
+        indice_clientes.esperar()
+        assert len(test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']) == 2
+
+        test_client.delete(f'/api/clientes/{id_cliente}')
+        test_client.get('/api/clientes/autocomplete?q=pe')
+        indice_clientes.esperar()
+        data = test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']
+        assert [c['documento'] for c in data] == ['30999888']
+        assert indice_clientes.recargas == recargas + 3
+
+    def test_reconstruccion_no_bloquea(self, test_client, sample_cliente_data, monkeypatch):
+        """Test: Mientras se reconstruye el índice se responde con el snapshot anterior, sin esperar"""
+        from services.autocompletado import indice_clientes
+        self._crear(test_client, sample_cliente_data, '30111222', 'Juan', 'Pérez')
+        assert len(test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']) == 1
+
+        construir = indice_clientes._construir
+        liberar = threading.Event()
+
+        def construir_lento(session):
+            assert liberar.wait(5)
+            return construir(session)
+
+        monkeypatch.setattr(indice_clientes, '_construir', construir_lento)
+        self._crear(test_client, sample_cliente_data, '30999888', 'Ana', 'Peralta')
+
+        inicio = time.monotonic()
+        for _ in range(3):
+            data = test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']
+            assert [c['documento'] for c in data] == ['30111222']
+        assert time.monotonic() - inicio < 2
+        hilo = indice_clientes._hilo
+
+        liberar.set()
+        indice_clientes.esperar()
+        # Una sola reconstrucción para los tres requests
+        assert indice_clientes._hilo is hilo
+        data = test_client.get('/api/clientes/autocomplete?q=pe').get_json()['data']
+        assert [c['documento'] for c in data] == ['30999888', '30111222']
+
+    @pytest.mark.parametrize('query', ['', 'q=%20', 'q=pe&limite=0', 'q=pe&limite=21'])
+    def test_parametros_invalidos(self, test_client, query):
+        """Test: Prefijo vacío o límite fuera de rango devuelven 400"""
+        assert_response_error(test_client.get(f'/api/clientes/autocomplete?{query}'), 400)
@@ -1,5 +1,9 @@
 import pytest
-from models import Comanda, Mesa, Mozo, Sector
+from datetime import datetime
+from models import Comanda, Mesa, Mozo, Sector, Reserva, DetalleComanda, Producto
+from services.totales import recalcular_total_comanda, verificar_totales_comanda
+from services.eventos import Difusor, difusor
+from services.catalogo import catalogo
 from tests.utils.test_helpers import assert_response_success, assert_response_error, assert_pagination_structure
 
 class TestComandaModel:
@@ -16,7 +20,7 @@ class TestComandaModel:
         test_db_session.commit()
         
         assert comanda.id_comanda is not None
-        assert comanda.fecha == sample_comanda_data['fecha']
+        assert comanda.fecha == datetime(2024, 1, 15)
         assert comanda.id_mozo == created_mozo.id
         assert comanda.id_mesa == created_mesa.id_mesa
         assert comanda.baja == False
@@ -33,7 +37,7 @@ class TestComandaModel:
         
         json_data = comanda.json()
         assert json_data['id_comanda'] == comanda.id_comanda
-        assert json_data['fecha'] == comanda.fecha
+        assert json_data['fecha'] == '2024-01-15 00:00:00'
         assert json_data['id_mozo'] == comanda.id_mozo
         assert json_data['id_mesa'] == comanda.id_mesa
         assert json_data['baja'] == False
@@ -74,7 +78,7 @@ class TestComandaRoutes:
         response = test_client.post('/api/comandas/', json=comanda_data)
         assert response.status_code == 201
         data = assert_response_success(response, 201)
-        assert data['data']['fecha'] == sample_comanda_data['fecha']
+        assert data['data']['fecha'] == '2024-01-15 00:00:00'
         assert data['data']['id_mozo'] == created_mozo.id
         assert data['data']['id_mesa'] == created_mesa.id_mesa
     
@@ -106,7 +110,30 @@ class TestComandaRoutes:
             'id_mozo': created_mozo.id
         })
         assert response.status_code == 400
-    
+
+    def test_crear_comanda_fecha_invalida(self, test_client, created_mozo, created_mesa):
+        """Test: Intentar crear comanda con una fecha que no se puede interpretar"""
+        response = test_client.post('/api/comandas/', json={
+            'fecha': '15/01/2024',
+            'id_mozo': created_mozo.id,
+            'id_mesa': created_mesa.id_mesa
+        })
+        assert response.status_code == 400
+        assert_response_error(response, 400)
+
+    def test_listar_comandas_filtro_dia(self, test_client, test_db_session, created_mozo, created_sector):
+        """Test: ?fecha=YYYY-MM-DD incluye todas las comandas del día, sin importar la hora"""
+        for i, fecha in enumerate(['2024-01-15 00:00:00', '2024-01-15 23:59:59', '2024-01-16 00:00:00']):
+            mesa = Mesa(numero=300 + i, tipo='Interior', cant_comensales=4, id_sector=created_sector.id_sector)
+            test_db_session.add(mesa)
+            test_db_session.flush()
+            test_db_session.add(Comanda(fecha=fecha, id_mozo=created_mozo.id, id_mesa=mesa.id_mesa))
+        test_db_session.commit()
+
+        response = test_client.get('/api/comandas/?fecha=2024-01-15')
+        data = assert_response_success(response)
+        assert sorted(c['fecha'] for c in data['data']) == ['2024-01-15 00:00:00', '2024-01-15 23:59:59']
+
     def test_crear_comanda_mozo_inexistente(self, test_client, created_mesa, sample_comanda_data):
         """Test: Intentar crear comanda con mozo inexistente"""
         comanda_data = sample_comanda_data.copy()
@@ -195,7 +222,7 @@ class TestComandaRoutes:
         )
         assert response.status_code == 200
         data = assert_response_success(response)
-        assert data['data']['fecha'] == '2024-01-20'
+        assert data['data']['fecha'] == '2024-01-20 00:00:00'
     
     def test_modificar_comanda_mozo(self, test_client, test_db_session, created_comanda, created_sector):
         """Test: Modificar el mozo de una comanda"""
@@ -334,3 +361,575 @@ class TestComandaRoutes:
         assert len(data['data']) == 10
         assert data['pagination']['has_next'] == True
 
+
+class TestComandaPlanCarga:
+    """Tests del plan de carga (eager loading) de las rutas de Comanda"""
+
+    def _crear_comandas(self, session, cantidad, created_mozo, created_sector, created_producto, created_cliente):
+        for i in range(cantidad):
+            mesa = Mesa(numero=100 + i, tipo='Interior', cant_comensales=4, id_sector=created_sector.id_sector)
+            session.add(mesa)
+            session.flush()
+            reserva = Reserva(
+                numero=1000 + i,
+                fecha_hora=datetime(2024, 1, 15, 21, 0),
+                cant_personas=2,
+                id_cliente=created_cliente.id_cliente,
+                id_mesa=mesa.id_mesa
+            )
+            session.add(reserva)
+            session.flush()
+            comanda = Comanda(fecha='2024-01-15', id_mozo=created_mozo.id, id_mesa=mesa.id_mesa, id_reserva=reserva.id_reserva)
+            session.add(comanda)
+            session.flush()
+            for _ in range(3):
+                session.add(DetalleComanda(
+                    id_comanda=comanda.id_comanda,
+                    id_producto=created_producto.id_producto,
+                    cantidad=1,
+                    precio_unitario=created_producto.precio
+                ))
+        session.commit()
+
+    @pytest.mark.parametrize('cantidad', [5, 100])
+    def test_listar_comandas_cantidad_consultas_constante(self, cantidad, test_client, test_db_session, contador_consultas,
+                                                          created_mozo, created_sector, created_producto, created_cliente):
+        """Test: La cantidad de consultas no crece con la cantidad de comandas de la página"""
+        self._crear_comandas(test_db_session, cantidad, created_mozo, created_sector, created_producto, created_cliente)
+        ids = (created_mozo.id, created_sector.id_sector, created_cliente.id_cliente, created_producto.id_producto)
+        contador_consultas.clear()
+        response = test_client.get('/api/comandas/?per_page=100')
+        data = assert_response_success(response)
+        assert len(data['data']) == cantidad
+        # count + página + selectin de reservas + selectin de detalles
+        assert len(contador_consultas) <= 4
+
+        id_mozo, id_sector, id_cliente, id_producto = ids
+        comanda = data['data'][0]
+        assert comanda['mozo']['id'] == id_mozo
+        assert comanda['mesa']['sector']['id_sector'] == id_sector
+        assert comanda['reserva']['cliente']['id_cliente'] == id_cliente
+        assert comanda['reserva']['mesa']['sector'] is not None
+        assert len(comanda['detalles']) == 3
+        assert comanda['detalles'][0]['producto']['id_producto'] == id_producto
+
+    def test_listar_comandas_abiertas_sin_n_mas_1(self, test_client, test_db_session, contador_consultas,
+                                                  created_mozo, created_sector, created_producto, created_cliente):
+        """Test: /abiertas usa una cantidad acotada de consultas"""
+        self._crear_comandas(test_db_session, 30, created_mozo, created_sector, created_producto, created_cliente)
+        contador_consultas.clear()
+        response = test_client.get('/api/comandas/abiertas')
+        data = assert_response_success(response)
+        assert len(data['data']) == 30
+        assert len(contador_consultas) <= 3
+
+    def test_obtener_comanda_sin_n_mas_1(self, test_client, test_db_session, contador_consultas,
+                                         created_mozo, created_sector, created_producto, created_cliente):
+        """Test: /<id> resuelve la comanda y sus relaciones en una cantidad acotada de consultas"""
+        self._crear_comandas(test_db_session, 1, created_mozo, created_sector, created_producto, created_cliente)
+        id_comanda = test_db_session.query(Comanda).first().id_comanda
+        contador_consultas.clear()
+        response = test_client.get(f'/api/comandas/{id_comanda}')
+        data = assert_response_success(response)
+        assert len(data['data']['detalles']) == 3
+        assert len(contador_consultas) <= 3
+
+
+class TestComandaCreacionConProductos:
+    """Tests de la creación de comandas con muchos ítems"""
+
+    @pytest.mark.parametrize('cantidad_items', [2, 40])
+    def test_crear_comanda_consultas_constantes(self, cantidad_items, test_client, test_db_session, contador_consultas,
+                                                created_mozo, created_mesa, created_seccion):
+        """Test: Los productos salen de la caché del catálogo (una carga) y los detalles se insertan en lote"""
+        productos = [Producto(codigo=f'P{i}', nombre=f'Producto {i}', precio=100 + i, id_seccion=created_seccion.id_seccion)
+                     for i in range(cantidad_items)]
+        test_db_session.add_all(productos)
+        test_db_session.commit()
+        items = [{'id_producto': p.id_producto, 'cantidad': 2} for p in productos]
+        payload = {'fecha': '2024-01-15', 'id_mozo': created_mozo.id, 'id_mesa': created_mesa.id_mesa, 'productos': items}
+
+        recargas = catalogo.recargas
+        contador_consultas.clear()
+        response = test_client.post('/api/comandas/', json=payload)
+        data = assert_response_success(response, 201)
+        assert len(data['data']['detalles']) == cantidad_items
+        assert 'errores_productos' not in data
+
+        consultas_producto = [s for s in contador_consultas if 'producto.id_producto IN' in s]
+        inserts_detalle = [s for s in contador_consultas if s.startswith('INSERT INTO detalle_comanda')]
+        assert consultas_producto == []
+        assert len(inserts_detalle) == 1
+        assert catalogo.recargas == recargas + 1
+
+        # Con la caché caliente, cargar más ítems no vuelve a leer el catálogo
+        operaciones = [dict(item, op='agregar') for item in items]
+        response = test_client.post(f"/api/comandas/{data['data']['id_comanda']}/productos/lote",
+                                    json={'operaciones': operaciones})
+        assert_response_success(response)
+        assert catalogo.recargas == recargas + 1
+
+    def test_crear_comanda_reporta_items_rechazados(self, test_client, test_db_session, created_mozo, created_mesa,
+                                                    created_producto):
+        """Test: Los ítems inválidos se informan por posición y los válidos se cargan igual"""
+        test_db_session.add(Producto(codigo='BAJA', nombre='Discontinuado', precio=10,
+                                     id_seccion=created_producto.id_seccion, baja=True))
+        test_db_session.commit()
+        id_baja = test_db_session.query(Producto).filter_by(codigo='BAJA').one().id_producto
+        payload = {
+            'fecha': '2024-01-15', 'id_mozo': created_mozo.id, 'id_mesa': created_mesa.id_mesa,
+            'productos': [
+                {'id_producto': created_producto.id_producto, 'cantidad': 1},
+                {'id_producto': 'abc'},
+                {'id_producto': created_producto.id_producto, 'cantidad': 0},
+                {'id_producto': 99999},
+                {'id_producto': id_baja, 'cantidad': 1},
+            ]
+        }
+
+        response = test_client.post('/api/comandas/', json=payload)
+        data = assert_response_success(response, 201)
+        assert len(data['data']['detalles']) == 1
+        assert [e['indice'] for e in data['errores_productos']] == [1, 2, 3, 4]
+
+    def test_crear_comanda_productos_no_lista(self, test_client, created_mozo, created_mesa):
+        """Test: 'productos' debe ser una lista"""
+        response = test_client.post('/api/comandas/', json={
+            'fecha': '2024-01-15', 'id_mozo': created_mozo.id, 'id_mesa': created_mesa.id_mesa,
+            'productos': {'id_producto': 1}
+        })
+        assert_response_error(response, 400)
+
+
+class TestComandaOperacionesLote:
+    """Tests de las operaciones en lote sobre los productos de una comanda"""
+
+    def _preparar(self, session, comanda, producto, cantidad_detalles=3):
+        detalles = [DetalleComanda(id_comanda=comanda.id_comanda, id_producto=producto.id_producto,
+                                   cantidad=1, precio_unitario=producto.precio) for _ in range(cantidad_detalles)]
+        session.add_all(detalles)
+        recalcular_total_comanda(session, comanda.id_comanda)
+        session.commit()
+        return [d.id_detalle_comanda for d in detalles]
+
+    def test_lote_aplica_todas_las_operaciones(self, test_client, test_db_session, contador_consultas,
+                                               created_comanda, created_producto):
+        """Test: Agregar, modificar, entregar y eliminar en una sola llamada"""
+        ids = self._preparar(test_db_session, created_comanda, created_producto)
+        id_producto = created_producto.id_producto
+        contador_consultas.clear()
+
+        response = test_client.post(f'/api/comandas/{created_comanda.id_comanda}/productos/lote', json={'operaciones': [
+            {'op': 'agregar', 'id_producto': id_producto, 'cantidad': 2},
+            {'op': 'agregar', 'id_producto': id_producto},
+            {'op': 'modificar', 'id_detalle': ids[0], 'cantidad': 5},
+            {'op': 'entregar', 'id_detalle': ids[1]},
+            {'op': 'eliminar', 'id_detalle': ids[2]},
+        ]})
+        data = assert_response_success(response)
+        assert all(r['ok'] for r in data['resultados'])
+
+        # Quedan los dos detalles originales no eliminados más los dos agregados
+        detalles = {d['id_detalle_comanda']: d for d in data['data']['detalles']}
+        assert len(detalles) == 4
+        assert detalles[ids[0]]['cantidad'] == 5
+        assert detalles[ids[1]]['entregado'] is True
+        nuevos = [d for i, d in detalles.items() if i not in ids[:2]]
+        assert sorted(d['cantidad'] for d in nuevos) == [1, 2]
+        # Una sentencia por tipo de operación, sin importar cuántos ítems trae el lote
+        escrituras = [s.split()[0] for s in contador_consultas if s.split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        assert sorted(escrituras) == ['DELETE', 'INSERT', 'UPDATE', 'UPDATE', 'UPDATE']
+        # 5 + 1 (entregado) + 2 + 1 unidades a 1500
+        assert data['data']['total'] == 13500.0
+
+    def test_lote_invalido_no_aplica_nada(self, test_client, test_db_session, created_comanda, created_producto):
+        """Test: Si una operación es inválida se informa por posición y no se aplica ningún cambio"""
+        ids = self._preparar(test_db_session, created_comanda, created_producto)
+        id_comanda = created_comanda.id_comanda
+        # Un lote válido previo deja persistidos los datos de los fixtures
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos/lote',
+                                    json={'operaciones': [{'op': 'modificar', 'id_detalle': ids[0], 'cantidad': 2}]})
+        assert_response_success(response)
+
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos/lote', json={'operaciones': [
+            {'op': 'entregar', 'id_detalle': ids[0]},
+            {'op': 'eliminar', 'id_detalle': ids[1]},
+            {'op': 'modificar', 'id_detalle': ids[1], 'cantidad': 3},
+            {'op': 'agregar', 'id_producto': 99999},
+            {'op': 'duplicar', 'id_detalle': ids[2]},
+        ]})
+        data = assert_response_error(response, 400)
+        assert [r['ok'] for r in data['resultados']] == [True, True, False, False, False]
+
+        response = test_client.get(f'/api/comandas/{id_comanda}')
+        detalles = assert_response_success(response)['data']['detalles']
+        assert len(detalles) == 3
+        assert not any(d['entregado'] for d in detalles)
+
+    def test_ids_no_enteros_devuelven_400(self, test_client, test_db_session, created_comanda, created_producto):
+        """Test: Ids con tipos inválidos (listas, objetos, strings) se rechazan por posición, sin error 500"""
+        ids = self._preparar(test_db_session, created_comanda, created_producto)
+        response = test_client.post(f'/api/comandas/{created_comanda.id_comanda}/productos/lote', json={'operaciones': [
+            {'op': 'entregar', 'id_detalle': [ids[0]]},
+            {'op': 'eliminar', 'id_detalle': {'id': ids[1]}},
+            {'op': 'modificar', 'id_detalle': str(ids[2]), 'cantidad': 2},
+            {'op': 'agregar', 'id_producto': [created_producto.id_producto]},
+            {'op': 'entregar', 'id_detalle': ids[0]},
+        ]})
+        data = assert_response_error(response, 400)
+        assert [r['ok'] for r in data['resultados']] == [False, False, False, False, True]
+        assert 'entero positivo' in data['resultados'][0]['error']
+
+    def test_eventos_de_agregados_con_id(self, test_client, test_db_session, created_comanda, created_producto):
+        """Test: Los detalle_agregado del lote traen el id real de cada detalle insertado"""
+        self._preparar(test_db_session, created_comanda, created_producto, cantidad_detalles=0)
+        id_producto = created_producto.id_producto
+        inicio = difusor.ultimo_id
+
+        response = test_client.post(f'/api/comandas/{created_comanda.id_comanda}/productos/lote', json={'operaciones': [
+            {'op': 'agregar', 'id_producto': id_producto, 'cantidad': 2},
+            {'op': 'agregar', 'id_producto': id_producto, 'cantidad': 3},
+        ]})
+        detalles = assert_response_success(response)['data']['detalles']
+        por_cantidad = {d['cantidad']: d['id_detalle_comanda'] for d in detalles}
+
+        eventos, _ = difusor.esperar(inicio, 0)
+        assert [(e['datos']['id_detalle'], e['datos']['cantidad']) for e in eventos] == [
+            (por_cantidad[2], 2), (por_cantidad[3], 3)
+        ]
+
+    def test_entregar_todos_los_pendientes(self, test_client, test_db_session, created_comanda, created_producto):
+        """Test: Sin ids_detalle se marcan como entregados todos los pendientes"""
+        self._preparar(test_db_session, created_comanda, created_producto)
+
+        response = test_client.post(f'/api/comandas/{created_comanda.id_comanda}/productos/entregar')
+        data = assert_response_success(response)
+        assert len(data['resultados']) == 3
+        assert all(d['entregado'] for d in data['data']['detalles'])
+
+    def test_lote_comanda_cerrada(self, test_client, test_db_session, created_comanda, created_producto):
+        """Test: No se aceptan operaciones sobre comandas que no están abiertas"""
+        ids = self._preparar(test_db_session, created_comanda, created_producto)
+        created_comanda.estado = 'Cerrada'
+        test_db_session.commit()
+
+        response = test_client.post(f'/api/comandas/{created_comanda.id_comanda}/productos/lote',
+                                    json={'operaciones': [{'op': 'entregar', 'id_detalle': ids[0]}]})
+        assert_response_error(response, 400)
+
+
+class TestComandaPaginacionNulos:
+    """Tests de la paginación por cursor sobre una columna de orden que admite NULL"""
+
+    def _paginas(self, test_app, query, orden, hacia_atras=False):
+        from utils.paginacion import paginar
+        ids, cursor = [], ''
+        while cursor is not None:
+            with test_app.test_request_context(f'/?per_page=2&cursor={cursor}'):
+                items, pagination = paginar(query, Comanda, orden)
+            ids.append([c.id_comanda for c in items])
+            cursor = pagination['next_cursor']
+        if not hacia_atras:
+            return ids
+        # Desde la última página hacia la primera con prev_cursor
+        atras, cursor = [ids[-1]], pagination['prev_cursor']
+        while cursor is not None:
+            with test_app.test_request_context(f'/?per_page=2&cursor={cursor}'):
+                items, pagination = paginar(query, Comanda, orden)
+            atras.insert(0, [c.id_comanda for c in items])
+            cursor = pagination['prev_cursor']
+        return atras
+
+    @pytest.mark.parametrize('desc', [True, False])
+    def test_cursor_con_fecha_cierre_nula(self, test_app, test_db_session, created_mozo, created_mesa, desc):
+        """Test: Las comandas sin fecha_cierre van al final y ninguna se pierde ni repite entre páginas"""
+        cierres = [datetime(2024, 1, 3), None, datetime(2024, 1, 1), None, datetime(2024, 1, 2), None, None]
+        comandas = [Comanda(fecha=datetime(2024, 1, 1), id_mozo=created_mozo.id, id_mesa=created_mesa.id_mesa,
+                            fecha_cierre=cierre) for cierre in cierres]
+        test_db_session.add_all(comandas)
+        test_db_session.commit()
+        por_fecha = sorted((c for c in comandas if c.fecha_cierre), key=lambda c: c.fecha_cierre, reverse=desc)
+        nulas = sorted((c for c in comandas if c.fecha_cierre is None), key=lambda c: c.id_comanda, reverse=desc)
+        esperado = [c.id_comanda for c in por_fecha + nulas]
+
+        query = test_db_session.query(Comanda)
+        paginas = self._paginas(test_app, query, [(Comanda.fecha_cierre, desc)])
+        assert [i for pagina in paginas for i in pagina] == esperado
+        assert self._paginas(test_app, query, [(Comanda.fecha_cierre, desc)], hacia_atras=True) == paginas
+
+class TestComandaListadoProyeccion:
+    """Tests de view=summary en el listado de comandas"""
+
+    def test_listado_summary(self, test_client, test_db_session, created_comanda, created_producto,
+                             created_mozo, created_mesa):
+        """Test: La vista resumida aplana mozo/mesa y agrega ítems y total"""
+        test_db_session.add_all([
+            DetalleComanda(id_comanda=created_comanda.id_comanda, id_producto=created_producto.id_producto,
+                           cantidad=2, precio_unitario=1500),
+            DetalleComanda(id_comanda=created_comanda.id_comanda, id_producto=created_producto.id_producto,
+                           cantidad=1, precio_unitario=500),
+        ])
+        recalcular_total_comanda(test_db_session, created_comanda.id_comanda)
+        test_db_session.commit()
+        esperado = {
+            'id_comanda': created_comanda.id_comanda, 'fecha': '2024-01-15 00:00:00', 'fecha_cierre': None,
+            'id_mozo': created_mozo.id, 'mozo_nombre': created_mozo.nombre_apellido,
+            'id_mesa': created_mesa.id_mesa, 'mesa_numero': created_mesa.numero, 'id_reserva': None,
+            'estado': 'Abierta', 'baja': False, 'cantidad_items': 2, 'total': 3500.0,
+        }
+
+        response = test_client.get('/api/comandas/?view=summary')
+        data = assert_response_success(response)
+        assert data['data'] == [esperado]
+        assert data['pagination']['total'] == 1
+
+
+class TestComandaTotal:
+    """Tests de la columna total mantenida al modificar detalles"""
+
+    def test_endpoints_de_detalle_mantienen_total(self, test_client, created_comanda, created_producto):
+        """Test: Agregar, modificar y eliminar productos recalcula comanda.total"""
+        id_comanda, id_producto = created_comanda.id_comanda, created_producto.id_producto
+
+        def total():
+            return assert_response_success(test_client.get(f'/api/comandas/{id_comanda}'))['data']['total']
+
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos',
+                                    json={'id_producto': id_producto, 'cantidad': 2})
+        id_detalle = assert_response_success(response, 201)['data']['id_detalle_comanda']
+        test_client.post(f'/api/comandas/{id_comanda}/productos', json={'id_producto': id_producto, 'cantidad': 1})
+        assert total() == 4500.0
+
+        test_client.put(f'/api/comandas/{id_comanda}/productos/{id_detalle}', json={'cantidad': 4})
+        assert total() == 7500.0
+
+        test_client.delete(f'/api/comandas/{id_comanda}/productos/{id_detalle}')
+        assert total() == 1500.0
+
+    def test_comanda_bloqueada_antes_de_recalcular(self, test_client, created_comanda, created_producto):
+        """Test: Cada escritura de detalle bloquea la comanda (FOR UPDATE) antes de tocar detalles y total"""
+        from sqlalchemy import event
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.orm import Session
+        id_comanda, id_producto = created_comanda.id_comanda, created_producto.id_producto
+        sentencias = []
+
+        # SQLite no emite FOR UPDATE: se compila cada sentencia como en PostgreSQL
+        def registrar(estado):
+            sql = str(estado.statement.compile(dialect=postgresql.dialect()))
+            if estado.is_select and sql.endswith('FOR UPDATE') and 'FROM comanda' in sql:
+                sentencias.append('bloqueo')
+            elif estado.is_select and 'FROM detalle_comanda' in sql:
+                sentencias.append('detalle')
+            elif estado.is_update and sql.startswith('UPDATE comanda SET total'):
+                sentencias.append('total')
+
+        event.listen(Session, 'do_orm_execute', registrar)
+        try:
+            response = test_client.post(f'/api/comandas/{id_comanda}/productos',
+                                        json={'id_producto': id_producto, 'cantidad': 2})
+            id_detalle = assert_response_success(response, 201)['data']['id_detalle_comanda']
+            assert sentencias[:2] == ['bloqueo', 'total']
+
+            sentencias.clear()
+            test_client.put(f'/api/comandas/{id_comanda}/productos/{id_detalle}', json={'cantidad': 3})
+            assert sentencias[:3] == ['bloqueo', 'detalle', 'total']
+
+            sentencias.clear()
+            test_client.delete(f'/api/comandas/{id_comanda}/productos/{id_detalle}')
+            assert sentencias[:3] == ['bloqueo', 'detalle', 'total']
+        finally:
+            event.remove(Session, 'do_orm_execute', registrar)
+
+    def test_verificar_y_reparar(self, test_db_session, created_comanda, created_producto):
+        """Test: La verificación detecta totales desactualizados y reparar los corrige"""
+        test_db_session.add(DetalleComanda(id_comanda=created_comanda.id_comanda,
+                                           id_producto=created_producto.id_producto,
+                                           cantidad=2, precio_unitario=1500))
+        test_db_session.commit()
+        id_comanda = created_comanda.id_comanda
+
+        assert verificar_totales_comanda(test_db_session, reparar=True) == [
+            {'id_comanda': id_comanda, 'total': 0.0, 'calculado': 3000.0}
+        ]
+        test_db_session.expire_all()
+        assert float(test_db_session.get(Comanda, id_comanda).total) == 3000.0
+        assert verificar_totales_comanda(test_db_session) == []
+
+
+class TestComandaEventos:
+    """Tests del feed de cambios de las comandas (long-poll y SSE)"""
+
+    def _eventos(self, test_client, desde):
+        data = assert_response_success(test_client.get(f'/api/comandas/eventos?desde={desde}&espera=0'))
+        return [(e['tipo'], e['datos']) for e in data['data']], data
+
+    def test_mutaciones_emiten_eventos(self, test_client, created_mozo, created_mesa, created_producto):
+        """Test: Abrir, agregar, entregar y cerrar publican un evento cada uno, en orden"""
+        # ultimo_id se lee del difusor: un GET sin commit descartaría los fixtures
+        id_mozo, id_mesa, id_producto = created_mozo.id, created_mesa.id_mesa, created_producto.id_producto
+        inicio = difusor.ultimo_id
+
+        response = test_client.post('/api/comandas/', json={'fecha': '2024-01-15', 'id_mozo': id_mozo, 'id_mesa': id_mesa})
+        id_comanda = assert_response_success(response, 201)['data']['id_comanda']
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos',
+                                    json={'id_producto': id_producto, 'cantidad': 2})
+        id_detalle = assert_response_success(response, 201)['data']['id_detalle_comanda']
+        test_client.post(f'/api/comandas/{id_comanda}/productos/{id_detalle}/entregar')
+        test_client.post(f'/api/comandas/{id_comanda}/cerrar')
+
+        eventos, data = self._eventos(test_client, inicio)
+        assert eventos == [
+            ('comanda_abierta', {'id_comanda': id_comanda, 'id_mesa': id_mesa, 'id_mozo': id_mozo}),
+            ('detalle_agregado', {'id_comanda': id_comanda, 'id_detalle': id_detalle,
+                                  'id_producto': id_producto, 'cantidad': 2}),
+            ('detalle_entregado', {'id_comanda': id_comanda, 'id_detalle': id_detalle}),
+            ('comanda_cerrada', {'id_comanda': id_comanda}),
+        ]
+        assert data['ultimo_id'] == f'{difusor.epoca}-{difusor.numero(inicio) + 4}'
+        assert self._eventos(test_client, data['ultimo_id'])[0] == []
+
+    def test_escritura_fallida_no_emite(self, test_client, created_comanda):
+        """Test: Un lote rechazado (rollback) no publica eventos"""
+        id_comanda = created_comanda.id_comanda
+        inicio = difusor.ultimo_id
+
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos/lote',
+                                    json={'operaciones': [{'op': 'entregar', 'id_detalle': 999}]})
+        assert response.status_code == 400
+        assert self._eventos(test_client, inicio)[0] == []
+
+    def test_resync_si_se_perdieron_eventos(self):
+        """Test: Pedir un id que ya salió del buffer devuelve resync"""
+        difusor = Difusor(max_eventos=2)
+        for i in range(4):
+            difusor.publicar('comanda_modificada', {'id_comanda': i})
+
+        assert difusor.esperar(f'{difusor.epoca}-1', 0) == ([], True)
+        eventos, resync = difusor.esperar(f'{difusor.epoca}-2', 0)
+        assert [e['id'] for e in eventos] == [f'{difusor.epoca}-3', f'{difusor.epoca}-4'] and not resync
+        assert difusor.esperar(f'{difusor.epoca}-99', 0) == ([], True)
+
+    def test_resync_con_ids_de_otro_proceso(self):
+        """Test: Un id de otra época (otro worker o un reinicio) devuelve resync, no eventos"""
+        worker_a, worker_b = Difusor(), Difusor()
+        assert worker_a.epoca != worker_b.epoca
+        for i in range(3):
+            worker_a.publicar('comanda_modificada', {'id_comanda': i})
+        worker_b.publicar('comanda_modificada', {'id_comanda': 9})
+
+        # Con el mismo número, el otro worker no puede saber qué eventos faltan
+        assert worker_b.esperar(f'{worker_a.epoca}-1', 0) == ([], True)
+        assert worker_a.esperar(worker_b.ultimo_id, 0) == ([], True)
+
+        epoca = worker_a.epoca
+        worker_a.reiniciar_tras_fork()
+        assert worker_a.epoca != epoca
+        assert worker_a.esperar(f'{epoca}-3', 0) == ([], True)
+
+    def test_long_poll_espera_nuevos_eventos(self):
+        """Test: esperar() se desbloquea apenas otro hilo publica"""
+        import threading
+        difusor = Difusor()
+        threading.Timer(0.05, difusor.publicar, args=('comanda_cancelada', {'id_comanda': 1})).start()
+
+        eventos, resync = difusor.esperar(difusor.ultimo_id, 5)
+        assert [e['tipo'] for e in eventos] == ['comanda_cancelada'] and not resync
+
+    def test_esperar_async(self):
+        """Test: esperar_async() se despierta cuando otro hilo publica, sin bloquear el loop"""
+        import asyncio
+        import threading
+        difusor = Difusor()
+        desde = difusor.ultimo_id
+
+        async def esperar():
+            threading.Timer(0.05, difusor.publicar, args=('comanda_cerrada', {'id_comanda': 1})).start()
+            return await asyncio.gather(difusor.esperar_async(desde, 5), asyncio.sleep(0.01))
+
+        (eventos, resync), _ = asyncio.run(esperar())
+        assert [e['tipo'] for e in eventos] == ['comanda_cerrada'] and not resync
+        assert asyncio.run(difusor.esperar_async(difusor.ultimo_id, 0)) == ([], False)
+
+    def test_sse(self, test_client, monkeypatch, created_comanda):
+        """Test: Con Accept text/event-stream se envían los eventos desde Last-Event-ID"""
+        import routes.comanda_routes as comanda_routes
+        monkeypatch.setattr(comanda_routes, 'SSE_DURACION_MAXIMA', 0.1)
+        id_comanda = created_comanda.id_comanda
+        inicio = difusor.ultimo_id
+        test_client.put(f'/api/comandas/{id_comanda}', json={'observaciones': 'Sin sal'})
+
+        response = test_client.get('/api/comandas/eventos', headers={
+            'Accept': 'text/event-stream', 'Last-Event-ID': str(inicio)
+        })
+        assert response.mimetype == 'text/event-stream'
+        cuerpo = response.get_data(as_text=True)
+        assert f'id: {difusor.epoca}-{difusor.numero(inicio) + 1}\nevent: comanda_modificada\n' in cuerpo
+
+    def test_esperas_limitadas_por_worker(self, test_client, monkeypatch):
+        """Test: Pasado el tope de esperas, el long-poll recibe 503 y el SSE cierra sin retener el hilo"""
+        import threading
+        import time
+        import routes.comanda_routes as comanda_routes
+        monkeypatch.setattr(comanda_routes, '_esperas_eventos', threading.BoundedSemaphore(1))
+        comanda_routes._esperas_eventos.acquire()
+        inicio = difusor.ultimo_id
+
+        comienzo = time.monotonic()
+        response = test_client.get(f'/api/comandas/eventos?desde={inicio}&espera=5')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(comanda_routes.REINTENTO_ESPERAS)
+        # Sin espera (espera=0) no se ocupa el hilo: sigue respondiendo
+        data = assert_response_success(test_client.get(f'/api/comandas/eventos?desde={inicio}&espera=0'))
+        assert (data['data'], data['ultimo_id'], data['resync']) == ([], inicio, False)
+
+        difusor.publicar('comanda_modificada', {'id_comanda': 1})
+        response = test_client.get('/api/comandas/eventos', headers={
+            'Accept': 'text/event-stream', 'Last-Event-ID': inicio
+        })
+        assert 'event: comanda_modificada' in response.get_data(as_text=True)
+        assert time.monotonic() - comienzo < 2
+
+    @pytest.mark.parametrize('parametros', ['desde=-1', 'desde=abc', 'desde=1.2-x', 'espera=31'])
+    def test_parametros_invalidos(self, test_client, parametros):
+        """Test: desde/espera fuera de rango devuelven 400"""
+        assert test_client.get(f'/api/comandas/eventos?{parametros}').status_code == 400
+
+
+class TestComandaCatalogoCache:
+    """Tests de la caché del catálogo usada al cargar productos"""
+
+    def test_cambios_de_producto_invalidan_la_cache(self, test_client, created_comanda, created_producto):
+        """Test: Editar el precio o dar de baja un producto por la API se refleja en la próxima carga"""
+        id_comanda, id_producto = created_comanda.id_comanda, created_producto.id_producto
+
+        def agregar():
+            return test_client.post(f'/api/comandas/{id_comanda}/productos',
+                                    json={'id_producto': id_producto, 'cantidad': 1})
+
+        assert assert_response_success(agregar(), 201)['data']['precio_unitario'] == 1500.0
+        recargas = catalogo.recargas
+        assert assert_response_success(agregar(), 201)['data']['precio_unitario'] == 1500.0
+        assert catalogo.recargas == recargas
+
+        assert_response_success(test_client.put(f'/api/productos/{id_producto}', json={'precio': 1800}))
+        assert assert_response_success(agregar(), 201)['data']['precio_unitario'] == 1800.0
+        assert catalogo.recargas == recargas + 1
+
+        assert_response_success(test_client.delete(f'/api/productos/{id_producto}'))
+        response = agregar()
+        assert response.status_code == 400
+        assert 'producto activo' in response.get_json()['message']
+
+    @pytest.mark.parametrize('id_producto, estado', [('{id}', 201), (' {id} ', 201), ('abc', 400), ([1], 400), (0, 400)])
+    def test_id_producto_como_string(self, test_client, created_comanda, created_producto, id_producto, estado):
+        """Test: Un id_producto numérico en string se acepta; otros valores devuelven 400"""
+        id_comanda = created_comanda.id_comanda
+        if isinstance(id_producto, str):
+            id_producto = id_producto.format(id=created_producto.id_producto)
+
+        response = test_client.post(f'/api/comandas/{id_comanda}/productos',
+                                    json={'id_producto': id_producto, 'cantidad': 1})
+        assert response.status_code == estado
+        if estado == 201:
+            assert response.get_json()['data']['id_producto'] == created_producto.id_producto
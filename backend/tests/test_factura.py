@@ -0,0 +1,319 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from models import (
+    Cliente, Comanda, DetalleComanda, Factura, MedioPago, Mesa, Mozo, NumeracionFactura, Pago, Producto,
+    Seccion, Sector
+)
+from services.numeracion import siguiente_codigo_factura, sincronizar_numeracion_factura
+from services.saldos import recalcular_total_pagado
+from services.totales import recalcular_total_comanda
+from tests.utils.test_helpers import assert_response_success
+
+# Base PostgreSQL descartable para la prueba de concurrencia (se borran y recrean las tablas)
+TEST_POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+FACTURAS_CONCURRENTES = int(os.getenv('TEST_FACTURAS_CONCURRENTES', '300'))
+
+
+class TestNumeracionFactura:
+    """Tests de la numeración de facturas por día"""
+
+    def test_codigos_consecutivos_por_dia(self, test_db_session):
+        """Test: Cada día arranca en 00001 y avanza de a uno"""
+        hoy, otro_dia = datetime(2024, 5, 1, 20, 0), datetime(2024, 5, 2, 9, 0)
+
+        assert siguiente_codigo_factura(test_db_session, hoy) == 'FACT-20240501-00001'
+        assert siguiente_codigo_factura(test_db_session, hoy) == 'FACT-20240501-00002'
+        assert siguiente_codigo_factura(test_db_session, otro_dia) == 'FACT-20240502-00001'
+        assert test_db_session.get(NumeracionFactura, hoy.date()).ultimo == 2
+
+    def test_rollback_no_deja_huecos(self, test_db_session):
+        """Test: Un número asignado en una transacción que se deshace vuelve a estar disponible"""
+        fecha = datetime(2024, 5, 1, 20, 0)
+        siguiente_codigo_factura(test_db_session, fecha)
+
+        transaccion = test_db_session.begin_nested()
+        assert siguiente_codigo_factura(test_db_session, fecha) == 'FACT-20240501-00002'
+        transaccion.rollback()
+
+        assert siguiente_codigo_factura(test_db_session, fecha) == 'FACT-20240501-00002'
+
+    def test_generar_factura_usa_contador(self, test_client, test_db_session, created_comanda,
+                                          created_producto, created_cliente):
+        """Test: La factura generada toma su código del contador del día"""
+        test_db_session.add(DetalleComanda(
+            id_comanda=created_comanda.id_comanda, id_producto=created_producto.id_producto,
+            cantidad=1, precio_unitario=1500, entregado=True
+        ))
+        recalcular_total_comanda(test_db_session, created_comanda.id_comanda)
+        test_db_session.commit()
+
+        response = test_client.post(f'/api/facturas/generar-desde-comanda/{created_comanda.id_comanda}',
+                                    json={'id_cliente': created_cliente.id_cliente})
+        data = assert_response_success(response, 201)
+        hoy = datetime.now()
+        assert data['data']['codigo'] == f"FACT-{hoy:%Y%m%d}-00001"
+        assert test_db_session.get(NumeracionFactura, hoy.date()).ultimo == 1
+
+    def test_sincronizar_con_facturas_cargadas_por_fuera(self, test_db_session, created_cliente):
+        """Test: Tras un seed el contador sigue después del mayor código usado en cada día"""
+        test_db_session.add_all([
+            Factura(codigo=codigo, fecha='2024-05-01 20:00:00', total=100, id_cliente=created_cliente.id_cliente,
+                    id_comanda=None)
+            for codigo in ('FACT-20240501-00001', 'FACT-20240501-00007', 'FACT-20240502-00003', 'F-1234-0')
+        ])
+        test_db_session.flush()
+
+        assert sincronizar_numeracion_factura(test_db_session) == 2
+        assert siguiente_codigo_factura(test_db_session, datetime(2024, 5, 1, 21)) == 'FACT-20240501-00008'
+        assert siguiente_codigo_factura(test_db_session, datetime(2024, 5, 2, 9)) == 'FACT-20240502-00004'
+
+class TestListadoFacturasProyeccion:
+    """Tests de view=summary y fields= en el listado de facturas"""
+
+    def _facturar_con_pago(self, test_client, test_db_session, comanda, producto, cliente, medio_pago):
+        test_db_session.add(DetalleComanda(
+            id_comanda=comanda.id_comanda, id_producto=producto.id_producto,
+            cantidad=2, precio_unitario=1500, entregado=True
+        ))
+        recalcular_total_comanda(test_db_session, comanda.id_comanda)
+        test_db_session.commit()
+        id_medio = medio_pago.id_medio_pago
+        response = test_client.post(f'/api/facturas/generar-desde-comanda/{comanda.id_comanda}',
+                                    json={'id_cliente': cliente.id_cliente})
+        factura = assert_response_success(response, 201)['data']
+        test_client.post('/api/pagos/', json={
+            'id_factura': factura['id_factura'], 'id_medio_pago': id_medio,
+            'monto': 1000, 'fecha': '2024-03-10 20:00:00'
+        })
+        return factura
+
+    def test_summary_plano_en_una_consulta(self, test_client, test_db_session, created_comanda, created_producto,
+                                          created_cliente, created_medio_pago, contador_consultas):
+        """Test: view=summary devuelve filas planas con pagado/saldo calculados en SQL"""
+        factura = self._facturar_con_pago(test_client, test_db_session, created_comanda, created_producto,
+                                          created_cliente, created_medio_pago)
+        contador_consultas.clear()
+
+        response = test_client.get('/api/facturas/?view=summary&conteo=ninguno')
+        data = assert_response_success(response)
+
+        assert data['data'] == [{
+            'id_factura': factura['id_factura'], 'codigo': factura['codigo'], 'fecha': factura['fecha'],
+            'total': 3000.0, 'id_cliente': factura['id_cliente'], 'cliente_nombre': 'Juan',
+            'cliente_apellido': 'Pérez', 'id_comanda': factura['id_comanda'], 'baja': False,
+            'total_pagado': 1000.0, 'saldo_pendiente': 2000.0, 'esta_pagada': False,
+        }]
+        assert len([s for s in contador_consultas if s.lstrip().upper().startswith('SELECT')]) == 1
+
+    def test_fields_recorta_campos(self, test_client, test_db_session, created_comanda, created_producto,
+                                   created_cliente, created_medio_pago):
+        """Test: fields= limita las claves, tanto en summary como en full"""
+        factura = self._facturar_con_pago(test_client, test_db_session, created_comanda, created_producto,
+                                          created_cliente, created_medio_pago)
+
+        data = assert_response_success(test_client.get('/api/facturas/?view=summary&fields=codigo,saldo_pendiente'))
+        assert data['data'] == [{'codigo': factura['codigo'], 'saldo_pendiente': 2000.0}]
+
+        data = assert_response_success(test_client.get('/api/facturas/?fields=id_factura,cliente'))
+        assert set(data['data'][0]) == {'id_factura', 'cliente'}
+        assert data['data'][0]['cliente']['nombre'] == 'Juan'
+
+    @pytest.mark.parametrize('parametros', ['view=compacta', 'view=summary&fields=comanda', 'fields=inexistente'])
+    def test_proyeccion_invalida(self, test_client, parametros):
+        """Test: Vista o campos desconocidos devuelven 400"""
+        response = test_client.get(f'/api/facturas/?{parametros}')
+        assert response.status_code == 400
+
+
+class TestTotalPagado:
+    """Tests de la columna total_pagado mantenida por las rutas de pago"""
+
+    def _factura(self, test_client, test_db_session, comanda, producto, cliente):
+        test_db_session.add(DetalleComanda(
+            id_comanda=comanda.id_comanda, id_producto=producto.id_producto,
+            cantidad=2, precio_unitario=1500, entregado=True
+        ))
+        recalcular_total_comanda(test_db_session, comanda.id_comanda)
+        test_db_session.commit()
+        response = test_client.post(f'/api/facturas/generar-desde-comanda/{comanda.id_comanda}',
+                                    json={'id_cliente': cliente.id_cliente})
+        return assert_response_success(response, 201)['data']['id_factura']
+
+    def test_pagos_mantienen_total_pagado(self, test_client, test_db_session, created_comanda, created_producto,
+                                          created_cliente, created_medio_pago):
+        """Test: Crear, modificar y eliminar pagos actualiza total_pagado, saldo y el filtro solo_impagas"""
+        id_factura = self._factura(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        id_medio = created_medio_pago.id_medio_pago
+
+        def pagar(monto):
+            response = test_client.post('/api/pagos/', json={
+                'id_factura': id_factura, 'id_medio_pago': id_medio, 'monto': monto, 'fecha': '2024-03-10 20:00:00'
+            })
+            return assert_response_success(response, 201)['data']['id_pago']
+
+        def factura():
+            return assert_response_success(test_client.get(f'/api/facturas/{id_factura}'))['data']
+
+        def impagas():
+            data = assert_response_success(test_client.get('/api/facturas/?solo_impagas=true'))
+            return [f['id_factura'] for f in data['data']]
+
+        pagar(1000)
+        id_pago = pagar(500)
+        assert (factura()['total_pagado'], factura()['saldo_pendiente']) == (1500.0, 1500.0)
+        assert impagas() == [id_factura]
+
+        assert_response_success(test_client.put(f'/api/pagos/{id_pago}', json={'monto': 2000}))
+        assert (factura()['total_pagado'], factura()['esta_pagada']) == (3000.0, True)
+        assert impagas() == []
+
+        assert_response_success(test_client.delete(f'/api/pagos/{id_pago}'))
+        assert (factura()['total_pagado'], factura()['saldo_pendiente']) == (1000.0, 2000.0)
+
+    def test_recalcular_coincide_con_incremental(self, test_client, test_db_session, created_comanda,
+                                                 created_producto, created_cliente, created_medio_pago):
+        """Test: Recalcular desde los pagos da el mismo valor que el mantenimiento incremental"""
+        id_factura = self._factura(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        for monto in (700.5, 299.5):
+            test_client.post('/api/pagos/', json={
+                'id_factura': id_factura, 'id_medio_pago': created_medio_pago.id_medio_pago,
+                'monto': monto, 'fecha': '2024-03-10 20:00:00'
+            })
+
+        test_db_session.expire_all()
+        incremental = test_db_session.get(Factura, id_factura).total_pagado
+        assert recalcular_total_pagado(test_db_session) == 1
+        test_db_session.expire_all()
+        assert test_db_session.get(Factura, id_factura).total_pagado == incremental == 1000
+        assert test_db_session.query(Factura).filter(Factura.esta_pagada).count() == 0
+
+    def test_modificar_pago_con_decimales(self, test_client, test_db_session, created_comanda,
+                                          created_producto, created_cliente, created_medio_pago):
+        """Test: Los deltas de total_pagado se calculan con Decimal (sin error de redondeo de float)"""
+        id_factura = self._factura(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        ids = [
+            assert_response_success(test_client.post('/api/pagos/', json={
+                'id_factura': id_factura, 'id_medio_pago': created_medio_pago.id_medio_pago,
+                'monto': monto, 'fecha': '2024-03-10 20:00:00'
+            }), 201)['data']['id_pago']
+            for monto in ('0.10', '0.20')
+        ]
+        assert_response_success(test_client.put(f'/api/pagos/{ids[1]}', json={'monto': '0.30'}))
+        assert_response_success(test_client.delete(f'/api/pagos/{ids[0]}'))
+
+        test_db_session.expire_all()
+        assert test_db_session.get(Factura, id_factura).total_pagado == Decimal('0.30')
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason='Definir TEST_POSTGRES_URL para la prueba de concurrencia')
+class TestNumeracionFacturaConcurrente:
+    """Operaciones simultáneas contra PostgreSQL: códigos únicos y sin huecos, saldos consistentes"""
+
+    @pytest.fixture
+    def pg_session_factory(self, monkeypatch):
+        engine = create_engine(TEST_POSTGRES_URL, pool_size=20, max_overflow=20)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+
+        import db as db_module
+        monkeypatch.setattr(db_module, 'SessionLocal', factory)
+        yield factory
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+    def _preparar_comandas(self, session, cantidad):
+        sector = Sector(numero=1)
+        seccion = Seccion(nombre='Platos')
+        session.add_all([sector, seccion])
+        session.flush()
+        mozo = Mozo(documento='1', nombre_apellido='Mozo', direccion='-', telefono='-', id_sector=sector.id_sector)
+        mesa = Mesa(numero=1, tipo='Interior', cant_comensales=4, id_sector=sector.id_sector)
+        producto = Producto(codigo='P1', nombre='Milanesa', precio=1500, id_seccion=seccion.id_seccion)
+        cliente = Cliente(documento='2', nombre='Ana', apellido='Paz', num_telefono='-', email='a@a.com')
+        session.add_all([mozo, mesa, producto, cliente])
+        session.flush()
+
+        comandas = [Comanda(fecha=datetime.now(), id_mozo=mozo.id, id_mesa=mesa.id_mesa) for _ in range(cantidad)]
+        session.add_all(comandas)
+        session.flush()
+        session.add_all([
+            DetalleComanda(id_comanda=c.id_comanda, id_producto=producto.id_producto,
+                           cantidad=1, precio_unitario=1500, entregado=True)
+            for c in comandas
+        ])
+        for comanda in comandas:
+            comanda.total = 1500
+        session.commit()
+        return [c.id_comanda for c in comandas], cliente.id_cliente
+
+    def test_facturas_concurrentes_codigos_unicos_sin_huecos(self, test_app, pg_session_factory):
+        """Test: Cientos de facturas generadas en paralelo reciben códigos únicos y consecutivos"""
+        session = pg_session_factory()
+        try:
+            ids_comanda, id_cliente = self._preparar_comandas(session, FACTURAS_CONCURRENTES)
+        finally:
+            session.close()
+
+        def facturar(id_comanda):
+            response = test_app.test_client().post(
+                f'/api/facturas/generar-desde-comanda/{id_comanda}', json={'id_cliente': id_cliente}
+            )
+            return response.status_code, response.get_json()
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            resultados = list(executor.map(facturar, ids_comanda))
+
+        assert [estado for estado, _ in resultados] == [201] * FACTURAS_CONCURRENTES
+        codigos = [data['data']['codigo'] for _, data in resultados]
+        assert len(set(codigos)) == FACTURAS_CONCURRENTES
+
+        # Sin huecos dentro de cada día (la prueba puede cruzar la medianoche)
+        por_dia = {}
+        for codigo in codigos:
+            dia, numero = re.match(r'^FACT-(\d{8})-(\d{5})$', codigo).groups()
+            por_dia.setdefault(dia, []).append(int(numero))
+        for numeros in por_dia.values():
+            assert sorted(numeros) == list(range(1, len(numeros) + 1))
+
+    def test_modificaciones_concurrentes_de_un_pago(self, test_app, pg_session_factory):
+        """Test: Ediciones simultáneas del mismo pago dejan total_pagado igual al monto final"""
+        session = pg_session_factory()
+        try:
+            (id_comanda,), id_cliente = self._preparar_comandas(session, 1)
+            medio = MedioPago(nombre='Efectivo')
+            session.add(medio)
+            session.commit()
+            id_medio = medio.id_medio_pago
+        finally:
+            session.close()
+
+        cliente_http = test_app.test_client()
+        response = cliente_http.post(f'/api/facturas/generar-desde-comanda/{id_comanda}', json={'id_cliente': id_cliente})
+        id_factura = assert_response_success(response, 201)['data']['id_factura']
+        response = cliente_http.post('/api/pagos/', json={
+            'id_factura': id_factura, 'id_medio_pago': id_medio, 'monto': 100, 'fecha': '2024-03-10 20:00:00'
+        })
+        id_pago = assert_response_success(response, 201)['data']['id_pago']
+
+        def modificar(monto):
+            return test_app.test_client().put(f'/api/pagos/{id_pago}', json={'monto': monto}).status_code
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            assert set(executor.map(modificar, range(1, 65))) == {200}
+
+        session = pg_session_factory()
+        try:
+            pago = session.get(Pago, id_pago)
+            assert session.get(Factura, id_factura).total_pagado == pago.monto
+        finally:
+            session.close()
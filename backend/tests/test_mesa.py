@@ -1,5 +1,7 @@
 import pytest
-from models import Mesa, Sector
+from datetime import datetime, timedelta
+from models import Comanda, Mesa, Reserva, Sector
+from services.disponibilidad import DURACION_RESERVA, mesa_disponible, mesas_disponibles
 from tests.utils.test_helpers import assert_response_success, assert_response_error, assert_pagination_structure
 
 class TestMesaModel:
@@ -324,3 +326,74 @@ class TestMesaRoutes:
         assert len(data['data']) == 10
         assert data['pagination']['has_next'] == True
 
+
+
+class TestMesaDisponibilidad:
+    """Tests del motor de disponibilidad (services/disponibilidad.py y /mesas/disponibles)"""
+
+    @pytest.fixture
+    def salon(self, test_db_session, created_sector, created_mozo, created_cliente):
+        """Mesas de 2, 4 y 6 (y una de baja); reserva mañana a las 20 en la de 4; comanda abierta en la de 2"""
+        id_sector = created_sector.id_sector
+        mesas = [
+            Mesa(numero=11, tipo='Interior', cant_comensales=2, id_sector=id_sector),
+            Mesa(numero=12, tipo='Interior', cant_comensales=4, id_sector=id_sector),
+            Mesa(numero=13, tipo='Interior', cant_comensales=6, id_sector=id_sector),
+            Mesa(numero=14, tipo='Interior', cant_comensales=4, id_sector=id_sector, baja=True),
+        ]
+        test_db_session.add_all(mesas)
+        test_db_session.flush()
+        cena = (datetime.now() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+        test_db_session.add_all([
+            Reserva(numero=1, fecha_hora=cena, cant_personas=4,
+                    id_cliente=created_cliente.id_cliente, id_mesa=mesas[1].id_mesa),
+            Reserva(numero=2, fecha_hora=cena, cant_personas=6, cancelado=True, estado='cancelada',
+                    id_cliente=created_cliente.id_cliente, id_mesa=mesas[2].id_mesa),
+            Comanda(fecha=datetime.now(), id_mozo=created_mozo.id, id_mesa=mesas[0].id_mesa),
+        ])
+        test_db_session.commit()
+        return test_db_session, cena
+
+    @staticmethod
+    def _numeros(mesas):
+        return [m.numero for m in mesas if m.numero > 10]
+
+    def test_reservas_superpuestas(self, salon):
+        """Test: Una reserva bloquea la mesa durante su duración; las canceladas no bloquean"""
+        session, cena = salon
+        assert self._numeros(mesas_disponibles(session, cena + timedelta(hours=1))) == [11, 13]
+        assert self._numeros(mesas_disponibles(session, cena - timedelta(minutes=119))) == [11, 13]
+        # Exactamente una duración antes o después ya no se superpone
+        assert self._numeros(mesas_disponibles(session, cena + DURACION_RESERVA)) == [11, 12, 13]
+        assert self._numeros(mesas_disponibles(session, cena - DURACION_RESERVA)) == [11, 12, 13]
+        # Con una duración mayor, la ventana vuelve a chocar
+        assert self._numeros(mesas_disponibles(
+            session, cena + DURACION_RESERVA, duracion=DURACION_RESERVA + timedelta(hours=1)
+        )) == [11, 13]
+
+    def test_ocupacion_actual_y_capacidad(self, salon):
+        """Test: Sin reserva (ahora) se excluyen las mesas con comanda abierta; el orden es por capacidad"""
+        session, cena = salon
+        assert self._numeros(mesas_disponibles(session)) == [12, 13]
+        assert self._numeros(mesas_disponibles(session, cant_personas=5)) == [13]
+
+    def test_mesa_disponible_excluye_la_propia_reserva(self, salon):
+        """Test: Al mover una reserva, la propia no cuenta como conflicto"""
+        session, cena = salon
+        mesa = session.query(Mesa).filter_by(numero=12).one()
+        reserva = session.query(Reserva).filter_by(numero=1).one()
+        assert not mesa_disponible(session, mesa.id_mesa, cena + timedelta(minutes=30))
+        assert mesa_disponible(session, mesa.id_mesa, cena + timedelta(minutes=30), excluir_reserva=reserva.id_reserva)
+
+    def test_listar_disponibles_en_ventana(self, test_client, salon):
+        """Test: /mesas/disponibles acepta fecha_hora, duración y cantidad de comensales"""
+        _, cena = salon
+        fecha = (cena + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+        response = test_client.get(f'/api/mesas/disponibles?fecha_hora={fecha}&duracion=90&cant_comensales=3')
+        data = assert_response_success(response)
+        assert [m['numero'] for m in data['data']] == [13]
+
+    @pytest.mark.parametrize('query', ['fecha_hora=mañana', 'duracion=0'])
+    def test_parametros_invalidos(self, test_client, query):
+        """Test: Fecha inválida o duración no positiva devuelven 400"""
+        assert_response_error(test_client.get(f'/api/mesas/disponibles?{query}'), 400)
@@ -291,3 +291,137 @@ class TestProductoRoutes:
         data = assert_response_success(response)
         assert data['data']['cm3'] == 750
 
+
+
+class TestProductoGetCondicional:
+    """Tests de ETag / Last-Modified en los listados del catálogo"""
+
+    def _crear_plato(self, test_client, id_seccion, codigo):
+        response = test_client.post('/api/productos/platos', json={
+            'codigo': codigo, 'nombre': f'Plato {codigo}', 'precio': 1000, 'id_seccion': id_seccion
+        })
+        return assert_response_success(response)
+
+    def test_304_si_no_hubo_cambios(self, test_client, created_seccion, contador_consultas):
+        """Test: Con la versión vigente se responde 304 consultando solo la versión"""
+        self._crear_plato(test_client, created_seccion.id_seccion, 'P-1')
+        primera = test_client.get('/api/productos/')
+        assert primera.status_code == 200
+        etag = primera.headers['ETag']
+        assert etag.startswith('W/"productos.')
+        assert primera.headers['Cache-Control'] == 'no-cache'
+        assert 'Last-Modified' in primera.headers
+
+        contador_consultas.clear()
+        segunda = test_client.get('/api/productos/', headers={'If-None-Match': etag})
+        assert segunda.status_code == 304
+        assert segunda.get_data() == b''
+        assert segunda.headers['ETag'] == etag
+        assert len(contador_consultas) == 1
+        assert 'version_recurso' in contador_consultas[0]
+
+        por_fecha = test_client.get('/api/productos/platos',
+                                    headers={'If-Modified-Since': primera.headers['Last-Modified']})
+        assert por_fecha.status_code == 304
+
+    def test_escritura_cambia_version(self, test_client, created_seccion):
+        """Test: Crear, editar o eliminar productos invalida el ETag anterior"""
+        id_seccion = created_seccion.id_seccion
+        id_producto = self._crear_plato(test_client, id_seccion, 'P-1')['data']['producto']['id_producto']
+        etag = test_client.get('/api/productos/').headers['ETag']
+
+        test_client.put(f'/api/productos/{id_producto}', json={'precio': 1200})
+        response = test_client.get('/api/productos/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()['data'][0]['precio'] == 1200
+
+    def test_escritura_rechazada_no_cambia_version(self, test_client, created_seccion):
+        """Test: Una escritura que no llega a commit deja la misma versión"""
+        self._crear_plato(test_client, created_seccion.id_seccion, 'P-1')
+        etag = test_client.get('/api/productos/bebidas').headers['ETag']
+
+        test_client.post('/api/productos/platos', json={
+            'codigo': 'P-2', 'nombre': 'Otro', 'precio': 1000, 'id_seccion': 99999
+        })
+        response = test_client.get('/api/productos/bebidas', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+    def test_versiones_independientes_por_recurso(self, test_client, created_seccion):
+        """Test: Cambiar productos no invalida el catálogo de medios de pago"""
+        id_seccion = created_seccion.id_seccion
+        self._crear_plato(test_client, id_seccion, 'P-1')
+        etag = test_client.get('/api/medio-pagos/').headers['ETag']
+        self._crear_plato(test_client, id_seccion, 'P-2')
+
+        response = test_client.get('/api/medio-pagos/', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+
+class TestProductoMenu:
+    """Tests del menú agrupado (/productos/menu)"""
+
+    def _cargar_menu(self, test_db_session):
+        bebidas = Seccion(nombre='Bebidas')
+        cocina = Seccion(nombre='Cocina')
+        cerrada = Seccion(nombre='Cerrada', baja=True)
+        test_db_session.add_all([bebidas, cocina, cerrada])
+        test_db_session.flush()
+        productos = [
+            Producto(codigo='M1', nombre='Milanesa', precio=1500, id_seccion=cocina.id_seccion),
+            Producto(codigo='F1', nombre='Flan', precio=800, id_seccion=cocina.id_seccion),
+            Producto(codigo='A1', nombre='Agua', precio=500, id_seccion=bebidas.id_seccion),
+            Producto(codigo='X1', nombre='Discontinuado', precio=100, id_seccion=cocina.id_seccion, baja=True),
+            Producto(codigo='C1', nombre='Oculto', precio=100, id_seccion=cerrada.id_seccion),
+        ]
+        test_db_session.add_all(productos)
+        test_db_session.flush()
+        milanesa, flan, agua, discontinuado, _ = productos
+        test_db_session.add_all([Plato(milanesa.id_producto), Postre(flan.id_producto),
+                                 Bebida(agua.id_producto, cm3=500), Plato(discontinuado.id_producto)])
+        test_db_session.commit()
+        return bebidas.id_seccion, cocina.id_seccion
+
+    def test_menu_agrupado_en_una_consulta(self, test_client, test_db_session, contador_consultas):
+        """Test: Secciones activas con sus productos por subtipo, leídos con una sola consulta"""
+        id_bebidas, id_cocina = self._cargar_menu(test_db_session)
+
+        contador_consultas.clear()
+        data = assert_response_success(test_client.get('/api/productos/menu'))
+        consultas_menu = [s for s in contador_consultas if 'FROM producto' in s]
+        assert len(consultas_menu) == 1
+
+        assert data['total'] == 3
+        assert [(s['id_seccion'], s['nombre']) for s in data['data']] == [(id_bebidas, 'Bebidas'), (id_cocina, 'Cocina')]
+        bebidas, cocina = data['data']
+        assert [(b['nombre'], b['cm3']) for b in bebidas['bebidas']] == [('Agua', 500)]
+        assert [p['nombre'] for p in cocina['platos']] == ['Milanesa']
+        assert [p['nombre'] for p in cocina['postres']] == ['Flan']
+        assert cocina['bebidas'] == [] and cocina['otros'] == []
+
+    def test_menu_cache_y_etag_siguen_la_version(self, test_client, test_db_session):
+        """Test: El menú se sirve de caché con ETag y cambia al modificar un producto"""
+        self._cargar_menu(test_db_session)
+        id_flan = test_db_session.query(Producto).filter_by(codigo='F1').one().id_producto
+        # Una escritura por la API persiste los datos de test antes de los GET
+        assert_response_success(test_client.put(f'/api/productos/{id_flan}', json={'precio': 850}))
+
+        primera = test_client.get('/api/productos/menu')
+        segunda = test_client.get('/api/productos/menu')
+        assert (primera.headers['X-Cache'], segunda.headers['X-Cache']) == ('MISS', 'HIT')
+        assert test_client.get('/api/productos/menu', headers={'If-None-Match': primera.headers['ETag']}).status_code == 304
+
+        assert_response_success(test_client.put(f'/api/productos/{id_flan}', json={'precio': 900}))
+        tercera = test_client.get('/api/productos/menu', headers={'If-None-Match': primera.headers['ETag']})
+        assert tercera.status_code == 200
+        assert tercera.headers['X-Cache'] == 'MISS'
+        assert tercera.get_json()['data'][1]['postres'][0]['precio'] == 900.0
+
+    def test_listar_subtipos_sin_n_mas_1(self, test_client, test_db_session, contador_consultas):
+        """Test: /platos trae el producto de cada plato en la misma consulta"""
+        self._cargar_menu(test_db_session)
+
+        contador_consultas.clear()
+        data = assert_response_success(test_client.get('/api/productos/platos'))
+        assert [p['producto']['nombre'] for p in data['data']] == ['Milanesa']
+        assert len([s for s in contador_consultas if 'FROM plato' in s or 'FROM producto' in s]) == 1
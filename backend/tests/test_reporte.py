@@ -0,0 +1,212 @@
+import pytest
+from datetime import date, datetime
+from models import DetalleComanda, Reserva, ResumenVentaDiaria, ResumenCobroDiario
+from services.resumenes import reconstruir_resumenes
+from services.totales import recalcular_total_comanda
+from tests.utils.test_helpers import assert_response_success
+
+
+def _facturar(test_client, test_db_session, comanda, producto, cliente):
+    """Agrega un detalle a la comanda y la factura por la API (el commit persiste los fixtures)"""
+    test_db_session.add(DetalleComanda(
+        id_comanda=comanda.id_comanda, id_producto=producto.id_producto,
+        cantidad=3, precio_unitario=1500, entregado=True
+    ))
+    recalcular_total_comanda(test_db_session, comanda.id_comanda)
+    test_db_session.commit()
+    response = test_client.post(
+        f'/api/facturas/generar-desde-comanda/{comanda.id_comanda}',
+        json={'id_cliente': cliente.id_cliente}
+    )
+    return assert_response_success(response, 201)['data']
+
+
+class TestResumenesDiarios:
+    """Tests del mantenimiento incremental de los resúmenes"""
+
+    def test_generar_factura_actualiza_resumen_ventas(self, test_client, test_db_session, created_comanda,
+                                                     created_producto, created_cliente, created_mozo):
+        """Test: Facturar una comanda suma cantidad y total en el resumen del día"""
+        factura = _facturar(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+
+        resumen = test_db_session.query(ResumenVentaDiaria).one()
+        assert resumen.dia.isoformat() == factura['fecha'][:10]
+        assert resumen.id_producto == created_producto.id_producto
+        assert resumen.id_mozo == created_mozo.id
+        assert resumen.cantidad == 3
+        assert float(resumen.total) == factura['total'] == 4500.0
+
+    def test_pagos_actualizan_resumen_cobros(self, test_client, test_db_session, created_comanda,
+                                             created_producto, created_cliente, created_medio_pago):
+        """Test: Crear, modificar y eliminar pagos mantiene el resumen de cobros"""
+        factura = _facturar(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        id_medio = created_medio_pago.id_medio_pago
+
+        for monto in (1000, 500):
+            response = test_client.post('/api/pagos/', json={
+                'id_factura': factura['id_factura'], 'id_medio_pago': id_medio,
+                'monto': monto, 'fecha': '2024-03-10 20:00:00'
+            })
+            id_pago = assert_response_success(response, 201)['data']['id_pago']
+
+        # El segundo pago pasa a otro día y cambia de monto
+        response = test_client.put(f'/api/pagos/{id_pago}', json={'monto': 800, 'fecha': '2024-03-11 09:00:00'})
+        assert_response_success(response)
+
+        resumenes = {r.dia: r for r in test_db_session.query(ResumenCobroDiario).all()}
+        assert (resumenes[date(2024, 3, 10)].cantidad, float(resumenes[date(2024, 3, 10)].total)) == (1, 1000.0)
+        assert (resumenes[date(2024, 3, 11)].cantidad, float(resumenes[date(2024, 3, 11)].total)) == (1, 800.0)
+
+        response = test_client.delete(f'/api/pagos/{id_pago}')
+        assert_response_success(response)
+        test_db_session.expire_all()
+        resumen = test_db_session.get(ResumenCobroDiario, (date(2024, 3, 11), id_medio))
+        assert (resumen.cantidad, float(resumen.total)) == (0, 0.0)
+
+    def test_reconstruir_coincide_con_incremental(self, test_client, test_db_session, created_comanda,
+                                                  created_producto, created_cliente, created_medio_pago):
+        """Test: La reconstrucción desde cero produce los mismos resúmenes que el mantenimiento incremental"""
+        factura = _facturar(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        test_client.post('/api/pagos/', json={
+            'id_factura': factura['id_factura'], 'id_medio_pago': created_medio_pago.id_medio_pago,
+            'monto': 4500, 'fecha': '2024-03-10 20:00:00'
+        })
+
+        def foto():
+            ventas = sorted((r.dia, r.id_producto, r.id_mozo, r.cantidad, float(r.total))
+                            for r in test_db_session.query(ResumenVentaDiaria).all())
+            cobros = sorted((r.dia, r.id_medio_pago, r.cantidad, float(r.total))
+                            for r in test_db_session.query(ResumenCobroDiario).all())
+            return ventas, cobros
+
+        incremental = foto()
+        filas = reconstruir_resumenes(test_db_session)
+        test_db_session.expire_all()
+
+        assert filas == {'ventas': 1, 'cobros': 1}
+        assert foto() == incremental
+
+
+class TestReporteRoutes:
+    """Tests de los reportes que leen de los resúmenes"""
+
+    def test_reportes_desde_resumen(self, test_client, test_db_session, created_comanda, created_producto,
+                                    created_cliente, created_medio_pago, created_mozo):
+        """Test: Productos más vendidos, medios de pago y facturación de mozos"""
+        factura = _facturar(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        test_client.post('/api/pagos/', json={
+            'id_factura': factura['id_factura'], 'id_medio_pago': created_medio_pago.id_medio_pago,
+            'monto': 4500, 'fecha': '2024-03-10 20:00:00'
+        })
+
+        data = assert_response_success(test_client.get('/api/reportes/productos/mas-vendidos'))
+        assert data['data'] == [{'producto': created_producto.nombre, 'cantidad': 3}]
+
+        data = assert_response_success(test_client.get('/api/reportes/medios-pago'))
+        assert data['data'] == [{'medio_pago': created_medio_pago.nombre, 'total': 4500.0, 'cantidad': 1}]
+
+        data = assert_response_success(test_client.get('/api/reportes/mozos/facturacion'))
+        assert data['data'] == [{'mozo': created_mozo.nombre_apellido, 'facturado': 4500.0}]
+
+    def test_reservas_por_dia_agrupa_por_dia(self, test_client, test_db_session, created_cliente, created_mesa):
+        """Test: Las reservas se agrupan por día (no por minuto) y se filtran por desde/hasta"""
+        horarios = [datetime(2024, 5, 1, 12, 0), datetime(2024, 5, 1, 21, 30),
+                    datetime(2024, 5, 2, 13, 15), datetime(2024, 5, 10, 20, 0)]
+        for i, fecha_hora in enumerate(horarios):
+            test_db_session.add(Reserva(numero=100 + i, fecha_hora=fecha_hora, cant_personas=2,
+                                        id_cliente=created_cliente.id_cliente, id_mesa=created_mesa.id_mesa))
+        test_db_session.commit()
+
+        response = test_client.get('/api/reportes/reservas/por-dia?desde=2024-05-01&hasta=2024-05-02')
+        data = assert_response_success(response)
+        assert data['data'] == [{'fecha': '2024-05-01', 'cantidad': 2}, {'fecha': '2024-05-02', 'cantidad': 1}]
+
+    @pytest.mark.parametrize('granularidad, esperado', [
+        ('dia', [('2024-04-29', 100.0), ('2024-05-05', 200.0), ('2024-05-06', 400.0)]),
+        ('semana', [('2024-04-29', 300.0), ('2024-05-06', 400.0)]),
+        ('mes', [('2024-04-01', 100.0), ('2024-05-01', 600.0)]),
+    ])
+    def test_ventas_por_granularidad(self, test_client, test_db_session, created_producto, created_mozo,
+                                     granularidad, esperado):
+        """Test: Ventas agrupadas por día, semana (desde el lunes) o mes"""
+        for dia, total in [(date(2024, 4, 29), 100), (date(2024, 5, 5), 200), (date(2024, 5, 6), 400)]:
+            test_db_session.add(ResumenVentaDiaria(dia=dia, id_producto=created_producto.id_producto,
+                                                   id_mozo=created_mozo.id, cantidad=1, total=total))
+        test_db_session.commit()
+
+        response = test_client.get(f'/api/reportes/ventas/mensuales?granularidad={granularidad}')
+        data = assert_response_success(response)
+        assert [(r['periodo'], r['total']) for r in data['data']] == esperado
+
+    def test_productos_mas_vendidos_por_periodo(self, test_client, test_db_session, created_producto,
+                                                created_seccion, created_mozo):
+        """Test: Con granularidad el ranking se calcula dentro de cada período y respeta el rango"""
+        from models import Producto
+        otro = Producto(codigo='PROD002', nombre='Flan', precio=800, id_seccion=created_seccion.id_seccion)
+        test_db_session.add(otro)
+        test_db_session.flush()
+        ventas = [(date(2024, 4, 30), created_producto, 5), (date(2024, 5, 2), created_producto, 1),
+                  (date(2024, 5, 3), otro, 4), (date(2024, 6, 1), otro, 9)]
+        for dia, producto, cantidad in ventas:
+            test_db_session.add(ResumenVentaDiaria(dia=dia, id_producto=producto.id_producto,
+                                                   id_mozo=created_mozo.id, cantidad=cantidad, total=cantidad * 10))
+        test_db_session.commit()
+        nombre = created_producto.nombre
+
+        response = test_client.get('/api/reportes/productos/mas-vendidos?granularidad=mes&hasta=2024-05-31')
+        data = assert_response_success(response)
+        assert data['data'] == [
+            {'periodo': '2024-04-01', 'producto': nombre, 'cantidad': 5},
+            {'periodo': '2024-05-01', 'producto': 'Flan', 'cantidad': 4},
+            {'periodo': '2024-05-01', 'producto': nombre, 'cantidad': 1},
+        ]
+
+    @pytest.mark.parametrize('parametros', ['granularidad=anio', 'desde=ayer', 'hasta=2024-13-01'])
+    def test_parametros_invalidos(self, test_client, parametros):
+        """Test: Parámetros de rango o granularidad inválidos devuelven 400"""
+        response = test_client.get(f'/api/reportes/mozos/facturacion?{parametros}')
+        assert response.status_code == 400
+
+
+class TestCacheReportes:
+    """Tests de la caché de respuestas de los reportes"""
+
+    def test_segunda_consulta_sale_de_cache(self, test_client, test_db_session, created_producto, created_mozo):
+        """Test: La misma consulta (aunque cambie el orden de los parámetros) se sirve desde la caché"""
+        test_db_session.add(ResumenVentaDiaria(dia=date(2024, 5, 6), id_producto=created_producto.id_producto,
+                                               id_mozo=created_mozo.id, cantidad=1, total=100))
+        test_db_session.commit()
+
+        primera = test_client.get('/api/reportes/ventas/mensuales?granularidad=dia&desde=2024-05-01')
+        segunda = test_client.get('/api/reportes/ventas/mensuales?desde=2024-05-01&granularidad=dia')
+        assert primera.headers['X-Cache'] == 'MISS'
+        assert segunda.headers['X-Cache'] == 'HIT'
+        assert segunda.get_json() == primera.get_json()
+
+        data = assert_response_success(test_client.get('/api/reportes/cache'))
+        assert data['data']['espacios']['reportes']['hits'] == 1
+        assert data['data']['espacios']['reportes']['misses'] == 1
+
+    def test_errores_no_se_cachean(self, test_client):
+        """Test: Una respuesta de error no queda guardada"""
+        for _ in range(2):
+            response = test_client.get('/api/reportes/ventas/mensuales?granularidad=anio')
+            assert response.status_code == 400
+            assert response.headers['X-Cache'] == 'MISS'
+
+    def test_escritura_invalida_cache(self, test_client, test_db_session, created_comanda, created_producto,
+                                      created_cliente, created_medio_pago):
+        """Test: Registrar un pago invalida los reportes cacheados"""
+        factura = _facturar(test_client, test_db_session, created_comanda, created_producto, created_cliente)
+        nombre_medio = created_medio_pago.nombre
+
+        assert test_client.get('/api/reportes/medios-pago').get_json()['data'] == []
+        response = test_client.post('/api/pagos/', json={
+            'id_factura': factura['id_factura'], 'id_medio_pago': created_medio_pago.id_medio_pago,
+            'monto': 4500, 'fecha': '2024-03-10 20:00:00'
+        })
+        assert_response_success(response, 201)
+
+        response = test_client.get('/api/reportes/medios-pago')
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.get_json()['data'] == [{'medio_pago': nombre_medio, 'total': 4500.0, 'cantidad': 1}]
@@ -213,3 +213,19 @@ def test_campos_requeridos(test_client):
     # El mensaje puede ser "no input data provided" o mencionar campos requeridos
     assert 'requerido' in data['message'].lower() or 'no input data' in data['message'].lower()
 
+
+
+def test_crear_reserva_superpuesta(test_client, sample_reserva_data):
+    """Prueba que una reserva que se superpone con otra de la misma mesa se rechace"""
+    inicio = (datetime.now() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+    data = dict(sample_reserva_data, fecha_hora=inicio.strftime('%Y-%m-%dT%H:%M:%S'))
+    assert test_client.post('/api/reservas/', json=data).status_code == 201
+
+    # Una hora después la mesa sigue ocupada por la primera reserva
+    superpuesta = dict(data, numero=1002, fecha_hora=(inicio + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S'))
+    response = test_client.post('/api/reservas/', json=superpuesta)
+    assert response.status_code == 400
+    assert 'reservada' in response.get_json()['message']
+
+    siguiente = dict(data, numero=1003, fecha_hora=(inicio + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M:%S'))
+    assert test_client.post('/api/reservas/', json=siguiente).status_code == 201
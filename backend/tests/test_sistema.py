@@ -0,0 +1,183 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from flask import g
+
+from db import (
+    Base, QueuePoolMedido, instrumentar_engine, metricas_pool, estado_pool, reiniciar_pools_tras_fork,
+    obtener_sesion, cerrar_sesion, con_sesion
+)
+from models import Plato, Producto, Sector, Seccion
+from tests.utils.test_helpers import assert_response_success
+
+
+class TestPoolConexiones:
+    """Tests de las métricas del pool de conexiones"""
+
+    @pytest.fixture
+    def engine_medido(self):
+        engine = create_engine('sqlite://', poolclass=QueuePoolMedido, pool_size=1, max_overflow=0, pool_timeout=0.05)
+        instrumentar_engine(engine)
+        metricas_pool.reiniciar()
+        yield engine
+        engine.dispose()
+        metricas_pool.reiniciar()
+
+    def test_contadores_y_ocupacion(self, engine_medido):
+        """Test: Checkouts, checkins y ocupación reflejan el uso del pool"""
+        with engine_medido.connect() as conexion:
+            conexion.execute(text('SELECT 1'))
+            assert estado_pool(engine_medido)['pool']['en_uso'] == 1
+
+        estado = estado_pool(engine_medido)
+        assert estado['pool'] == {'tipo': 'QueuePoolMedido', 'tamanio': 1, 'en_uso': 0, 'libres': 1, 'overflow': 0}
+        contadores = estado['contadores']
+        assert (contadores['conexiones_abiertas'], contadores['checkouts'], contadores['checkins']) == (1, 1, 1)
+        assert contadores['esperas'] == 1
+
+    def test_timeout_de_checkout(self, engine_medido):
+        """Test: Un pool agotado cuenta el timeout y la espera"""
+        with engine_medido.connect():
+            with pytest.raises(PoolTimeoutError):
+                engine_medido.connect()
+
+        contadores = estado_pool(engine_medido)['contadores']
+        assert contadores['timeouts'] == 1
+        assert contadores['espera_max_ms'] >= 50
+
+    def test_reiniciar_tras_fork(self, engine_medido):
+        """Test: Tras un fork el pool se reemplaza sin cerrar las conexiones heredadas"""
+        with engine_medido.connect() as conexion:
+            conexion.execute(text('SELECT 1'))
+        pool_heredado = engine_medido.pool
+
+        reiniciar_pools_tras_fork(engine_medido)
+
+        assert engine_medido.pool is not pool_heredado
+        assert pool_heredado.checkedin() == 1
+        assert estado_pool(engine_medido)['pool']['libres'] == 0
+
+    def test_endpoint_pool(self, test_client):
+        """Test: El endpoint expone configuración, ocupación y contadores"""
+        data = assert_response_success(test_client.get('/api/sistema/pool'))
+        assert set(data['data']) == {'configuracion', 'pool', 'contadores'}
+        assert data['data']['configuracion']['desconexion'] in ('pre_ping', 'on_error')
+
+
+class TestSesionRequest:
+    """Tests de la sesión por request"""
+
+    def test_una_sesion_por_request_y_cierre(self, test_app):
+        """Test: Dentro de un request se reutiliza la misma sesión y el teardown la cierra"""
+        with test_app.test_request_context():
+            session = obtener_sesion()
+            assert obtener_sesion() is session
+            session.add(Sector(numero=99))
+
+            cerrar_sesion(RuntimeError('falla'))
+            assert 'db_session' not in g
+            assert not session.new
+
+    def test_con_sesion_hace_rollback_ante_excepcion(self, test_app):
+        """Test: Si la ruta lanza una excepción, los cambios pendientes se descartan"""
+        @con_sesion
+        def vista(session):
+            session.add(Sector(numero=98))
+            session.flush()
+            raise ValueError('error inesperado')
+
+        with test_app.test_request_context():
+            with pytest.raises(ValueError):
+                vista()
+            assert obtener_sesion().query(Sector).filter_by(numero=98).count() == 0
+
+    def test_fuera_de_request(self):
+        """Test: Fuera de un request hay que crear la sesión explícitamente"""
+        with pytest.raises(RuntimeError):
+            obtener_sesion()
+
+
+class TestReplicaLectura:
+    """Tests del ruteo de lecturas a la réplica (dos bases SQLite en memoria)"""
+
+    @pytest.fixture
+    def replica(self, monkeypatch):
+        import db as db_module
+        engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        fabrica = sessionmaker(bind=engine, info={'solo_lectura': True})
+        monkeypatch.setattr(db_module, 'SessionLectura', fabrica)
+
+        session = sessionmaker(bind=engine)()
+        session.add(Sector(numero=77))
+        session.commit()
+        session.close()
+        yield fabrica
+        engine.dispose()
+
+    def _numeros(self, test_client):
+        data = assert_response_success(test_client.get('/api/sectores/'))
+        return [s['numero'] for s in data['data']]
+
+    def test_listados_leen_de_la_replica_y_escrituras_van_a_la_primaria(self, test_client, replica):
+        """Test: GET de listado usa la réplica; POST va a la primaria y activa read-your-writes"""
+        assert self._numeros(test_client) == [77]
+
+        response = test_client.post('/api/sectores/', json={'numero': 5})
+        assert response.status_code in (200, 201)
+        assert 'leer_primaria=1' in response.headers['Set-Cookie']
+
+        # Con la cookie, el mismo cliente lee de la primaria y ve su propia escritura
+        assert self._numeros(test_client) == [5]
+
+    def test_sesion_de_replica_rechaza_escrituras(self, replica):
+        """Test: Una sesión de solo lectura no puede hacer flush de cambios"""
+        session = replica()
+        session.add(Sector(numero=88))
+        with pytest.raises(RuntimeError):
+            session.flush()
+        session.close()
+
+    def test_read_your_writes_entre_origenes(self, test_client, replica):
+        """Test: El frontend en otro origen recibe y reenvía la cookie (CORS con credenciales)"""
+        origen = {'Origin': 'http://localhost:3000'}
+        preflight = test_client.options('/api/sectores/', headers={
+            **origen, 'Access-Control-Request-Method': 'POST', 'Access-Control-Request-Headers': 'Content-Type'
+        })
+        assert preflight.headers['Access-Control-Allow-Origin'] == 'http://localhost:3000'
+        assert preflight.headers['Access-Control-Allow-Credentials'] == 'true'
+
+        response = test_client.post('/api/sectores/', json={'numero': 5}, headers=origen)
+        assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:3000'
+        assert response.headers['Access-Control-Allow-Credentials'] == 'true'
+        assert 'leer_primaria=1' in response.headers['Set-Cookie']
+
+        # El navegador reenvía la cookie (withCredentials) y la lectura va a la primaria
+        data = assert_response_success(test_client.get('/api/sectores/', headers=origen))
+        assert [s['numero'] for s in data['data']] == [5]
+
+    def test_cache_se_llena_desde_la_primaria(self, test_app, test_client, test_db_session, replica):
+        """Test: Tras invalidar, la respuesta cacheada no sale de la réplica atrasada"""
+        seccion = Seccion(nombre='Cocina')
+        test_db_session.add(seccion)
+        test_db_session.flush()
+        producto = Producto(codigo='M1', nombre='Milanesa', precio=1500, id_seccion=seccion.id_seccion)
+        test_db_session.add(producto)
+        test_db_session.flush()
+        test_db_session.add(Plato(producto.id_producto))
+        test_db_session.commit()
+        # La escritura invalida el menú y activa read-your-writes solo para este cliente
+        assert_response_success(test_client.put(f'/api/productos/{producto.id_producto}', json={'precio': 1600}))
+
+        # Un cliente sin cookie llena la caché: desde la primaria, no desde la réplica vacía
+        primera = test_app.test_client().get('/api/productos/menu')
+        assert primera.headers['X-Cache'] == 'MISS'
+        assert primera.get_json()['data'][0]['platos'][0]['precio'] == 1600.0
+
+        # Lo cacheado es lo que reciben los demás
+        segunda = test_app.test_client().get('/api/productos/menu')
+        assert segunda.headers['X-Cache'] == 'HIT'
+        assert segunda.get_json() == primera.get_json()
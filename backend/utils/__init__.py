@@ -0,0 +1 @@
+# Utilidades compartidas por las rutas (paginación, fechas, etc.)
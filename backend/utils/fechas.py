@@ -0,0 +1,94 @@
+"""
+Conversión de fechas entre la API (strings) y las columnas TIMESTAMP.
+
+La API sigue aceptando y devolviendo el formato 'YYYY-MM-DD HH:MM:SS' (también
+ISO con 'T' y fechas sin hora); los modelos guardan datetime nativos para que
+los filtros por rango y los date_trunc de los reportes usen los índices.
+"""
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import func
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+
+def parsear_fecha(valor):
+    """Convierte str/date/datetime a datetime. None se devuelve tal cual; lanza ValueError si es inválida"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    if isinstance(valor, str):
+        texto = valor.strip()
+        try:
+            return datetime.fromisoformat(texto)
+        except ValueError:
+            pass
+    raise ValueError(f'Fecha inválida: {valor!r}. Usar formato YYYY-MM-DD o YYYY-MM-DD HH:MM:SS')
+
+
+def formatear_fecha(valor):
+    """datetime -> 'YYYY-MM-DD HH:MM:SS' (None si no hay fecha)"""
+    if valor is None:
+        return None
+    return valor.strftime(FORMATO_FECHA)
+
+
+def es_solo_fecha(texto):
+    """True si el parámetro es un día ('YYYY-MM-DD') sin hora"""
+    return isinstance(texto, str) and len(texto.strip()) == 10
+
+
+def rango_dia(texto):
+    """(inicio, fin) semiabierto [inicio, fin) del día indicado"""
+    inicio = parsear_fecha(texto).replace(hour=0, minute=0, second=0, microsecond=0)
+    return inicio, inicio + timedelta(days=1)
+
+
+def filtro_rango(columna, desde=None, hasta=None):
+    """
+    Condiciones sargables para filtrar una columna TIMESTAMP por rango.
+    Si `hasta` es solo un día se incluye el día completo (< día siguiente).
+    """
+    condiciones = []
+    if desde:
+        condiciones.append(columna >= parsear_fecha(desde))
+    if hasta:
+        if es_solo_fecha(hasta):
+            condiciones.append(columna < rango_dia(hasta)[1])
+        else:
+            condiciones.append(columna <= parsear_fecha(hasta))
+    return condiciones
+
+
+# Granularidades de los reportes -> unidad de date_trunc de PostgreSQL
+GRANULARIDADES = {
+    'dia': 'day', 'day': 'day',
+    'semana': 'week', 'week': 'week',
+    'mes': 'month', 'month': 'month',
+}
+
+
+def truncar_fecha(columna, granularidad, dialecto):
+    """
+    Expresión SQL que lleva `columna` al inicio de su día/semana/mes.
+    PostgreSQL usa date_trunc (semanas ISO, desde el lunes); SQLite se emula con date().
+    """
+    unidad = GRANULARIDADES[granularidad]
+    if dialecto == 'postgresql':
+        return func.date_trunc(unidad, columna)
+    if unidad == 'day':
+        return func.date(columna)
+    if unidad == 'week':
+        # 'weekday 0' avanza al domingo (o se queda si ya lo es); -6 días vuelve al lunes
+        return func.date(columna, 'weekday 0', '-6 days')
+    return func.date(columna, 'start of month')
+
+
+def formatear_periodo(valor):
+    """Inicio de período devuelto por truncar_fecha -> 'YYYY-MM-DD'"""
+    if valor is None:
+        return None
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime('%Y-%m-%d')
+    return str(valor)[:10]
@@ -0,0 +1,265 @@
+"""
+Paginación compartida por las rutas de listado.
+
+Soporta dos modos:
+- offset (por defecto): ?page=N&per_page=M, igual que antes.
+- cursor (keyset): ?cursor=&per_page=M. El primer pedido manda `cursor` vacío y
+  las respuestas devuelven `next_cursor` / `prev_cursor` opacos. La página se
+  obtiene con un WHERE sobre las columnas de orden en lugar de OFFSET, así que
+  una página profunda cuesta lo mismo que la primera.
+
+Las columnas de orden que admiten NULL (p. ej. comanda.fecha_cierre) ordenan
+los NULL al final en ambos sentidos (NULLS LAST) y el filtro keyset tiene ramas
+IS NULL explícitas: una comparación `<`/`>` con NULL nunca es verdadera y esas
+filas se perderían o repetirían entre páginas. Las columnas NOT NULL no cambian.
+
+El total se controla con ?conteo=exacto|estimado|ninguno. En modo cursor el
+default es 'ninguno'; 'estimado' usa la estimación del planner de PostgreSQL
+(EXPLAIN) en lugar de COUNT(*) y cae a conteo exacto en otros motores.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, date
+from decimal import Decimal
+
+from flask import request
+from sqlalchemy import and_, false, or_, inspect
+
+MODOS_CONTEO = ('exacto', 'estimado', 'ninguno')
+PER_PAGE_DEFAULT = 10
+PER_PAGE_MAX = 100
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de paginación inválido (cursor corrupto, conteo desconocido, orden no soportado)"""
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, Decimal):
+        return {'dec': str(valor)}
+    return valor
+
+
+def _decodificar_valor(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        if 'dec' in valor:
+            return Decimal(valor['dec'])
+        raise ParametroInvalido('Cursor inválido')
+    return valor
+
+
+def _firma_orden(orden):
+    """Identifica el ordenamiento para rechazar cursores generados con otro orden"""
+    texto = ','.join(f'{col.key}:{int(desc)}' for col, desc in orden)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:8]
+
+
+def codificar_cursor(valores, direccion, orden):
+    contenido = {
+        'd': direccion,
+        'o': _firma_orden(orden),
+        'v': [_codificar_valor(v) for v in valores],
+    }
+    crudo = json.dumps(contenido, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, orden):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        direccion = contenido['d']
+        valores = [_decodificar_valor(v) for v in contenido['v']]
+        firma = contenido['o']
+    except ParametroInvalido:
+        raise
+    except Exception:
+        raise ParametroInvalido('Cursor inválido')
+    if direccion not in ('sig', 'ant') or len(valores) != len(orden):
+        raise ParametroInvalido('Cursor inválido')
+    if firma != _firma_orden(orden):
+        raise ParametroInvalido('El cursor no corresponde al ordenamiento solicitado')
+    return direccion, valores
+
+
+def _orden_completo(modelo, orden):
+    """Agrega la clave primaria como desempate para que el orden sea total"""
+    pk = inspect(modelo).primary_key[0]
+    columna_pk = getattr(modelo, pk.key)
+    if any(col.key == columna_pk.key and getattr(col, 'class_', modelo) is modelo for col, _ in orden):
+        return list(orden)
+    desc_pk = orden[-1][1] if orden else False
+    return list(orden) + [(columna_pk, desc_pk)]
+
+
+def _valor_clave(item, columna):
+    return getattr(item, columna.key)
+
+
+def _admite_null(columna):
+    # Atributos de modelo: la Column subyacente; otras expresiones se tratan como NOT NULL
+    return bool(getattr(getattr(columna, 'expression', columna), 'nullable', False))
+
+
+def _igual(columna, valor):
+    return columna.is_(None) if valor is None else columna == valor
+
+
+def _posterior(columna, desc, valor, hacia_adelante):
+    """
+    Filas de `columna` estrictamente después de `valor` en el sentido del recorrido.
+    Con NULLS LAST, hacia adelante los NULL van después de cualquier valor y
+    hacia atrás antes de ningún NULL.
+    """
+    menor = desc if hacia_adelante else not desc
+    if valor is None:
+        return false() if hacia_adelante else columna.isnot(None)
+    comparacion = columna < valor if menor else columna > valor
+    if hacia_adelante and _admite_null(columna):
+        return or_(comparacion, columna.is_(None))
+    return comparacion
+
+
+def _filtro_keyset(orden, valores, hacia_adelante):
+    """(a, b) > (x, y) expandido columna a columna, respetando la dirección de cada una"""
+    condiciones = []
+    for i, (columna, desc) in enumerate(orden):
+        iguales = [_igual(orden[j][0], valores[j]) for j in range(i)]
+        condiciones.append(and_(*iguales, _posterior(columna, desc, valores[i], hacia_adelante)))
+    return or_(*condiciones)
+
+
+def _clausulas_orden(orden, invertir=False):
+    clausulas = []
+    for columna, desc in orden:
+        if invertir:
+            desc = not desc
+        clausula = columna.desc() if desc else columna.asc()
+        if _admite_null(columna):
+            # NULL al final del recorrido; al invertir (página anterior), al principio
+            clausula = clausula.nulls_first() if invertir else clausula.nulls_last()
+        clausulas.append(clausula)
+    return clausulas
+
+
+def _conteo_estimado(query):
+    """Filas estimadas por el planner de PostgreSQL; None si no está disponible"""
+    session = query.session
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+    try:
+        compilado = query.order_by(None).statement.compile(dialect=bind.dialect)
+        plan = session.connection().exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compilado), compilado.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
+
+
+def contar(query, modo):
+    if modo == 'ninguno':
+        return None
+    if modo == 'estimado':
+        estimado = _conteo_estimado(query)
+        if estimado is not None:
+            return estimado
+    return query.order_by(None).count()
+
+
+def parametros_paginacion():
+    """Lee page/per_page/cursor/conteo del request actual"""
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=PER_PAGE_DEFAULT, type=int)
+    cursor = request.args.get('cursor', type=str)
+    conteo = request.args.get('conteo', type=str)
+
+    if page < 1:
+        page = 1
+    if per_page < 1 or per_page > PER_PAGE_MAX:
+        per_page = PER_PAGE_DEFAULT
+    if conteo is None:
+        conteo = 'ninguno' if cursor is not None else 'exacto'
+    if conteo not in MODOS_CONTEO:
+        raise ParametroInvalido(f'conteo debe ser uno de: {", ".join(MODOS_CONTEO)}')
+    return page, per_page, cursor, conteo
+
+
+def paginar(query, modelo, orden):
+    """
+    Aplica orden y paginación al query según los parámetros del request.
+
+    `orden` es una lista de (columna, descendente). Devuelve (items, pagination).
+    Lanza ParametroInvalido si el cursor o el modo de conteo no son válidos.
+    """
+    page, per_page, cursor, conteo = parametros_paginacion()
+    orden = _orden_completo(modelo, orden)
+
+    if cursor is None:
+        total = contar(query, conteo)
+        items = query.order_by(*_clausulas_orden(orden)).offset((page - 1) * per_page).limit(per_page + 1).all()
+        hay_mas = len(items) > per_page
+        items = items[:per_page]
+        if total is not None:
+            total_pages = (total + per_page - 1) // per_page if total > 0 else 1
+            has_next = page < total_pages if conteo == 'exacto' else hay_mas
+        else:
+            total_pages = None
+            has_next = hay_mas
+        return items, {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'total_pages': total_pages,
+            'has_next': has_next,
+            'has_prev': page > 1
+        }
+
+    for columna, _ in orden:
+        if getattr(columna, 'class_', modelo) is not modelo:
+            raise ParametroInvalido('El ordenamiento solicitado no soporta paginación por cursor')
+
+    total = contar(query, conteo)
+    direccion, valores = decodificar_cursor(cursor, orden) if cursor else ('sig', None)
+    hacia_adelante = direccion == 'sig'
+    if valores is not None:
+        query = query.filter(_filtro_keyset(orden, valores, hacia_adelante))
+    items = query.order_by(*_clausulas_orden(orden, invertir=not hacia_adelante)).limit(per_page + 1).all()
+    hay_mas = len(items) > per_page
+    items = items[:per_page]
+    if not hacia_adelante:
+        items.reverse()
+
+    if hacia_adelante:
+        has_next, has_prev = hay_mas, valores is not None
+    else:
+        has_next, has_prev = True, hay_mas
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = codificar_cursor([_valor_clave(items[-1], c) for c, _ in orden], 'sig', orden)
+        if has_prev:
+            prev_cursor = codificar_cursor([_valor_clave(items[0], c) for c, _ in orden], 'ant', orden)
+
+    return items, {
+        'modo': 'cursor',
+        'per_page': per_page,
+        'total': total,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'has_next': has_next,
+        'has_prev': has_prev
+    }
@@ -0,0 +1,49 @@
+"""
+Selección de vista y campos para los listados: ?view=summary|full&fields=a,b,c
+
+- view=full (default): el json() completo de cada modelo, como siempre.
+- view=summary: fila plana armada con una sola consulta (ver models/proyecciones.py).
+- fields: limita las claves de cada elemento a las indicadas (válido con ambas vistas).
+"""
+from flask import request
+
+from models.proyecciones import PROYECCIONES, CAMPOS_COMPLETOS
+from utils.paginacion import ParametroInvalido
+
+VISTAS = ('full', 'summary')
+
+
+def parametros_proyeccion(recurso):
+    """Lee view/fields del request; devuelve (vista, campos o None). Lanza ParametroInvalido"""
+    vista = request.args.get('view', default='full', type=str)
+    if vista not in VISTAS:
+        raise ParametroInvalido(f'view debe ser uno de: {", ".join(VISTAS)}')
+
+    campos = request.args.get('fields', type=str)
+    if campos is None:
+        return vista, None
+    campos = [c.strip() for c in campos.split(',') if c.strip()]
+    disponibles = PROYECCIONES[recurso][2] if vista == 'summary' else CAMPOS_COMPLETOS[recurso]
+    desconocidos = [c for c in campos if c not in disponibles]
+    if not campos or desconocidos:
+        raise ParametroInvalido(
+            f'fields inválido{": " + ", ".join(desconocidos) if desconocidos else ""}. '
+            f'Campos disponibles con view={vista}: {", ".join(disponibles)}'
+        )
+    return vista, campos
+
+
+def consulta_resumen(session, recurso):
+    """Query plano de la proyección summary del recurso"""
+    return PROYECCIONES[recurso][0](session)
+
+
+def serializar(items, recurso, vista, campos):
+    """Convierte objetos (full) o filas (summary) en dicts, recortados a `campos` si se pidieron"""
+    if vista == 'summary':
+        data = [PROYECCIONES[recurso][1](fila) for fila in items]
+    else:
+        data = [item.json() for item in items]
+    if campos:
+        data = [{c: d[c] for c in campos} for d in data]
+    return data
@@ -1,9 +1,13 @@
 import React from 'react'
 import ReactDOM from 'react-dom/client'
 import App from './App.jsx'
+import axios from 'axios'
 import 'bootstrap/dist/css/bootstrap.min.css'
 import './utils/chartsSetup';
 
+// Envía las cookies del backend (leer_primaria: leer lo recién escrito)
+axios.defaults.withCredentials = true
+
 ReactDOM.createRoot(document.getElementById('root')).render(
   <React.StrictMode>
     <App />
@@ -15,7 +15,7 @@ const FiltrosPagos = ({
 
   useEffect(() => {
     // Pedir todos los medios de pago (o un número grande) para llenar el select
-    fetch(`${BACKEND}/api/medio-pagos/?per_page=100`)
+    fetch(`${BACKEND}/api/medio-pagos/?per_page=100`, { credentials: 'include' })
       .then(r => r.json())
       .then(j => { if (j.status === 'success') setMediosPago(j.data) })
       .catch(err => console.error('Error cargando medios de pago:', err));
@@ -21,14 +21,14 @@ export default function ModalPago({ show = true, onClose, onSuccess }){
     setLoadingFacturas(true)
     
     // Cargar medios de pago
-    fetch(`${BACKEND}/api/medio-pagos/`)
+    fetch(`${BACKEND}/api/medio-pagos/`, { credentials: 'include' })
       .then(r=>r.json())
       .then(j=>{ if(mounted && j.status==='success') setMedios(j.data) })
       .catch(err => { if(mounted) setError('No se pudieron cargar los medios de pago') })
       .finally(()=> { if(mounted) setLoadingMedios(false) })
     
     // Cargar facturas impagas
-    fetch(`${BACKEND}/api/facturas/?solo_impagas=true&per_page=100`)
+    fetch(`${BACKEND}/api/facturas/?solo_impagas=true&per_page=100&view=summary`, { credentials: 'include' })
       .then(r=>r.json())
       .then(j=>{ 
         if(mounted && j.status==='success') {
@@ -91,6 +91,7 @@ export default function ModalPago({ show = true, onClose, onSuccess }){
     try{
       const res = await fetch(`${BACKEND}/api/pagos/`, {
         method: 'POST',
+        credentials: 'include',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ 
           id_factura: parseInt(idFactura), 
@@ -129,7 +130,7 @@ export default function ModalPago({ show = true, onClose, onSuccess }){
               <option value="">-- seleccionar factura impaga --</option>
               {facturas.map(f => (
                 <option key={f.id_factura} value={f.id_factura}>
-                  {f.codigo} - Cliente: {f.cliente?.nombre || 'N/A'} - Saldo: ${f.saldo_pendiente?.toFixed(2) || '0.00'}
+                  {f.codigo} - Cliente: {f.cliente_nombre || 'N/A'} - Saldo: ${f.saldo_pendiente?.toFixed(2) || '0.00'}
                 </option>
               ))}
             </select>
@@ -22,7 +22,7 @@ export default function TablaPagos({ refreshKey, filtros, busqueda, pagination,
     if (filtros?.fecha_hasta) params.append('fecha_hasta', filtros.fecha_hasta)
     if (busqueda) params.append('search', busqueda)
 
-    fetch(`${BACKEND}/api/pagos/?${params.toString()}`)
+    fetch(`${BACKEND}/api/pagos/?${params.toString()}`, { credentials: 'include' })
       .then(r=>r.json())
       .then(j=>{ 
         if(j.status==='success') {
@@ -120,7 +120,7 @@ const Reservas = () => {
 
   const loadMozos = async () => {
     try {
-      const response = await fetch('http://localhost:8099/api/mozos/');
+      const response = await fetch('http://localhost:8099/api/mozos/', { credentials: 'include' });
       const data = await response.json();
       setMozos(data.data || []);
     } catch {
@@ -130,7 +130,7 @@ const Reservas = () => {
 
   const loadProductos = async () => {
     try {
-      const response = await fetch('http://localhost:8099/api/productos/');
+      const response = await fetch('http://localhost:8099/api/productos/', { credentials: 'include' });
       const data = await response.json();
       setProductos(data.data || []);
     } catch {
@@ -180,6 +180,7 @@ const Reservas = () => {
     try {
       const response = await fetch(`http://localhost:8099/api/reservas/${reserva.id_reserva}/asistida`, {
         method: 'PUT',
+        credentials: 'include',
         headers: {
           'Content-Type': 'application/json',
         },
@@ -208,6 +209,7 @@ const Reservas = () => {
     try {
       const response = await fetch('http://localhost:8099/api/comandas/desde-reserva', {
         method: 'POST',
+        credentials: 'include',
         headers: {
           'Content-Type': 'application/json',
         },